@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+import logging
+
+from persistence.session import get_db
+from ..services.analytics_service import model_analytics
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/analytics/models")
+def get_model_analytics(
+    days: Optional[int] = Query(None, ge=1, description="Sliding window ending now"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    tag: Optional[str] = None,
+    models: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Per-model error rate, latency percentiles, throughput and graph metric distributions."""
+    return {
+        "window": {"days": days, "since": since, "until": until, "tag": tag},
+        "models": model_analytics.model_stats(
+            db, days=days, since=since, until=until, tag=tag, models=models
+        ),
+    }
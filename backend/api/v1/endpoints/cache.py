@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+import logging
+
+from persistence.session import get_db
+from ..services.completion_cache import completion_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+def get_cache_stats(db: Session = Depends(get_db)):
+    return completion_cache.stats(db)
+
+@router.delete("/cache/")
+def clear_cache(db: Session = Depends(get_db)):
+    removed = completion_cache.clear(db)
+    logger.info(f"Cleared {removed} completion cache entries")
+    return {"removed": removed}
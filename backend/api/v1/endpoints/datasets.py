@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+import logging
+
+from ..services.dataset_catalog import dataset_catalog
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/datasets/")
+def list_datasets():
+    return [
+        {"domain": domain, "documents": len(dataset_catalog.query(domain=domain)), **dataset_catalog.facets(domain)}
+        for domain in dataset_catalog.domains()
+    ]
+
+@router.post("/datasets/refresh")
+def refresh_datasets():
+    """Pick up added, edited or removed documents now instead of on the next periodic check."""
+    changes = dataset_catalog.refresh()
+    return {**changes, **dataset_catalog.stats()}
+
+@router.get("/datasets/{domain}/documents")
+def list_dataset_documents(
+    domain: str,
+    complexity: Optional[List[str]] = Query(None),
+    tag: Optional[List[str]] = Query(None),
+    entity_type: Optional[List[str]] = Query(None),
+):
+    """Documents carrying any of the given values of each filter, e.g. ?complexity=micro&complexity=small."""
+    try:
+        documents = dataset_catalog.query(domain=domain, complexity=complexity, tags=tag, entity_types=entity_type)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return [document.summary() for document in documents]
+
+@router.get("/datasets/{domain}/documents/{document_id}")
+def get_dataset_document(domain: str, document_id: str):
+    document = dataset_catalog.get(domain, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    try:
+        ground_truth = document.read_ground_truth()
+    except FileNotFoundError:
+        ground_truth = None
+    return {
+        **document.summary(),
+        "metadata": document.metadata,
+        "source": document.read_source(),
+        "ground_truth": ground_truth,
+    }
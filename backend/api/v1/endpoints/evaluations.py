@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from typing import Dict
+import asyncio
+import logging
+
+from persistence import schemas
+from ..services.dataset_catalog import dataset_catalog
+from ..services.evaluation_runner import CheckpointMismatchError, EvaluationRunner
+from .experiments import experiment_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+evaluation_runner = EvaluationRunner(experiment_service, catalog=dataset_catalog)
+running_evaluations: Dict[str, asyncio.Task] = {}
+
+@router.post("/evaluations/")
+async def start_evaluation(request: schemas.EvaluationCreate):
+    existing = running_evaluations.get(request.name)
+    if existing is not None and not existing.done():
+        raise HTTPException(status_code=409, detail=f"Evaluation '{request.name}' is already running")
+    try:
+        pending = evaluation_runner.plan(request)
+    except CheckpointMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def run():
+        try:
+            await evaluation_runner.run(request, pending=pending)
+        except Exception:
+            logger.exception(f"Evaluation {request.name} failed")
+
+    running_evaluations[request.name] = asyncio.create_task(run())
+    return JSONResponse(
+        status_code=202,
+        content={"name": request.name, "status": "RUNNING", "pending_cells": len(pending)}
+    )
+
+@router.get("/evaluations/")
+def list_evaluations():
+    return [
+        {"name": name, "running": _is_running(name)}
+        for name in evaluation_runner.list_evaluations()
+    ]
+
+@router.get("/evaluations/{name}")
+def get_evaluation(name: str):
+    status = evaluation_runner.status(name)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    status["running"] = _is_running(name)
+    return status
+
+def _is_running(name: str) -> bool:
+    task = running_evaluations.get(name)
+    return task is not None and not task.done()
+
+async def shutdown():
+    """Cancel running evaluations; they resume from their checkpoints."""
+    for task in running_evaluations.values():
+        task.cancel()
+    await asyncio.gather(*running_evaluations.values(), return_exceptions=True)
+    running_evaluations.clear()
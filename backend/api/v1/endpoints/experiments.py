@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import List, Literal, Dict, Optional, Tuple
+from datetime import datetime
 from pydantic import BaseModel
+import json
 import time
 import aisuite as ai
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from persistence import schemas
-from persistence.session import get_db
+from persistence.session import get_async_db, get_db
+from persistence.base import AsyncSessionLocal, SessionLocal
+from persistence.blobs import blob_size, iter_blob, output_texts
 from persistence.models import ExperimentRun, Parameter, ExperimentOutput
 from persistence import crud
 from ..utils.token_counter import count_tokens
-from ..services.experiment_service import ExperimentService
+from ..services.experiment_service import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ExperimentService, experiment_outputs,
+)
+from ..services.job_queue import ExperimentJobQueue, QueueFullError
+from ..services.matrix_service import MatrixRunner, MatrixTooLargeError, TemplateSyntaxError
+from ..services.provider_pool import provider_pool
+from ..services.search_service import search_experiments
+from ..services.graph_diff_service import GraphDiffService, NoGraphError, OutputNotFoundError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -20,11 +32,29 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-experiment_service = ExperimentService()
+# Runs share the process-wide provider client, so provider connections are reused
+experiment_service = ExperimentService(pool=provider_pool)
+job_queue = ExperimentJobQueue(experiment_service)
+matrix_runner = MatrixRunner(experiment_service)
+graph_diff_service = GraphDiffService()
 
 @router.post("/experiments/")
-async def run_experiment(experiment: schemas.ExperimentCreate, db: Session = Depends(get_db)):
+async def run_experiment(
+    experiment: schemas.ExperimentCreate,
+    background: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
     logger.info(f"Received experiment request: {experiment}")
+    if background:
+        # Queue the run and return immediately; poll /experiments/{id}/status
+        try:
+            experiment_id = await job_queue.submit(experiment, db)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return JSONResponse(
+            status_code=202,
+            content={"id": experiment_id, "status": "RUNNING"}
+        )
     try:
         return await experiment_service.run_experiment(experiment, db)
     except Exception as e:
@@ -35,6 +65,111 @@ async def run_experiment(experiment: schemas.ExperimentCreate, db: Session = Dep
             content={"detail": str(e)}
         )
 
+def format_sse(event: str, data: Dict) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/experiments/stream")
+async def stream_experiment(experiment: schemas.ExperimentCreate):
+    logger.info(f"Received streaming experiment request: {experiment}")
+
+    async def event_stream():
+        # The session must outlive the request handler, so the stream owns it
+        async with AsyncSessionLocal() as db:
+            try:
+                async for event, data in experiment_service.stream_experiment(experiment, db):
+                    yield format_sse(event, data)
+            except Exception as e:
+                logger.exception("Error streaming experiment")
+                yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/experiments/matrix")
+async def run_matrix_experiment(
+    matrix: schemas.MatrixExperimentCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    logger.info(f"Received matrix experiment request: {matrix}")
+    try:
+        return await matrix_runner.run(matrix, db)
+    except (MatrixTooLargeError, TemplateSyntaxError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Missing template variable: {e}")
+
+# Declared before /experiments/{experiment_id}, which would otherwise match "search"
+@router.get("/experiments/search")
+def search_experiment_texts(
+    q: str = Query(..., min_length=1, description="Words to find; a trailing * matches word prefixes"),
+    model: Optional[str] = None,
+    status: Optional[str] = None,
+    field: Optional[Literal["system_prompt", "user_prompt", "response"]] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    try:
+        results = search_experiments(db, q, model=model, status=status, field=field, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "results": results}
+
+@router.get("/experiments/diff")
+def diff_experiment_graphs(
+    before: int = Query(..., description="Experiment id of the baseline output"),
+    model: str = Query(..., description="Model of the baseline output"),
+    after: Optional[int] = Query(None, description="Experiment id to compare with (default: the same run)"),
+    after_model: Optional[str] = Query(None, description="Model to compare with (default: the same model)"),
+    db: Session = Depends(get_db),
+):
+    """Nodes and relationships added, removed or changed from one graph output to another."""
+    after = before if after is None else after
+    after_model = after_model or model
+    try:
+        return graph_diff_service.compare(db, before, model, after, after_model)
+    except OutputNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NoGraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/experiments/{experiment_id}/cells")
+def get_experiment_cells(experiment_id: int, db: Session = Depends(get_db)):
+    if crud.get_experiment(db, experiment_id) is None:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    return {"id": experiment_id, "cells": MatrixRunner.list_cells(db, experiment_id)}
+
+@router.get("/experiments/{experiment_id}/status")
+def get_experiment_status(experiment_id: int, db: Session = Depends(get_db)):
+    progress = crud.get_experiment_progress(db, experiment_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    status, models, finished = progress
+
+    # Live state from the job queue, otherwise derive it from stored outputs
+    model_states = job_queue.progress(experiment_id)
+    if model_states is None:
+        model_states = {}
+        for model in models:
+            if f"{model}_error" in finished:
+                model_states[model] = "ERROR"
+            elif f"{model}_response" in finished:
+                model_states[model] = "COMPLETED"
+            else:
+                # A finished run without output for this model failed before reaching it
+                model_states[model] = "PENDING" if status == "RUNNING" else "ERROR"
+
+    return {
+        "id": experiment_id,
+        "status": status,
+        "models": model_states,
+        "completed": sum(state in ("COMPLETED", "ERROR") for state in model_states.values()),
+        "total": len(model_states),
+    }
+
 @router.get("/experiments/{experiment_id}")
 def get_experiment(experiment_id: int, db: Session = Depends(get_db)):
     # Use crud function to get experiment
@@ -51,19 +186,91 @@ def get_experiment(experiment_id: int, db: Session = Depends(get_db)):
         "description": experiment.description,
         "status": experiment.status,
         "parameters": {p.name: p.value for p in experiment.parameters},
-        "outputs": {o.output_name: o.output_value for o in experiment.outputs}
+        "outputs": experiment_outputs(
+            output_texts(db, experiment.outputs), crud.get_model_results(db, experiment_id)
+        )
     } 
 
+def parse_byte_range(header: str, size: int) -> Tuple[int, int]:
+    """``[start, end)`` of a single "bytes=a-b", "bytes=a-" or "bytes=-n" Range header."""
+    unit, _, spec = header.partition("=")
+    first, _, last = spec.partition("-")
+    try:
+        if unit.strip() != "bytes" or "," in spec:
+            raise ValueError
+        if first.strip():
+            start = int(first)
+            end = int(last) + 1 if last.strip() else size
+        else:
+            start, end = max(0, size - int(last)), size
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Only a single bytes range is supported")
+    end = min(end, size)
+    if start >= end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+@router.get("/experiments/{experiment_id}/outputs/{output_name}")
+def get_experiment_output(
+    experiment_id: int,
+    output_name: str,
+    range: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """One output as plain text, streamed from the blob store; honours a single byte Range."""
+    output = crud.get_output(db, experiment_id, output_name)
+    if output is None:
+        raise HTTPException(status_code=404, detail="Output not found")
+    headers = {"Accept-Ranges": "bytes"}
+    media_type = "text/plain; charset=utf-8"
+
+    if output.blob_hash is None:
+        data = output.output_value.encode("utf-8")
+        if range is None:
+            return Response(data, media_type=media_type, headers=headers)
+        start, end = parse_byte_range(range, len(data))
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+        return Response(data[start:end], status_code=206, media_type=media_type, headers=headers)
+
+    size = blob_size(db, output.blob_hash)
+    start, end, status_code = 0, size, 200
+    if range is not None:
+        start, end = parse_byte_range(range, size)
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+    blob_hash = output.blob_hash
+
+    def content():
+        # The response body outlives the request handler, so the stream owns the session
+        stream_db = SessionLocal()
+        try:
+            yield from iter_blob(stream_db, blob_hash, start, end)
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(content(), status_code=status_code, media_type=media_type, headers=headers)
+
 @router.get("/experiments/")
-def list_experiments(db: Session = Depends(get_db)):
-    experiments = crud.get_experiments(db)
-    return [
-        {
-            "id": exp.id,
-            "name": exp.name or f"Experiment #{exp.id}",
-            "timestamp": exp.timestamp,
-            "description": exp.description,
-            "status": exp.status
-        }
-        for exp in experiments
-    ] 
\ No newline at end of file
+def list_experiments(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    model: Optional[str] = None,
+    tag: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    # The body stays a plain list; the next page is requested with ?cursor=<X-Next-Cursor>
+    try:
+        experiments, next_cursor = experiment_service.list_experiments(
+            db, limit=limit, cursor=cursor, status=status,
+            since=since, until=until, model=model, tag=tag,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return experiments
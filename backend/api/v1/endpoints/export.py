@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+import logging
+
+from persistence.base import SessionLocal
+from ..services.export_service import EXPORT_FORMATS, ExportFormatError, check_format, iter_export
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/export/experiments")
+def export_experiments(
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    model: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    """Stream every matching run as NDJSON, Parquet or an Arrow IPC stream."""
+    try:
+        check_format(format)
+    except ExportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type, extension = EXPORT_FORMATS[format]
+
+    def content():
+        # The response body outlives the request handler, so the stream owns the session
+        db = SessionLocal()
+        try:
+            yield from iter_export(
+                db, format, status=status, since=since, until=until, model=model, tag=tag
+            )
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        content(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="experiments.{extension}"'},
+    )
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ..services.warmup import warmup
+
+router = APIRouter()
+
+@router.get("/ready", include_in_schema=False)
+def get_readiness():
+    """503 until startup has finished (and again while shutting down); warm-up progress in the body."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
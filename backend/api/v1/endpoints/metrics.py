@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..utils.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Stage latency histograms, error and token counters and in-flight gauges for Prometheus."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
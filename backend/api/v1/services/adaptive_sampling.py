@@ -0,0 +1,192 @@
+"""Stratified document order and sequential stopping for adaptive evaluations.
+
+Instead of running every model over every document, an adaptive evaluation
+walks the documents in a stratified random order and keeps a running
+estimate of each model's mean score with a confidence interval. A model
+stops once its interval is narrower than the requested precision; all
+models stop once their intervals no longer overlap, i.e. the ranking is
+settled. Scores bounded to [0, 1] get an Agresti-Coull style interval, so a
+run of identical scores does not read as a zero-width interval. Documents
+are stratified by complexity and tag, and the order interleaves the strata
+proportionally to their size, so every prefix of the sample mirrors the
+corpus mix.
+"""
+from collections import Counter, defaultdict
+from statistics import NormalDist
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import logging
+import math
+import random
+
+from persistence import schemas
+from ..utils.dataset_loader import DatasetDocument
+
+logger = logging.getLogger(__name__)
+
+# GraphScorer metrics that lie in [0, 1]; the counts are unbounded
+BOUNDED_METRIC_SUFFIXES = ("_f1", "_precision", "_recall")
+
+
+def stratum_of(document: DatasetDocument, tag_counts: Counter) -> Hashable:
+    """(complexity, rarest tag) of a document, so small tag groups get their own stratum."""
+    tags = sorted(document.tags, key=lambda tag: (tag_counts[tag], tag))
+    return (document.complexity or "", tags[0] if tags else "")
+
+
+def stratified_order(documents: List[DatasetDocument], seed: int = 0) -> List[DatasetDocument]:
+    """The documents shuffled within strata and interleaved in proportion to stratum size.
+
+    The i-th document of a stratum of size n is placed at (i + 0.5) / n, so
+    after any number of documents each stratum has had its share. The order
+    depends only on the documents and ``seed``, so a resumed evaluation
+    continues the same sample.
+    """
+    tag_counts = Counter(tag for document in documents for tag in document.tags)
+    strata: Dict[Hashable, List[DatasetDocument]] = defaultdict(list)
+    for document in sorted(documents, key=lambda d: (d.domain, d.document_id)):
+        strata[stratum_of(document, tag_counts)].append(document)
+
+    rng = random.Random(seed)
+    placed = []
+    for number, key in enumerate(sorted(strata)):
+        members = strata[key]
+        rng.shuffle(members)
+        placed.extend(((index + 0.5) / len(members), number, document) for index, document in enumerate(members))
+    return [document for _, _, document in sorted(placed, key=lambda item: item[:2])]
+
+
+def cell_value(record: Dict, metric: str) -> Optional[float]:
+    """The metric of a finished cell; None for provider errors, which say nothing about the prompt.
+
+    A response without a graph scores 0 on the GraphScorer metrics.
+    """
+    if record["status"] != "COMPLETED":
+        return None
+    if metric in (record.get("graph_metrics") or {}):
+        return float(record["graph_metrics"][metric])
+    scores = record.get("scores")
+    return float(scores.get(metric, 0.0)) if scores else 0.0
+
+
+class RunningEstimate:
+    """Mean and variance of a stream of values (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._squares = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._squares += delta * (value - self.mean)
+
+    def interval(self, z: float, population: int, bounded: bool = False) -> Tuple[float, float]:
+        """Confidence interval of the mean, with finite population correction.
+
+        For values in [0, 1] (``bounded``), z²/2 pseudo-observations are added
+        at each end (Agresti-Coull), which keeps the interval from collapsing
+        when the first values happen to be identical.
+        """
+        if self.count < 2:
+            return -math.inf, math.inf
+        count, mean, squares = self.count, self.mean, self._squares
+        if bounded:
+            pseudo = z * z / 2
+            count = self.count + 2 * pseudo
+            mean = (self.count * self.mean + pseudo) / count
+            squares += self.count * (self.mean - mean) ** 2 + pseudo * (mean ** 2 + (1 - mean) ** 2)
+        correction = max(0.0, 1 - self.count / population) if population else 1.0
+        half = z * math.sqrt(squares / (count - 1) / count * correction)
+        return mean - half, mean + half
+
+
+class AdaptiveStopper:
+    """Running per-model estimates and the stopping rules, updated after every finished cell.
+
+    The interval is the simple-random-sample one; the proportional
+    stratified order has at most that variance, so it errs on the side of
+    sampling more.
+    """
+
+    def __init__(self, settings: schemas.AdaptiveSampling, models: List[str], population: int):
+        self.settings = settings
+        self.population = population
+        self.z = NormalDist().inv_cdf((1 + settings.confidence) / 2)
+        self.bounded = settings.metric.endswith(BOUNDED_METRIC_SUFFIXES)
+        self.estimates = {model: RunningEstimate() for model in models}
+        self._stopped: Dict[str, str] = {}
+
+    def add(self, record: Dict):
+        value = cell_value(record, self.settings.metric)
+        if value is None or record["model"] not in self.estimates:
+            return
+        self.estimates[record["model"]].add(value)
+        self._update()
+
+    def add_all(self, records: Iterable[Dict]):
+        for record in records:
+            self.add(record)
+
+    def interval(self, model: str) -> Tuple[float, float]:
+        return self.estimates[model].interval(self.z, self.population, self.bounded)
+
+    def _ready(self, model: str) -> bool:
+        return self.estimates[model].count >= min(self.settings.min_documents, self.population)
+
+    def _precise(self, model: str) -> bool:
+        if not self._ready(model):
+            return False
+        low, high = self.interval(model)
+        return (high - low) / 2 <= self.settings.precision
+
+    def ranking_resolved(self) -> bool:
+        """Neighbouring models, by mean, have disjoint intervals or are both within precision."""
+        if len(self.estimates) < 2 or not all(self._ready(model) for model in self.estimates):
+            return False
+        ranked = sorted(self.estimates, key=lambda model: self.estimates[model].mean, reverse=True)
+        for better, worse in zip(ranked, ranked[1:]):
+            separated = self.interval(better)[0] > self.interval(worse)[1]
+            if not separated and not (self._precise(better) and self._precise(worse)):
+                return False
+        return True
+
+    def _update(self):
+        ranking = self.settings.stop_on_ranking and self.ranking_resolved()
+        for model in self.estimates:
+            if model in self._stopped:
+                continue
+            if self._precise(model):
+                self._stopped[model] = "precision"
+            elif ranking:
+                self._stopped[model] = "ranking"
+            else:
+                continue
+            low, high = self.interval(model)
+            logger.info(
+                f"Adaptive evaluation: {model} stopped ({self._stopped[model]}) after "
+                f"{self.estimates[model].count} documents, {self.settings.metric} in [{low:.3f}, {high:.3f}]"
+            )
+
+    def is_active(self, model: str) -> bool:
+        return model not in self._stopped
+
+    def report(self) -> Dict[str, Dict]:
+        report = {}
+        for model, estimate in self.estimates.items():
+            low, high = self.interval(model) if estimate.count >= 2 else (None, None)
+            report[model] = {
+                "documents": estimate.count,
+                "mean": estimate.mean if estimate.count else None,
+                "ci_low": low,
+                "ci_high": high,
+                "stopped": self._stopped.get(model),
+            }
+        return {
+            "metric": self.settings.metric,
+            "confidence": self.settings.confidence,
+            "precision": self.settings.precision,
+            "ranking_resolved": self.ranking_resolved(),
+            "models": report,
+        }
@@ -0,0 +1,216 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+
+from persistence import crud
+from persistence.models import ExperimentRun, ModelResult
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Number of distinct filter combinations whose result frames are kept in memory
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "16"))
+
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+GRAPH_METRICS = ("node_count", "relationship_count", "node_property_count", "relationship_property_count")
+NUMERIC_COLUMNS = ("elapsed_time", "time_to_first_token", "tokens_per_second", "total_tokens") + GRAPH_METRICS
+RESULT_COLUMNS = ("id", "timestamp", "model", "status", "cache_hit") + NUMERIC_COLUMNS
+
+FilterKey = Tuple[Optional[int], Optional[datetime], Optional[datetime], Optional[str], Optional[Tuple[str, ...]]]
+
+
+class _CachedWindow:
+    """Result rows of one filter combination and the aggregates computed from them.
+
+    Never modified once cached; an update replaces the whole entry.
+    """
+
+    def __init__(self, frame: "pd.DataFrame", watermark: int, summary: Dict[str, Dict]):
+        self.frame = frame
+        self.watermark = watermark  # highest model_results.id already fetched
+        self.summary = summary
+
+
+class ModelAnalytics:
+    """Per-model latency, throughput, error and graph statistics over run history.
+
+    Matching result rows are fetched once per filter combination and kept as
+    a DataFrame together with the highest model_results id seen. Later calls
+    fetch only rows with a larger id (results are never updated after their
+    run finishes), so new runs are folded in incrementally; when nothing new
+    has landed and no row has aged out of the window the cached aggregates
+    are returned as is.
+    """
+
+    def __init__(self, cache_size: int = ANALYTICS_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[FilterKey, _CachedWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def model_stats(
+        self,
+        db: Session,
+        days: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        tag: Optional[str] = None,
+        models: Optional[List[str]] = None,
+    ) -> Dict[str, Dict]:
+        """Aggregates per model for runs started in the window and carrying ``tag``.
+
+        ``days`` is a sliding window ending now; ``since``/``until`` are fixed bounds.
+        """
+        # Imported on first use; pandas alone would double the API's import time
+        import pandas as pd
+
+        key = (days, since, until, tag, tuple(sorted(models)) if models else None)
+        cutoff = datetime.now() - timedelta(days=days) if days is not None else None
+        fetch_since = max(since, cutoff) if since and cutoff else since or cutoff
+        with self._lock:
+            window = self._cache.get(key)
+
+        # The lock only guards the cache itself: queries and aggregation work on
+        # the (immutable) cached state, so a slow filter doesn't hold up the others
+        latest = db.query(func.max(ModelResult.id)).scalar() or 0
+        if window is None:
+            frame, summary = self._fetch(db, 0, latest, fetch_since, until, tag, models), None
+        else:
+            frame, summary = window.frame, window.summary
+            if latest > window.watermark:
+                new_rows = self._fetch(db, window.watermark, latest, fetch_since, until, tag, models)
+                if not new_rows.empty:
+                    frame, summary = pd.concat([frame, new_rows], ignore_index=True), None
+
+        if cutoff is not None and not frame.empty:
+            in_window = frame["timestamp"] >= cutoff
+            if not in_window.all():
+                frame, summary = frame[in_window].reset_index(drop=True), None
+
+        if summary is None:
+            summary = self.summarize(frame)
+        with self._lock:
+            current = self._cache.get(key)
+            # A concurrent call may have cached a newer state already
+            if current is None or current.watermark <= latest:
+                self._cache[key] = _CachedWindow(frame, latest, summary)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _fetch(
+        db: Session,
+        after_id: int,
+        up_to_id: int,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        tag: Optional[str],
+        models: Optional[List[str]],
+    ) -> "pd.DataFrame":
+        import pandas as pd
+
+        query = (
+            select(*(
+                ExperimentRun.timestamp if column == "timestamp" else getattr(ModelResult, column)
+                for column in RESULT_COLUMNS
+            ))
+            .join(ExperimentRun, ModelResult.run_id == ExperimentRun.id)
+            .where(ModelResult.id > after_id, ModelResult.id <= up_to_id)
+        )
+        if since is not None:
+            query = query.where(ExperimentRun.timestamp >= since)
+        if until is not None:
+            query = query.where(ExperimentRun.timestamp < until)
+        if tag:
+            query = query.where(crud.run_has_listed_parameter("tags", tag))
+        if models:
+            query = query.where(ModelResult.model.in_(models))
+
+        frame = pd.DataFrame(db.execute(query).all(), columns=list(RESULT_COLUMNS))
+        frame[list(NUMERIC_COLUMNS)] = frame[list(NUMERIC_COLUMNS)].astype("float64")
+        frame["cache_hit"] = frame["cache_hit"].astype(bool)
+        return frame
+
+    @staticmethod
+    def summarize(frame: "pd.DataFrame") -> Dict[str, Dict]:
+        """Vectorized per-model aggregates of a result frame."""
+        import pandas as pd
+
+        if frame.empty:
+            return {}
+        completed = frame[frame["status"] == "COMPLETED"]
+        # Cache hits never reached the provider, so they would skew latency
+        live = completed[~completed["cache_hit"]]
+
+        by_model = frame.groupby("model")
+        counts = pd.DataFrame({
+            "runs": by_model.size(),
+            "errors": (frame["status"] == "ERROR").groupby(frame["model"]).sum(),
+            "cache_hits": frame["cache_hit"].groupby(frame["model"]).sum(),
+        })
+        counts["error_rate"] = counts["errors"] / counts["runs"]
+
+        latency = _distribution(live.groupby("model")["elapsed_time"], quantiles=LATENCY_QUANTILES)
+        first_token = _distribution(live.groupby("model")["time_to_first_token"], quantiles=(0.5, 0.95))
+        throughput = _distribution(live.groupby("model")["tokens_per_second"], quantiles=(0.5,))
+        tokens = _distribution(completed.groupby("model")["total_tokens"], quantiles=(0.5,))
+        graph = {
+            metric: _distribution(
+                completed.groupby("model")[metric], quantiles=(0.5, 0.95), extremes=True
+            )
+            for metric in GRAPH_METRICS
+        }
+
+        return {
+            model: {
+                "runs": int(counts.at[model, "runs"]),
+                "errors": int(counts.at[model, "errors"]),
+                "error_rate": float(counts.at[model, "error_rate"]),
+                "cache_hits": int(counts.at[model, "cache_hits"]),
+                "latency": _row(latency, model),
+                "time_to_first_token": _row(first_token, model),
+                "tokens_per_second": _row(throughput, model),
+                "total_tokens": _row(tokens, model),
+                "graph": {metric: _row(stats, model) for metric, stats in graph.items()},
+            }
+            for model in counts.index
+        }
+
+
+def _distribution(grouped, quantiles=(), extremes: bool = False) -> "pd.DataFrame":
+    """mean, pNN quantiles (and min/max) of a grouped series, one row per group."""
+    import pandas as pd
+
+    stats = {"mean": grouped.mean()}
+    for q in quantiles:
+        stats[f"p{round(q * 100)}"] = grouped.quantile(q)
+    if extremes:
+        stats["min"] = grouped.min()
+        stats["max"] = grouped.max()
+    return pd.DataFrame(stats)
+
+
+def _row(stats: "pd.DataFrame", model: str) -> Dict[str, Optional[float]]:
+    import pandas as pd
+
+    if model not in stats.index:
+        return {column: None for column in stats.columns}
+    return {
+        column: None if pd.isna(value) else float(value)
+        for column, value in stats.loc[model].items()
+    }
+
+
+model_analytics = ModelAnalytics()
@@ -0,0 +1,167 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import os
+
+from persistence.models import CompletionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Eviction limits for the persisted completion cache
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "10000"))
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+COMPLETION_CACHE_MAX_AGE_DAYS = float(os.getenv("COMPLETION_CACHE_MAX_AGE_DAYS", "30"))
+
+
+class CompletionCache:
+    """Content-addressed cache of deterministic completions stored in SQLite.
+
+    Entries are keyed on the model, the messages and the sampling parameters,
+    so only completions that would be reproduced exactly (temperature 0) should
+    go through it. The cache is best-effort: database errors are logged and
+    treated as misses so they never fail an experiment.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = COMPLETION_CACHE_MAX_ENTRIES,
+        max_bytes: int = COMPLETION_CACHE_MAX_BYTES,
+        max_age: timedelta = timedelta(days=COMPLETION_CACHE_MAX_AGE_DAYS),
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], params: Dict) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(params: Dict) -> bool:
+        """Only greedy decoding gives reproducible completions."""
+        return params.get("temperature", 1.0) == 0.0
+
+    def get_many(self, db: Session, keys: Iterable[str], commit: bool = True) -> Dict[str, str]:
+        """Return cached responses for the given keys, recording hits and misses.
+
+        With ``commit=False`` the access bookkeeping is left for the caller's
+        next commit.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            now = datetime.now()
+            cutoff = now - self.max_age
+            found = {}
+            for entry in db.query(CompletionCacheEntry).filter(CompletionCacheEntry.key.in_(keys)):
+                if entry.created_at < cutoff:
+                    continue
+                entry.last_accessed = now
+                entry.hit_count += 1
+                found[entry.key] = entry.response
+            if commit:
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Completion cache lookup failed: {e}")
+            db.rollback()
+            found = {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, db: Session, entries: Dict[str, Dict[str, str]]):
+        """Store ``{key: {"model": ..., "response": ...}}`` and enforce the limits."""
+        if not entries:
+            return
+        try:
+            now = datetime.now()
+            for key, entry in entries.items():
+                db.merge(CompletionCacheEntry(
+                    key=key,
+                    model=entry["model"],
+                    response=entry["response"],
+                    size=len(entry["response"].encode("utf-8")),
+                    created_at=now,
+                    last_accessed=now,
+                    hit_count=0,
+                ))
+            # One transaction for the new entries and the evictions they cause
+            db.flush()
+            self.evict(db, commit=False)
+            db.commit()
+            self.stores += len(entries)
+        except Exception as e:
+            logger.warning(f"Completion cache store failed: {e}")
+            db.rollback()
+
+    def evict(self, db: Session, commit: bool = True) -> int:
+        """Drop expired entries, then least recently used ones over the size limits."""
+        removed = (
+            db.query(CompletionCacheEntry)
+            .filter(CompletionCacheEntry.created_at < datetime.now() - self.max_age)
+            .delete(synchronize_session=False)
+        )
+
+        count, total_bytes = db.query(
+            func.count(CompletionCacheEntry.key),
+            func.coalesce(func.sum(CompletionCacheEntry.size), 0),
+        ).one()
+        if count > self.max_entries or total_bytes > self.max_bytes:
+            stale = []
+            oldest_first = db.query(CompletionCacheEntry.key, CompletionCacheEntry.size).order_by(
+                CompletionCacheEntry.last_accessed
+            )
+            for key, size in oldest_first.all():
+                if count <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                stale.append(key)
+                count -= 1
+                total_bytes -= size
+            removed += (
+                db.query(CompletionCacheEntry)
+                .filter(CompletionCacheEntry.key.in_(stale))
+                .delete(synchronize_session=False)
+            )
+
+        if commit:
+            db.commit()
+        self.evictions += removed
+        return removed
+
+    def stats(self, db: Session) -> Dict:
+        count, total_bytes = db.query(
+            func.count(CompletionCacheEntry.key),
+            func.coalesce(func.sum(CompletionCacheEntry.size), 0),
+        ).one()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "size_bytes": total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    def clear(self, db: Session) -> int:
+        removed = db.query(CompletionCacheEntry).delete(synchronize_session=False)
+        db.commit()
+        return removed
+
+
+completion_cache = CompletionCache()
@@ -0,0 +1,254 @@
+"""In-memory catalog of the validation datasets under validation_data/.
+
+The directories are scanned once and every document's metadata.json is
+indexed by domain, complexity, tag and entity type, so selecting an
+evaluation subset is a set intersection instead of a walk over the corpus.
+Later scans (at most every DATASET_REFRESH_SECONDS, or on demand) only stat
+the files and re-read the metadata that changed. Sources and ground-truth
+graphs are read on first use and kept in an LRU cache, and are re-read when
+their file changes.
+"""
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from ..utils.dataset_loader import (
+    GROUND_TRUTH_FILE, METADATA_FILE, SOURCE_FILE, VALIDATION_DATA_DIR, DatasetDocument, list_domains,
+)
+
+logger = logging.getLogger(__name__)
+
+# Sources and ground-truth graphs kept in memory (each counts as one entry)
+DATASET_CACHE_SIZE = int(os.getenv("DATASET_CACHE_SIZE", "512"))
+# Queries re-check the files for changes at most this often (seconds); 0 checks on every query
+DATASET_REFRESH_SECONDS = float(os.getenv("DATASET_REFRESH_SECONDS", "2.0"))
+
+DocumentKey = Tuple[str, str]  # (domain, document_id)
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value] if isinstance(value, (list, tuple)) else []
+
+
+class CatalogDocument(DatasetDocument):
+    """A DatasetDocument whose source and ground truth are served from the catalog's cache.
+
+    The cached ground-truth dict is shared between callers; treat it as read-only.
+    """
+
+    def __init__(self, catalog: "DatasetCatalog", domain: str, document_id: str, path: str, metadata: Dict[str, Any]):
+        super().__init__(domain, document_id, path, metadata)
+        self._catalog = catalog
+
+    @property
+    def entity_types(self) -> List[str]:
+        # Written under "metrics" in the datasets; accepted at the top level too
+        metrics = self.metadata.get("metrics") or {}
+        return _as_list(metrics.get("entity_types", self.metadata.get("entity_types")))
+
+    @property
+    def expected_entity_count(self) -> Optional[int]:
+        metrics = self.metadata.get("metrics") or {}
+        return metrics.get("expected_entity_count", self.metadata.get("expected_entity_count"))
+
+    def read_source(self) -> str:
+        return self._catalog.load(self, SOURCE_FILE)
+
+    def read_ground_truth(self) -> Dict[str, Any]:
+        return self._catalog.load(self, GROUND_TRUTH_FILE)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "domain": self.domain,
+            "document_id": self.document_id,
+            "complexity": self.complexity,
+            "tags": self.tags,
+            "entity_types": self.entity_types,
+            "expected_entity_count": self.expected_entity_count,
+        }
+
+
+class DatasetCatalog:
+    """Indexed, self-refreshing view of the validation documents; safe to share between threads."""
+
+    def __init__(
+        self,
+        data_dir: str = VALIDATION_DATA_DIR,
+        cache_size: int = DATASET_CACHE_SIZE,
+        refresh_seconds: float = DATASET_REFRESH_SECONDS,
+    ):
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self.refresh_seconds = refresh_seconds
+        self._documents: Dict[DocumentKey, CatalogDocument] = {}
+        self._metadata_mtimes: Dict[DocumentKey, Optional[int]] = {}
+        # Index name ("domain", "complexity", "tag", "entity_type") -> value -> documents
+        self._index: Dict[str, Dict[str, Set[DocumentKey]]] = defaultdict(lambda: defaultdict(set))
+        self._files: "OrderedDict[Tuple[DocumentKey, str], Tuple[Optional[int], Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._checked_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self, force: bool = True) -> Dict[str, int]:
+        """Re-index the documents added, changed or removed since the last scan.
+
+        Only file metadata is read for unchanged documents. With
+        ``force=False`` nothing is checked if the last scan is more recent
+        than ``refresh_seconds``. Returns the number of documents per outcome.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+                return {"added": 0, "updated": 0, "removed": 0}
+            self._checked_at = now
+
+            seen: Set[DocumentKey] = set()
+            counts = {"added": 0, "updated": 0, "removed": 0}
+            for domain in list_domains(self.data_dir):
+                for entry in os.scandir(os.path.join(self.data_dir, domain)):
+                    # Documents are directories holding at least a source text
+                    if not entry.is_dir() or _mtime(os.path.join(entry.path, SOURCE_FILE)) is None:
+                        continue
+                    key = (domain, entry.name)
+                    seen.add(key)
+                    mtime = _mtime(os.path.join(entry.path, METADATA_FILE))
+                    if key in self._documents and self._metadata_mtimes[key] == mtime:
+                        continue
+                    counts["updated" if key in self._documents else "added"] += 1
+                    self._add(key, entry.path, mtime)
+            for key in set(self._documents) - seen:
+                self._remove(key)
+                counts["removed"] += 1
+            if any(counts.values()):
+                logger.info(f"Dataset catalog refreshed: {counts}, {len(self._documents)} documents")
+            return counts
+
+    def _add(self, key: DocumentKey, path: str, mtime: Optional[int]):
+        metadata: Dict[str, Any] = {}
+        if mtime is not None:
+            try:
+                with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable metadata of {key[0]}/{key[1]}: {e}")
+        if key in self._documents:
+            self._remove(key)
+        document = CatalogDocument(self, key[0], key[1], path, metadata)
+        self._documents[key] = document
+        self._metadata_mtimes[key] = mtime
+        for name, values in self._index_values(document).items():
+            for value in values:
+                self._index[name][value].add(key)
+
+    def _remove(self, key: DocumentKey):
+        document = self._documents.pop(key)
+        self._metadata_mtimes.pop(key, None)
+        for name, values in self._index_values(document).items():
+            for value in values:
+                self._index[name][value].discard(key)
+                if not self._index[name][value]:
+                    del self._index[name][value]
+        for file_name in (SOURCE_FILE, GROUND_TRUTH_FILE):
+            self._files.pop((key, file_name), None)
+
+    @staticmethod
+    def _index_values(document: CatalogDocument) -> Dict[str, List[str]]:
+        return {
+            "domain": [document.domain],
+            "complexity": [document.complexity] if document.complexity else [],
+            "tag": _as_list(document.tags),
+            "entity_type": document.entity_types,
+        }
+
+    def domains(self) -> List[str]:
+        self.refresh(force=False)
+        with self._lock:
+            return sorted(self._index["domain"])
+
+    def query(
+        self,
+        domain: Optional[str] = None,
+        complexity: Optional[Iterable[str]] = None,
+        tags: Optional[Iterable[str]] = None,
+        entity_types: Optional[Iterable[str]] = None,
+        document_ids: Optional[Iterable[str]] = None,
+    ) -> List[CatalogDocument]:
+        """Documents matching every given filter, by domain and id.
+
+        Each list filter matches documents carrying any of its values, as
+        load_documents does. Raises ValueError for an unknown domain.
+        """
+        self.refresh(force=False)
+        with self._lock:
+            if domain is not None and domain not in self._index["domain"]:
+                raise ValueError(f"Unknown dataset '{domain}' in {self.data_dir}")
+            keys = set(self._index["domain"][domain]) if domain is not None else set(self._documents)
+            for name, values in (("complexity", complexity), ("tag", tags), ("entity_type", entity_types)):
+                if values:
+                    keys &= set().union(*(self._index[name].get(value, ()) for value in values))
+            if document_ids:
+                keys = {key for key in keys if key[1] in set(document_ids)}
+            return [self._documents[key] for key in sorted(keys)]
+
+    def get(self, domain: str, document_id: str) -> Optional[CatalogDocument]:
+        self.refresh(force=False)
+        with self._lock:
+            return self._documents.get((domain, document_id))
+
+    def facets(self, domain: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Number of documents per complexity, tag and entity type, within ``domain`` if given."""
+        self.refresh(force=False)
+        with self._lock:
+            scope = self._index["domain"].get(domain, set()) if domain is not None else set(self._documents)
+            return {
+                name: {value: len(keys & scope) for value, keys in sorted(self._index[name].items()) if keys & scope}
+                for name in ("complexity", "tag", "entity_type")
+            }
+
+    def load(self, document: DatasetDocument, file_name: str) -> Any:
+        """A document's source text or parsed ground truth, from the cache unless the file changed."""
+        key = ((document.domain, document.document_id), file_name)
+        path = os.path.join(document.path, file_name)
+        mtime = _mtime(path)
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None and cached[0] == mtime:
+                self._files.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+        # Read outside the lock so slow disks don't serialize unrelated lookups
+        with open(path, encoding="utf-8") as f:
+            value = json.load(f) if file_name == GROUND_TRUTH_FILE else f.read()
+        with self._lock:
+            self.misses += 1
+            self._files[key] = (mtime, value)
+            self._files.move_to_end(key)
+            while len(self._files) > self.cache_size:
+                self._files.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "cached_files": len(self._files),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+dataset_catalog = DatasetCatalog()
@@ -0,0 +1,342 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+from string import Template
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from persistence import schemas
+from persistence.base import DATA_DIR, AsyncSessionLocal
+from persistence.session import DbSession, close_db, run_db
+from ..utils.dataset_loader import DatasetDocument, VALIDATION_DATA_DIR
+from ..utils.graph_scorer import GraphScorer
+from ..utils.graph_stream_parser import GraphStreamParser
+from .adaptive_sampling import AdaptiveStopper, stratified_order
+from .dataset_catalog import DatasetCatalog
+from .experiment_service import DEFAULT_SAMPLING_PARAMS, ExperimentService
+
+logger = logging.getLogger(__name__)
+
+# Where evaluation checkpoints are written
+EVALUATIONS_DIR = os.getenv("EVALUATIONS_DIR", os.path.join(DATA_DIR, "evaluations"))
+# Maximum number of document x model cells in flight at once
+EVALUATION_CONCURRENCY = int(os.getenv("EVALUATION_CONCURRENCY", "8"))
+
+Cell = Tuple[str, str]  # (document_id, model)
+
+
+class CheckpointMismatchError(Exception):
+    """Raised when resuming an evaluation whose configuration has changed."""
+
+
+class EvaluationRunner:
+    """Runs a prompt over a document x model grid with resumable checkpoints.
+
+    Every finished cell is appended to ``<name>.jsonl`` in the evaluations
+    directory as soon as it completes; ``<name>.json`` records the
+    configuration. Running the same name again skips the cells that completed
+    and retries the ones that failed, so an interrupted evaluation picks up
+    where it stopped.
+    """
+
+    def __init__(
+        self,
+        service: ExperimentService,
+        data_dir: str = VALIDATION_DATA_DIR,
+        checkpoint_dir: str = EVALUATIONS_DIR,
+        session_factory: Callable[[], DbSession] = AsyncSessionLocal,
+        catalog: Optional[DatasetCatalog] = None,
+    ):
+        self.service = service
+        # Documents are selected from the catalog's index and their files read through its cache
+        self.catalog = catalog if catalog is not None else DatasetCatalog(data_dir)
+        self.data_dir = self.catalog.data_dir
+        self.checkpoint_dir = checkpoint_dir
+        self.session_factory = session_factory
+
+    def manifest_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.json")
+
+    def checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.jsonl")
+
+    def select_documents(self, request: schemas.EvaluationCreate) -> List[DatasetDocument]:
+        return self.catalog.query(
+            domain=request.dataset,
+            document_ids=request.document_ids,
+            complexity=request.complexity,
+            tags=request.tags,
+        )
+
+    def load_checkpoint(self, name: str) -> Dict[Cell, Dict]:
+        """Read the finished cells of an evaluation, ignoring a torn last line."""
+        cells = {}
+        path = self.checkpoint_path(name)
+        if not os.path.exists(path):
+            return cells
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping incomplete checkpoint line in {path}")
+                    continue
+                cells[(record["document_id"], record["model"])] = record
+        return cells
+
+    def load_manifest(self, name: str) -> Optional[Dict]:
+        path = self.manifest_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def list_evaluations(self) -> List[str]:
+        if not os.path.isdir(self.checkpoint_dir):
+            return []
+        return sorted(
+            entry[:-len(".json")] for entry in os.listdir(self.checkpoint_dir)
+            if entry.endswith(".json")
+        )
+
+    def status(self, name: str) -> Optional[Dict]:
+        """Progress and per-model summary of an evaluation, read from its checkpoint."""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            return None
+        cells = self.load_checkpoint(name)
+        status = {
+            "name": name,
+            "total_cells": manifest["total_cells"],
+            "completed_cells": len(cells),
+            "summary": self.summarize(cells.values()),
+        }
+        if manifest["config"].get("adaptive"):
+            stopper = self._stopper(schemas.EvaluationCreate(**manifest["config"]), len(manifest["document_ids"]))
+            stopper.add_all(cells.values())
+            status["adaptive"] = stopper.report()
+        return status
+
+    @staticmethod
+    def _stopper(request: schemas.EvaluationCreate, documents: int) -> Optional[AdaptiveStopper]:
+        if request.adaptive is None:
+            return None
+        return AdaptiveStopper(request.adaptive, request.models, population=documents)
+
+    @staticmethod
+    def summarize(records) -> Dict[str, Dict]:
+        """Aggregate finished cells per model."""
+        summary: Dict[str, Dict] = {}
+        scores: Dict[str, List] = {}
+        for record in records:
+            stats = summary.setdefault(record["model"], {
+                "cells": 0, "errors": 0, "total_elapsed_time": 0.0, "total_tokens": 0,
+            })
+            stats["cells"] += 1
+            if record["status"] == "ERROR":
+                stats["errors"] += 1
+                continue
+            stats["total_elapsed_time"] += record["elapsed_time"]
+            stats["total_tokens"] += record["token_counts"]["total"]
+            scores.setdefault(record["model"], []).append(record.get("scores"))
+        for model, stats in summary.items():
+            succeeded = stats["cells"] - stats["errors"]
+            stats["mean_elapsed_time"] = (
+                stats["total_elapsed_time"] / succeeded if succeeded else None
+            )
+            stats.update(GraphScorer.summarize(scores.get(model, [])))
+        return summary
+
+    def plan(self, request: schemas.EvaluationCreate) -> List[Tuple[DatasetDocument, str]]:
+        """Select the documents, record the manifest and return the cells left to run.
+
+        Raises ValueError for an unknown dataset and CheckpointMismatchError
+        when the name was already used with another configuration.
+        """
+        documents = self.select_documents(request)
+        if request.adaptive is not None:
+            # Cells run in this order until the stopping rules end the evaluation
+            documents = stratified_order(documents, seed=request.adaptive.seed)
+        cells = [(doc, model) for doc in documents for model in request.models]
+        self._write_manifest(request, [doc.document_id for doc in documents], len(cells))
+
+        # Failed cells are retried; later checkpoint lines supersede earlier ones
+        finished = self.load_checkpoint(request.name)
+        pending = [
+            (doc, model) for doc, model in cells
+            if finished.get((doc.document_id, model), {}).get("status") != "COMPLETED"
+        ]
+        logger.info(
+            f"Evaluation {request.name}: {len(cells)} cells, "
+            f"{len(cells) - len(pending)} already done, {len(pending)} to run"
+        )
+        return pending
+
+    async def run(
+        self,
+        request: schemas.EvaluationCreate,
+        on_cell: Optional[Callable[[Dict], None]] = None,
+        pending: Optional[List[Tuple[DatasetDocument, str]]] = None,
+    ) -> Dict:
+        """Execute the pending cells and return the evaluation status.
+
+        ``pending`` is the result of a plan() call just made for the same
+        request; the evaluation is planned here when it is omitted. With
+        ``request.adaptive`` the cells run in stratified order and a model's
+        remaining cells are skipped once its stopping rule is met; cells
+        already in flight still finish and are recorded.
+        """
+        if pending is None:
+            pending = self.plan(request)
+        stopper = self._stopper(request, len(self.load_manifest(request.name)["document_ids"]))
+        if stopper is not None:
+            # A resumed evaluation picks up the estimates where it stopped
+            stopper.add_all(self.load_checkpoint(request.name).values())
+
+        client = self.service.new_client()
+        cells = iter(pending)
+        with open(self.checkpoint_path(request.name), "a+", encoding="utf-8") as checkpoint:
+            self._terminate_torn_line(checkpoint)
+
+            async def worker():
+                # Workers share the iterator, so cells start in plan order
+                for document, model in cells:
+                    if stopper is not None and not stopper.is_active(model):
+                        continue
+                    record = await self._run_cell(client, request, document, model)
+                    # Appends happen on the event loop, so lines never interleave
+                    checkpoint.write(json.dumps(record) + "\n")
+                    checkpoint.flush()
+                    if stopper is not None:
+                        stopper.add(record)
+                    if on_cell:
+                        on_cell(record)
+
+            workers = min(request.concurrency or EVALUATION_CONCURRENCY, len(pending))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+        return self.status(request.name)
+
+    async def _run_cell(
+        self,
+        client,
+        request: schemas.EvaluationCreate,
+        document: DatasetDocument,
+        model: str,
+    ) -> Dict:
+        messages = [
+            {"role": "system", "content": request.system_prompt},
+            {"role": "user", "content": self.render_prompt(request.user_prompt_template, document)},
+        ]
+        cached_text = await self._cached_response(request, model, messages)
+        try:
+            _, result, model_failed = await self.service.run_model(
+                client, model, messages, cached_text=cached_text
+            )
+        except Exception as e:
+            logger.exception(f"Evaluation cell {document.document_id} x {model} failed")
+            result, model_failed = {"response": f"Error: {e}", "elapsed_time": 0}, True
+
+        if not model_failed and cached_text is None:
+            await self._store_response(request, model, messages, result["response"])
+
+        scores = None
+        if not model_failed:
+            # Matching large graphs is CPU work; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            scores = await loop.run_in_executor(
+                None, self.score_response, result["response"], document
+            )
+
+        return {
+            "document_id": document.document_id,
+            "model": model,
+            "status": "ERROR" if model_failed else "COMPLETED",
+            "response": result["response"],
+            "elapsed_time": result["elapsed_time"],
+            "token_counts": result.get("token_counts", {"input": 0, "output": 0, "total": 0}),
+            "graph_metrics": result.get("graph_metrics"),
+            "scores": scores,
+            "cache_hit": result.get("cache_hit", False),
+            "completed_at": datetime.now().isoformat(),
+        }
+
+    @staticmethod
+    def _terminate_torn_line(checkpoint):
+        """Start on a fresh line if a previous run died mid-write."""
+        if checkpoint.tell() == 0:
+            return
+        checkpoint.seek(checkpoint.tell() - 1)
+        if checkpoint.read(1) != "\n":
+            checkpoint.write("\n")
+
+    @staticmethod
+    def score_response(response: str, document: DatasetDocument) -> Optional[Dict[str, float]]:
+        """Score a response against the document's ground truth, None if no graph is found.
+
+        Prose or code fences around the JSON are skipped, and a truncated
+        graph is scored on its complete elements.
+        """
+        parser = GraphStreamParser.parse(response, keep_elements=True)
+        if not parser.found:
+            return None
+        return GraphScorer.score(parser.graph(), document.read_ground_truth())
+
+    @staticmethod
+    def render_prompt(template: str, document: DatasetDocument) -> str:
+        return Template(template).safe_substitute(
+            source=document.read_source(),
+            document_id=document.document_id,
+            domain=document.domain,
+        )
+
+    async def _cached_response(self, request, model, messages) -> Optional[str]:
+        if not request.use_cache:
+            return None
+        key = self.service.cache.make_key(model, messages, DEFAULT_SAMPLING_PARAMS)
+        db = self.session_factory()
+        try:
+            found = await run_db(db, self.service.cache.get_many, [key])
+            return found.get(key)
+        finally:
+            await close_db(db)
+
+    async def _store_response(self, request, model, messages, response: str):
+        if not request.use_cache:
+            return
+        key = self.service.cache.make_key(model, messages, DEFAULT_SAMPLING_PARAMS)
+        db = self.session_factory()
+        try:
+            await run_db(db, self.service.cache.put_many, {key: {"model": model, "response": response}})
+        finally:
+            await close_db(db)
+
+    def _write_manifest(self, request: schemas.EvaluationCreate, document_ids: List[str], total_cells: int):
+        """Record the configuration, refusing to resume one that changed."""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        excluded = {"concurrency", "use_cache"}
+        if request.adaptive is None:
+            # Keeps the hash of evaluations started before adaptive sampling existed
+            excluded.add("adaptive")
+        config = request.model_dump(exclude=excluded)
+        config_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+        existing = self.load_manifest(request.name)
+        if existing is not None and existing["config_hash"] != config_hash:
+            raise CheckpointMismatchError(
+                f"Evaluation '{request.name}' was started with a different configuration; "
+                "use a new name to run it"
+            )
+
+        manifest = {
+            "name": request.name,
+            "config": config,
+            "config_hash": config_hash,
+            "document_ids": document_ids,
+            "total_cells": total_cells,
+            "created": existing["created"] if existing else datetime.now().isoformat(),
+        }
+        with open(self.manifest_path(request.name), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
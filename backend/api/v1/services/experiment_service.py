@@ -1,223 +1,727 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
 import time
 import aisuite as ai
 import logging
-import json
 
 from persistence import schemas
-from persistence.models import ExperimentRun, Parameter, ExperimentOutput
+from persistence.models import (
+    ExperimentRun, Parameter, ExperimentOutput, ModelResult,
+    MODEL_RESULT_FLAGS, MODEL_RESULT_METRICS,
+)
 from persistence import crud
-from ..utils.token_counter import count_tokens
-from ..utils.graph_analyzer import GraphAnalyzer
+from persistence.blobs import offload_outputs, output_texts
+from persistence.search import response_documents
+from persistence.session import DbSession, run_db
+from ..utils.token_counter import count_tokens, count_tokens_batch
+from ..utils.graph_stream_parser import GraphStreamParser
+from ..utils.metrics import MODEL_REQUESTS, MODELS_IN_FLIGHT, PROVIDER_RETRIES, TOKENS, model_label, stage
+from .completion_cache import CompletionCache, completion_cache
+from .fake_provider import with_fake_provider
+from .provider_pool import ProviderClientPool
+from .provider_scheduler import ProviderScheduler, RetryableProviderError, is_retryable
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of in-flight calls per provider, e.g. "openai=8,anthropic=2".
+# Providers without an explicit entry fall back to PROVIDER_CONCURRENCY.
+DEFAULT_PROVIDER_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "4"))
+PROVIDER_CONCURRENCY_LIMITS = os.getenv("PROVIDER_CONCURRENCY_LIMITS", "")
+# Size of the thread pool that runs the blocking provider SDK calls
+MAX_PROVIDER_WORKERS = int(os.getenv("MAX_PROVIDER_WORKERS", "16"))
+# Page size of the experiment listing, and the most a client may request
+DEFAULT_PAGE_SIZE = int(os.getenv("EXPERIMENT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("EXPERIMENT_MAX_PAGE_SIZE", "1000"))
+# Sampling parameters sent with every completion request
+DEFAULT_SAMPLING_PARAMS = {"temperature": 0.0}
+
+
+def parse_provider_limits(spec: str) -> Dict[str, int]:
+    """Parse a "provider=limit,provider=limit" string into a dict."""
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        provider, _, limit = item.partition("=")
+        limits[provider.strip()] = int(limit)
+    return limits
+
+
+def provider_of(model: str) -> str:
+    """Return the provider key of a "provider:model" identifier."""
+    return model.split(":", 1)[0]
+
+
+def sampling_params(experiment: schemas.ExperimentCreate) -> Dict[str, Any]:
+    """The defaults overridden by the request's own sampling parameters."""
+    return {**DEFAULT_SAMPLING_PARAMS, **(experiment.sampling or {})}
+
+
+def model_result_row(run_id: int, result: Dict, failed: bool) -> Dict:
+    """Typed model_results columns for one entry of a run's results."""
+    timings = result.get("timings", {})
+    graph_metrics = result.get("graph_metrics") or {}
+    row = {
+        "run_id": run_id,
+        "model": result["model"],
+        "status": "ERROR" if failed else "COMPLETED",
+        "input_tokens": result["token_counts"]["input"],
+        "output_tokens": None if failed else result["token_counts"]["output"],
+        "total_tokens": None if failed else result["token_counts"]["total"],
+        "elapsed_time": None if failed else result["elapsed_time"],
+        "cache_hit": result.get("cache_hit", False),
+        "graph_truncated": result.get("graph_truncated", False),
+    }
+    for metric in ("time_to_first_token", "inter_token_latency", "tokens_per_second"):
+        row[metric] = timings.get(metric)
+    for metric in ("node_count", "relationship_count", "node_property_count", "relationship_property_count"):
+        row[metric] = graph_metrics.get(metric)
+    return row
+
+
+def experiment_outputs(texts: Dict[str, str], results: List[ModelResult]) -> Dict[str, str]:
+    """Flatten text outputs (see persistence.blobs.output_texts) and model results into the ``{model}_{metric}`` API shape."""
+    outputs = dict(texts)
+    for result in results:
+        for metric in MODEL_RESULT_METRICS:
+            value = getattr(result, metric)
+            if value is not None:
+                outputs[f"{result.model}_{metric}"] = str(value)
+        for flag in MODEL_RESULT_FLAGS:
+            if getattr(result, flag):
+                outputs[f"{result.model}_{flag}"] = "true"
+    return outputs
+
+
 class ExperimentService:
-    async def run_experiment(self, experiment: schemas.ExperimentCreate, db: Session):
+    def __init__(
+        self,
+        default_concurrency: int = DEFAULT_PROVIDER_CONCURRENCY,
+        provider_limits: Optional[Dict[str, int]] = None,
+        max_workers: int = MAX_PROVIDER_WORKERS,
+        cache: CompletionCache = completion_cache,
+        client_factory: Optional[Callable[[], Any]] = None,
+        scheduler: Optional[ProviderScheduler] = None,
+        pool: Optional[ProviderClientPool] = None,
+    ):
+        self.cache = cache
+        self.client_factory = client_factory
+        self.pool = pool
+        self.scheduler = scheduler if scheduler is not None else ProviderScheduler()
+        self.default_concurrency = default_concurrency
+        self.provider_limits = (
+            provider_limits
+            if provider_limits is not None
+            else parse_provider_limits(PROVIDER_CONCURRENCY_LIMITS)
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="provider"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def new_client(self):
+        """Provider client for one run.
+
+        ``client_factory`` if given, else the shared ``pool``, else a new
+        aisuite client (plus fake models if enabled).
+        """
+        if self.client_factory is not None:
+            return self.client_factory()
+        if self.pool is not None:
+            return self.pool.get()
+        return with_fake_provider(ai.Client())
+
+    def _semaphore_for(self, model: str) -> asyncio.Semaphore:
+        provider = provider_of(model)
+        if provider not in self._semaphores:
+            limit = self.provider_limits.get(provider, self.default_concurrency)
+            self._semaphores[provider] = asyncio.Semaphore(limit)
+        return self._semaphores[provider]
+
+    async def run_experiment(self, experiment: schemas.ExperimentCreate, db: DbSession):
         logger.info(f"Received experiment request: {experiment}")
+        with stage("db_create_run"):
+            db_experiment = await run_db(db, lambda session: self.create_run(experiment, session))
+        return await self.execute_run(db_experiment, experiment, db)
+
+    def create_run(
+        self, experiment: schemas.ExperimentCreate, db: Session, parent_id: Optional[int] = None, commit: bool = True
+    ) -> ExperimentRun:
+        """Create the RUNNING experiment row together with its parameters in one commit.
+
+        ``parent_id`` makes the run a cell of a matrix experiment; with
+        ``commit=False`` the rows are only flushed, for the caller to commit.
+        """
+        # Log the experiment data before creating DB entry
+        logger.info(f"Creating experiment with data: {experiment.model_dump()}")
+
+        # Use crud function to create experiment
+        db_experiment = crud.create_experiment(db, experiment, commit=False, parent_id=parent_id)
+        logger.info(f"Created experiment in DB with ID: {db_experiment.id}")
+
+        # Save experiment parameters
+        parameters = [
+            Parameter(name="system_prompt", value=experiment.system_prompt, datatype="str"),
+            Parameter(name="user_prompt", value=experiment.user_prompt, datatype="str"),
+            Parameter(name="models", value=",".join(experiment.models), datatype="str"),
+        ]
+        if experiment.tags:
+            parameters.append(Parameter(name="tags", value=",".join(experiment.tags), datatype="str"))
+        if experiment.sampling:
+            parameters.append(Parameter(name="sampling", value=json.dumps(experiment.sampling), datatype="json"))
+        db_experiment.parameters.extend(parameters)
+        crud.index_run_texts(db, db_experiment.id, [
+            ("system_prompt", None, experiment.system_prompt),
+            ("user_prompt", None, experiment.user_prompt),
+        ])
+        if commit:
+            db.commit()
+        return db_experiment
+
+    async def execute_run(
+        self,
+        db_experiment: ExperimentRun,
+        experiment: schemas.ExperimentCreate,
+        db: DbSession,
+        progress: Optional[Callable[[str, str], None]] = None,
+        client=None,
+    ):
+        """Run every model of an existing experiment row and persist the outputs.
+
+        ``progress`` is called with ``(model, state)`` as each model starts
+        ("RUNNING") and finishes ("COMPLETED" or "ERROR"). All outputs of the
+        run are written in a single commit once every model has finished.
+        A ``client`` shared across runs is used instead of a new one.
+        """
         try:
-            # Configure client with explicit timeouts (in seconds)
-            client = ai.Client()
-            results = []
-            
-            # Log the experiment data before creating DB entry
-            logger.info(f"Creating experiment with data: {experiment.model_dump()}")
-            
-            # Use crud function to create experiment
-            db_experiment = crud.create_experiment(db, experiment)
-            logger.info(f"Created experiment in DB with ID: {db_experiment.id}")
-
-            # Save experiment parameters
-            parameters = [
-                Parameter(name="system_prompt", value=experiment.system_prompt, datatype="str"),
-                Parameter(name="user_prompt", value=experiment.user_prompt, datatype="str"),
-                Parameter(name="models", value=",".join(experiment.models), datatype="str"),
+            if client is None:
+                client = self.new_client()
+
+            messages = [
+                {"role": "system", "content": experiment.system_prompt},
+                {"role": "user", "content": experiment.user_prompt},
             ]
-            db_experiment.parameters.extend(parameters)
-            db.commit()
-            
+
+            with stage("db_cache_lookup"):
+                cached = await run_db(db, lambda session: self._lookup_cache(experiment, messages, session))
+
+            # Dispatch all models concurrently; gather preserves the order of
+            # experiment.models so results and output rows stay deterministic.
+            model_runs = await asyncio.gather(*(
+                self.run_model(
+                    client, model, messages, progress, cached_text=cached.get(model),
+                    sampling=sampling_params(experiment),
+                )
+                for model in experiment.models
+            ))
+
+            with stage("db_finish_run"):
+                summary = await run_db(
+                    db, lambda session: self._finish_run(db_experiment, experiment, session, model_runs)
+                )
+            with stage("db_cache_store"):
+                await run_db(
+                    db, lambda session: self._store_in_cache(experiment, messages, session, model_runs, cached)
+                )
+            return summary
+        except Exception as e:
+            logger.exception("Error processing experiment")
+            return await run_db(db, lambda session: self._fail_run(db_experiment, experiment, session, e))
+
+    async def stream_experiment(
+        self, experiment: schemas.ExperimentCreate, db: DbSession
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """Run an experiment, yielding ``(event, data)`` pairs as tokens arrive.
+
+        Events are "run" once the row exists, "token" for every streamed
+        chunk, "model_done" (or "model_error") as each model finishes and a
+        final "done" carrying the same summary run_experiment returns.
+        """
+        logger.info(f"Received streaming experiment request: {experiment}")
+        with stage("db_create_run"):
+            db_experiment = await run_db(db, lambda session: self.create_run(experiment, session))
+        yield "run", {"id": db_experiment.id, "models": experiment.models}
+
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+        finished = False
+        try:
+            client = self.new_client()
             messages = [
                 {"role": "system", "content": experiment.system_prompt},
                 {"role": "user", "content": experiment.user_prompt},
             ]
-            
-            has_error = False  # Track if any model had an error
-            
+            with stage("db_cache_lookup"):
+                cached = await run_db(db, lambda session: self._lookup_cache(experiment, messages, session))
+
             for model in experiment.models:
-                # Count input tokens
-                input_tokens = sum(
-                    count_tokens(msg["content"], model) for msg in messages
+                # Tokens are produced on provider threads; hop back onto the loop
+                def on_token(text: str, model: str = model):
+                    loop.call_soon_threadsafe(
+                        events.put_nowait, ("token", {"model": model, "delta": text})
+                    )
+
+                task = asyncio.create_task(
+                    self.run_model(
+                        client, model, messages,
+                        on_token=on_token, cached_text=cached.get(model),
+                        sampling=sampling_params(experiment),
+                    )
+                )
+                # Done callbacks run after any token callbacks already scheduled
+                task.add_done_callback(
+                    lambda t, model=model: events.put_nowait(("__done__", (model, t)))
                 )
-                
-                logger.info(f"Input tokens for {model}: {input_tokens}")
-                
+                tasks.append(task)
+
+            pending = len(tasks)
+            while pending:
+                event, data = await events.get()
+                if event != "__done__":
+                    yield event, data
+                    continue
+                pending -= 1
+                model, task = data
+                if task.exception() is not None:
+                    yield "model_error", {"model": model, "error": str(task.exception())}
+                else:
+                    yield "model_done", task.result()[1]
+
+            try:
+                model_runs = [task.result() for task in tasks]
+                with stage("db_finish_run"):
+                    summary = await run_db(
+                        db, lambda session: self._finish_run(db_experiment, experiment, session, model_runs)
+                    )
+                with stage("db_cache_store"):
+                    await run_db(
+                        db, lambda session: self._store_in_cache(experiment, messages, session, model_runs, cached)
+                    )
+            except Exception as e:
+                logger.exception("Error processing streaming experiment")
+                summary = await run_db(
+                    db, lambda session: self._fail_run(db_experiment, experiment, session, e)
+                )
+            finished = True
+            yield "done", summary
+        finally:
+            if not finished:
+                # The client went away mid-stream; don't leave the run RUNNING
+                for task in tasks:
+                    task.cancel()
+                await run_db(db, lambda session: self._fail_run(
+                    db_experiment, experiment, session,
+                    Exception("Stream closed before the experiment completed"),
+                ))
+
+    def _lookup_cache(
+        self,
+        experiment: schemas.ExperimentCreate,
+        messages: List[Dict[str, str]],
+        db: Session,
+    ) -> Dict[str, str]:
+        """Return cached responses by model, honoring the request's cache flags.
+
+        The hit bookkeeping is committed together with the run's outputs.
+        """
+        sampling = sampling_params(experiment)
+        if (
+            not experiment.use_cache
+            or experiment.refresh_cache
+            or not self.cache.is_cacheable(sampling)
+        ):
+            return {}
+        keys = {
+            model: self.cache.make_key(model, messages, sampling)
+            for model in experiment.models
+        }
+        found = self.cache.get_many(db, set(keys.values()), commit=False)
+        return {model: found[key] for model, key in keys.items() if key in found}
+
+    def _store_in_cache(
+        self,
+        experiment: schemas.ExperimentCreate,
+        messages: List[Dict[str, str]],
+        db: Session,
+        model_runs: List[Tuple[List[ExperimentOutput], Dict, bool]],
+        cached: Dict[str, str],
+    ):
+        """Cache the successful completions that were not served from the cache."""
+        sampling = sampling_params(experiment)
+        if not experiment.use_cache or not self.cache.is_cacheable(sampling):
+            return
+        self.cache.put_many(db, {
+            self.cache.make_key(result["model"], messages, sampling): {
+                "model": result["model"],
+                "response": result["response"],
+            }
+            for _, result, model_failed in model_runs
+            if not model_failed and result["model"] not in cached
+        })
+
+    def _finish_run(
+        self,
+        db_experiment: ExperimentRun,
+        experiment: schemas.ExperimentCreate,
+        db: Session,
+        model_runs: List[Tuple[List[ExperimentOutput], Dict, bool]],
+    ) -> Dict:
+        """Persist per-model outputs in model order and set the final status."""
+        results = []
+        result_rows = []
+        has_error = False  # Track if any model had an error
+        all_outputs = [output for outputs, _, _ in model_runs for output in outputs]
+        # Indexed while the responses are still plain text; large ones then go to the blob store
+        crud.index_run_texts(db, db_experiment.id, response_documents(all_outputs))
+        offload_outputs(db, all_outputs)
+        for outputs, result, model_failed in model_runs:
+            db_experiment.outputs.extend(outputs)
+            results.append(result)
+            result_rows.append(model_result_row(db_experiment.id, result, model_failed))
+            has_error = has_error or model_failed
+        crud.add_model_results(db, result_rows)
+
+        # Update experiment status only if no errors occurred
+        db_experiment.status = "ERROR" if has_error else "COMPLETED"
+        db.commit()
+
+        return {
+            "id": db_experiment.id,
+            "experiment_config": experiment.model_dump(),
+            "results": results,
+            "status": db_experiment.status,
+            "error_details": None
+        }
+
+    def _fail_run(
+        self,
+        db_experiment: ExperimentRun,
+        experiment: schemas.ExperimentCreate,
+        db: Session,
+        error: Exception,
+    ) -> Dict:
+        """Mark the run as failed with the error that aborted it."""
+        db_experiment.status = "ERROR"
+        error_output = ExperimentOutput(
+            output_name="error_details",
+            output_value=str(error),
+            output_datatype="str"
+        )
+        db_experiment.outputs.append(error_output)
+        db.commit()
+
+        return {
+            "id": db_experiment.id,
+            "experiment_config": experiment.model_dump(),
+            "results": [],
+            "status": "ERROR",
+            "error_details": str(error)
+        }
+
+    async def run_model(
+        self,
+        client,
+        model: str,
+        messages: List[Dict[str, str]],
+        progress: Optional[Callable[[str, str], None]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        cached_text: Optional[str] = None,
+        sampling: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[ExperimentOutput], Dict, bool]:
+        """Run a single model on the provider thread pool, bounded per provider.
+
+        Calls are paced by the scheduler's rate budgets and retried on
+        rate limits and transient failures. A streamed call is only retried
+        while none of its tokens have reached ``on_token``.
+        """
+        loop = asyncio.get_running_loop()
+        provider = provider_of(model)
+        emitted = False
+        if on_token is not None:
+            downstream = on_token
+
+            def on_token(text: str):
+                nonlocal emitted
+                emitted = True
+                downstream(text)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            can_retry = None
+            if cached_text is None and attempt < self.scheduler.max_attempts:
+                can_retry = lambda: not emitted  # noqa: E731
+            # Cache hits never reach the provider, so they skip its concurrency limit and budgets
+            limiter = self._semaphore_for(model) if cached_text is None else contextlib.nullcontext()
+            async with limiter:
+                if progress and attempt == 1:
+                    progress(model, "RUNNING")
+                if cached_text is None:
+                    input_tokens = 0
+                    if self.scheduler.tracks_tokens(model):
+                        input_tokens = sum(await loop.run_in_executor(
+                            self._executor, count_tokens_batch, [msg["content"] for msg in messages], model
+                        ))
+                    with stage("rate_limit_wait", model):
+                        await self.scheduler.acquire(model, input_tokens)
+                # Carry the context over so stage spans nest under the caller's span
+                context = contextvars.copy_context()
                 try:
-                    start_time = time.time()
-                    logger.info(f"Calling {model} with {input_tokens} input tokens")
+                    with MODELS_IN_FLIGHT.track_inprogress(provider=provider):
+                        outputs, result, model_failed = await loop.run_in_executor(
+                            self._executor, context.run, self._execute_model,
+                            client, model, messages, on_token, cached_text, can_retry, sampling,
+                        )
+                except RetryableProviderError as retryable:
+                    error = retryable.error
+                else:
+                    break
+            delay = self.scheduler.retry_delay(model, error, attempt)
+            PROVIDER_RETRIES.inc(provider=provider, model=model_label(model))
+            logger.warning(
+                f"Attempt {attempt} of {model} failed ({error}); retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+        if cached_text is None and not model_failed:
+            self.scheduler.record_success(model, result["token_counts"]["output"])
+        if attempt > 1:
+            result["attempts"] = attempt
+        if progress:
+            progress(model, "ERROR" if model_failed else "COMPLETED")
+        return outputs, result, model_failed
+
+    def _execute_model(
+        self,
+        client,
+        model: str,
+        messages: List[Dict[str, str]],
+        on_token: Optional[Callable[[str], None]] = None,
+        cached_text: Optional[str] = None,
+        can_retry: Optional[Callable[[], bool]] = None,
+        sampling: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[ExperimentOutput], Dict, bool]:
+        """Call a model and build its outputs. Blocking; runs in a worker thread.
+
+        When ``on_token`` is given the completion is streamed and every chunk
+        is passed to it as it arrives. ``cached_text`` short-circuits the
+        provider call with a response from the completion cache. Returns the
+        outputs to persist, the result entry for the response and whether the
+        model failed. A retryable failure raises RetryableProviderError
+        instead, as long as ``can_retry`` says another attempt may follow.
+        ``sampling`` defaults to DEFAULT_SAMPLING_PARAMS.
+        """
+        if sampling is None:
+            sampling = DEFAULT_SAMPLING_PARAMS
+        # Count input tokens; prompts shared across models are memoized
+        provider = provider_of(model)
+        with stage("count_input_tokens", model):
+            input_tokens = sum(
+                count_tokens_batch([msg["content"] for msg in messages], model)
+            )
+
+        logger.info(f"Input tokens for {model}: {input_tokens}")
+
+        # Graph metrics accumulate as a streamed response arrives; complete responses are parsed whole
+        graph_parser = GraphStreamParser()
+
+        try:
+            start_time = time.perf_counter()
+            logger.info(f"Calling {model} with {input_tokens} input tokens")
+            if cached_text is not None:
+                output_text = cached_text
+                timings = {}
+                with stage("parse_graph", model):
+                    graph_parser = GraphStreamParser.parse(output_text)
+                if on_token:
+                    on_token(cached_text)
+            elif on_token is None:
+                with stage("provider_call", model):
                     response = client.chat.completions.create(
                         model=model,
                         messages=messages,
-                        temperature=0.0,
+                        **sampling,
                     )
-                    elapsed_time = time.time() - start_time
-                    
-                    # Count output tokens
-                    output_text = response.choices[0].message.content
-                    output_tokens = count_tokens(output_text, model)
-                    
-                    logger.info(f"Output tokens for {model}: {output_tokens}")
-                    
-                    # Initialize base outputs
-                    outputs = [
-                        ExperimentOutput(
-                            output_name=f"{model}_response",
-                            output_value=output_text,
-                            output_datatype="str"
-                        ),
-                        ExperimentOutput(
-                            output_name=f"{model}_elapsed_time",
-                            output_value=str(elapsed_time),
-                            output_datatype="float"
-                        ),
-                        ExperimentOutput(
-                            output_name=f"{model}_input_tokens",
-                            output_value=str(input_tokens),
-                            output_datatype="int"
-                        ),
-                        ExperimentOutput(
-                            output_name=f"{model}_output_tokens",
-                            output_value=str(output_tokens),
-                            output_datatype="int"
-                        ),
-                        ExperimentOutput(
-                            output_name=f"{model}_total_tokens",
-                            output_value=str(input_tokens + output_tokens),
-                            output_datatype="int"
-                        ),
-                    ]
-                    
-                    # Analyze graph metrics
-                    try:
-                        graph_data = json.loads(output_text)
-                        graph_metrics = GraphAnalyzer.analyze_graph(graph_data)
-                        
-                        # Add graph metric outputs
-                        graph_outputs = [
-                            ExperimentOutput(
-                                output_name=f"{model}_{metric_name}",
-                                output_value=str(metric_value),
-                                output_datatype="int"
-                            )
-                            for metric_name, metric_value in graph_metrics.items()
-                        ]
-                        outputs.extend(graph_outputs)
-                    except json.JSONDecodeError:
-                        logger.warning(f"Could not parse JSON response from {model}")
-                    except Exception as graph_error:
-                        logger.warning(f"Error analyzing graph metrics for {model}: {str(graph_error)}")
-                    
-                    # Save all outputs to database
-                    db_experiment.outputs.extend(outputs)
-                    
-                    # Create result dictionary
-                    result = {
-                        "model": model,
-                        "response": output_text,
-                        "elapsed_time": elapsed_time,
-                        "token_counts": {
-                            "input": input_tokens,
-                            "output": output_tokens,
-                            "total": input_tokens + output_tokens
-                        }
-                    }
-                    results.append(result)
-                except Exception as model_error:
-                    has_error = True
-                    db_experiment.status = "ERROR"  # Set status to ERROR
-                    logger.exception(f"Error processing model {model}")
-                    
-                    # Build detailed error message including cause chain
-                    error_chain = []
-                    current_error = model_error
-                    while current_error is not None:
-                        error_msg = str(current_error)
-                        if hasattr(current_error, 'response'):
-                            error_msg += f"\nResponse status: {current_error.response.status_code}"
-                            error_msg += f"\nResponse body: {current_error.response.text}"
-                        error_chain.append(error_msg)
-                        current_error = current_error.__cause__
-
-                    detailed_error = "\nCaused by: ".join(error_chain)
-                    error_msg = f"Error with {model}:\n{detailed_error}"
-                    
-                    outputs = [
-                        ExperimentOutput(
-                            output_name=f"{model}_error",
-                            output_value=error_msg,
-                            output_datatype="str"
-                        ),
-                        ExperimentOutput(
-                            output_name=f"{model}_input_tokens",
-                            output_value=str(input_tokens),
-                            output_datatype="int"
-                        )
-                    ]
-                    db_experiment.outputs.extend(outputs)
-                    db.commit()
-                    
-                    # Add error result
-                    result = {
-                        "model": model,
-                        "response": f"Error: {error_msg}",
-                        "elapsed_time": 0,
-                        "token_counts": {
-                            "input": input_tokens,
-                            "output": 0,
-                            "total": input_tokens
-                        }
-                    }
-                    results.append(result)
-                    continue
-            
-            # Update experiment status only if no errors occurred
-            if not has_error:
-                db_experiment.status = "COMPLETED"
-            db.commit()
-            
-            return {
-                "id": db_experiment.id,
-                "experiment_config": experiment.model_dump(),
-                "results": results,
-                "status": db_experiment.status,
-                "error_details": None
-            }
-        except Exception as e:
-            logger.exception("Error processing experiment")
-            if 'db_experiment' in locals():
-                db_experiment.status = "ERROR"
-                error_output = ExperimentOutput(
-                    output_name="error_details",
-                    output_value=str(e),
+                output_text = response.choices[0].message.content
+                timings = {}
+                with stage("parse_graph", model):
+                    graph_parser = GraphStreamParser.parse(output_text or "")
+            else:
+                # Includes the incremental graph parsing of each chunk
+                with stage("provider_stream", model):
+                    output_text, timings = self._consume_stream(
+                        client, model, messages, start_time, on_token, graph_parser, sampling
+                    )
+            elapsed_time = time.perf_counter() - start_time
+
+            # Count output tokens
+            with stage("count_output_tokens", model):
+                output_tokens = count_tokens(output_text, model)
+            if cached_text is None:
+                TOKENS.inc(input_tokens, provider=provider, model=model_label(model), direction="input")
+                TOKENS.inc(output_tokens, provider=provider, model=model_label(model), direction="output")
+
+            logger.info(f"Output tokens for {model}: {output_tokens}")
+
+            # Metrics go to the typed model_results row; only the text is an output
+            outputs = [
+                ExperimentOutput(
+                    output_name=f"{model}_response",
+                    output_value=output_text,
                     output_datatype="str"
+                ),
+            ]
+
+            if timings:
+                # Separate prefill/queueing latency from generation throughput
+                generation_time = elapsed_time - timings["time_to_first_token"]
+                timings["tokens_per_second"] = (
+                    output_tokens / generation_time if generation_time > 0 else 0.0
                 )
-                db_experiment.outputs.append(error_output)
-                db.commit()
-                
-                return {
-                    "id": db_experiment.id,
-                    "experiment_config": experiment.model_dump(),
-                    "results": [],
-                    "status": "ERROR",
-                    "error_details": str(e)
+
+            # Graph metrics were computed while the response was parsed
+            graph_metrics = None
+            if graph_parser.found:
+                graph_metrics = graph_parser.metrics.as_dict()
+                if graph_parser.truncated:
+                    logger.warning(f"Graph JSON from {model} is truncated; metrics cover the complete elements")
+            else:
+                logger.warning(f"Could not find a JSON graph in the response from {model}")
+
+            # Create result dictionary
+            result = {
+                "model": model,
+                "response": output_text,
+                "elapsed_time": elapsed_time,
+                "token_counts": {
+                    "input": input_tokens,
+                    "output": output_tokens,
+                    "total": input_tokens + output_tokens
                 }
-            raise e
+            }
+            if timings:
+                result["timings"] = timings
+            if graph_metrics is not None:
+                result["graph_metrics"] = graph_metrics
+                if graph_parser.truncated:
+                    result["graph_truncated"] = True
+            if cached_text is not None:
+                result["cache_hit"] = True
+            MODEL_REQUESTS.inc(
+                provider=provider,
+                model=model_label(model),
+                outcome="completed" if cached_text is None else "cache_hit",
+            )
+            return outputs, result, False
+        except Exception as model_error:
+            if can_retry is not None and is_retryable(model_error) and can_retry():
+                raise RetryableProviderError(model_error) from model_error
+            logger.exception(f"Error processing model {model}")
+            MODEL_REQUESTS.inc(provider=provider, model=model_label(model), outcome="error")
+
+            # Build detailed error message including cause chain
+            error_chain = []
+            current_error = model_error
+            while current_error is not None:
+                error_msg = str(current_error)
+                if hasattr(current_error, 'response'):
+                    error_msg += f"\nResponse status: {current_error.response.status_code}"
+                    error_msg += f"\nResponse body: {current_error.response.text}"
+                error_chain.append(error_msg)
+                current_error = current_error.__cause__
+
+            detailed_error = "\nCaused by: ".join(error_chain)
+            error_msg = f"Error with {model}:\n{detailed_error}"
+
+            outputs = [
+                ExperimentOutput(
+                    output_name=f"{model}_error",
+                    output_value=error_msg,
+                    output_datatype="str"
+                ),
+            ]
+
+            # Add error result
+            result = {
+                "model": model,
+                "response": f"Error: {error_msg}",
+                "elapsed_time": 0,
+                "token_counts": {
+                    "input": input_tokens,
+                    "output": 0,
+                    "total": input_tokens
+                }
+            }
+            return outputs, result, True
+
+    @staticmethod
+    def _consume_stream(
+        client,
+        model: str,
+        messages: List[Dict[str, str]],
+        start_time: float,
+        on_token: Callable[[str], None],
+        graph_parser: Optional[GraphStreamParser] = None,
+        sampling: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        """Stream a completion, relaying chunks and timing them on a monotonic clock.
+
+        Chunks are also fed to ``graph_parser`` so graph metrics are ready
+        as soon as the stream ends.
+        """
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            **(DEFAULT_SAMPLING_PARAMS if sampling is None else sampling),
+        )
+        if hasattr(stream, "choices"):
+            # Providers without streaming support return the full completion
+            chunks = [stream.choices[0].message.content or ""]
+        else:
+            chunks = (
+                chunk.choices[0].delta.content or ""
+                for chunk in stream
+                if chunk.choices
+            )
+
+        parts = []
+        first_token_at = last_token_at = None
+        token_gaps = 0.0
+        for text in chunks:
+            if not text:
+                continue
+            now = time.perf_counter()
+            if first_token_at is None:
+                first_token_at = now
+            else:
+                token_gaps += now - last_token_at
+            last_token_at = now
+            parts.append(text)
+            on_token(text)
+            if graph_parser is not None:
+                graph_parser.feed(text)
+
+        if first_token_at is None:
+            first_token_at = last_token_at = time.perf_counter()
+        return "".join(parts), {
+            "time_to_first_token": first_token_at - start_time,
+            "inter_token_latency": token_gaps / max(len(parts) - 1, 1),
+        }
 
     def get_experiment(self, experiment_id: int, db: Session):
         experiment = crud.get_experiment(db, experiment_id)
         if experiment is None:
             raise Exception("Experiment not found")
-        
+
         return {
             "id": experiment.id,
             "name": experiment.name,
@@ -225,11 +729,32 @@ class ExperimentService:
             "description": experiment.description,
             "status": experiment.status,
             "parameters": {p.name: p.value for p in experiment.parameters},
-            "outputs": {o.output_name: o.output_value for o in experiment.outputs}
+            "outputs": experiment_outputs(
+                output_texts(db, experiment.outputs), crud.get_model_results(db, experiment.id)
+            )
         }
 
-    def list_experiments(self, db: Session):
-        experiments = crud.get_experiments(db)
+    def list_experiments(
+        self,
+        db: Session,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        model: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Return a page of run summaries and the cursor of the next page, if any."""
+        experiments = crud.get_experiments(
+            db, limit=limit + 1, cursor=cursor, status=status,
+            since=since, until=until, model=model, tag=tag,
+        )
+        next_cursor = None
+        if len(experiments) > limit:
+            experiments = experiments[:limit]
+            last = experiments[-1]
+            next_cursor = crud.encode_cursor(last.timestamp, last.id)
         return [
             {
                 "id": exp.id,
@@ -239,4 +764,4 @@ class ExperimentService:
                 "status": exp.status
             }
             for exp in experiments
-        ] 
\ No newline at end of file
+        ], next_cursor
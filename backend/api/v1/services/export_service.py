@@ -0,0 +1,210 @@
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List
+import importlib.util
+import json
+import logging
+import os
+
+from persistence import crud
+from persistence.blobs import load_texts
+from persistence.models import (
+    ExperimentOutput, ModelResult, Parameter,
+    MODEL_RESULT_FLAGS, MODEL_RESULT_METRICS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Runs read from the database per round trip
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+RESULT_COLUMNS = ("model", "status") + tuple(MODEL_RESULT_METRICS) + MODEL_RESULT_FLAGS
+
+
+class ExportFormatError(Exception):
+    """Raised for an unknown export format or one whose dependency is missing."""
+
+
+def check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise ExportFormatError(
+            f"Unknown export format '{export_format}', expected one of {', '.join(EXPORT_FORMATS)}"
+        )
+    # Columnar exports are optional; pyarrow itself is imported only when one is requested
+    if export_format != "ndjson" and importlib.util.find_spec("pyarrow") is None:
+        raise ExportFormatError(f"{export_format} export requires pyarrow to be installed")
+
+
+def iter_run_chunks(db: Session, chunk_size: int = EXPORT_CHUNK_SIZE, **filters) -> Iterator[List[Dict]]:
+    """Yield runs as dicts with parameters, text outputs and model results, a chunk at a time.
+
+    Each chunk costs four queries. Only plain rows are selected, so the
+    session's identity map does not grow with the export.
+    """
+    after_id = 0
+    while True:
+        runs = crud.get_experiment_chunk(db, after_id, chunk_size, **filters)
+        if not runs:
+            return
+        run_ids = [run.id for run in runs]
+        after_id = run_ids[-1]
+
+        parameters: Dict[int, Dict] = defaultdict(dict)
+        for run_id, name, value in db.query(Parameter.run_id, Parameter.name, Parameter.value).filter(
+            Parameter.run_id.in_(run_ids)
+        ):
+            parameters[run_id][name] = value
+        outputs: Dict[int, Dict] = defaultdict(dict)
+        blob_outputs = []
+        for run_id, name, value, blob_hash in db.query(
+            ExperimentOutput.run_id, ExperimentOutput.output_name,
+            ExperimentOutput.output_value, ExperimentOutput.blob_hash,
+        ).filter(ExperimentOutput.run_id.in_(run_ids)):
+            outputs[run_id][name] = value
+            if blob_hash is not None:
+                blob_outputs.append((run_id, name, blob_hash))
+        texts = load_texts(db, (blob_hash for _, _, blob_hash in blob_outputs))
+        for run_id, name, blob_hash in blob_outputs:
+            outputs[run_id][name] = texts.get(blob_hash, "")
+        results: Dict[int, List] = defaultdict(list)
+        for row in db.query(
+            ModelResult.run_id, *(getattr(ModelResult, column) for column in RESULT_COLUMNS)
+        ).filter(ModelResult.run_id.in_(run_ids)).order_by(ModelResult.id):
+            results[row[0]].append(dict(zip(RESULT_COLUMNS, row[1:])))
+
+        yield [
+            {
+                "id": run.id,
+                "name": run.name,
+                "timestamp": run.timestamp,
+                "description": run.description,
+                "status": run.status,
+                "parameters": parameters[run.id],
+                "outputs": outputs[run.id],
+                "results": results[run.id],
+            }
+            for run in runs
+        ]
+
+
+def iter_ndjson(db: Session, chunk_size: int = EXPORT_CHUNK_SIZE, **filters) -> Iterator[bytes]:
+    """One JSON object per run and line, encoded a chunk at a time."""
+    for chunk in iter_run_chunks(db, chunk_size, **filters):
+        yield "".join(
+            json.dumps(record, default=datetime.isoformat) + "\n" for record in chunk
+        ).encode("utf-8")
+
+
+def export_schema():
+    """One row per run and model; runs that failed before any model ran have a null model."""
+    import pyarrow as pa
+
+    metric_types = {float: pa.float64(), int: pa.int64()}
+    return pa.schema(
+        [
+            ("run_id", pa.int64()),
+            ("run_name", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("description", pa.string()),
+            ("run_status", pa.string()),
+            ("tags", pa.string()),
+            ("system_prompt", pa.string()),
+            ("user_prompt", pa.string()),
+            ("error_details", pa.string()),
+            ("model", pa.string()),
+            ("status", pa.string()),
+            ("response", pa.string()),
+            ("error", pa.string()),
+        ]
+        + [(metric, metric_types[cast]) for metric, cast in MODEL_RESULT_METRICS.items()]
+        + [(flag, pa.bool_()) for flag in MODEL_RESULT_FLAGS]
+    )
+
+
+def _flatten(chunk: List[Dict]) -> Dict[str, List]:
+    columns: Dict[str, List] = defaultdict(list)
+    for run in chunk:
+        parameters, outputs = run["parameters"], run["outputs"]
+        for result in run["results"] or [dict.fromkeys(RESULT_COLUMNS)]:
+            columns["run_id"].append(run["id"])
+            columns["run_name"].append(run["name"])
+            columns["timestamp"].append(run["timestamp"])
+            columns["description"].append(run["description"])
+            columns["run_status"].append(run["status"])
+            columns["tags"].append(parameters.get("tags"))
+            columns["system_prompt"].append(parameters.get("system_prompt"))
+            columns["user_prompt"].append(parameters.get("user_prompt"))
+            columns["error_details"].append(outputs.get("error_details"))
+            model = result["model"]
+            columns["response"].append(outputs.get(f"{model}_response") if model else None)
+            columns["error"].append(outputs.get(f"{model}_error") if model else None)
+            for column in RESULT_COLUMNS:
+                columns[column].append(result[column])
+    return columns
+
+
+class _ByteSink:
+    """Write-only file that hands over what was written since the last drain."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_columnar(
+    db: Session, export_format: str, chunk_size: int = EXPORT_CHUNK_SIZE, **filters
+) -> Iterator[bytes]:
+    """Stream Parquet (one row group per chunk) or an Arrow IPC stream with typed metric columns."""
+    check_format(export_format)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = export_schema()
+    sink = _ByteSink()
+    output = pa.PythonFile(sink, mode="w")
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(output, schema)
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+    try:
+        for chunk in iter_run_chunks(db, chunk_size, **filters):
+            columns = _flatten(chunk)
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(db: Session, export_format: str, chunk_size: int = EXPORT_CHUNK_SIZE, **filters) -> Iterator[bytes]:
+    check_format(export_format)
+    if export_format == "ndjson":
+        return iter_ndjson(db, chunk_size, **filters)
+    return iter_columnar(db, export_format, chunk_size, **filters)
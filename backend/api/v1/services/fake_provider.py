@@ -0,0 +1,288 @@
+"""Local stand-in for LLM providers, for load tests and offline development.
+
+With FAKE_PROVIDER_ENABLED set, models named ``fake:<profile>`` are answered
+in-process by FakeProviderClient instead of a paid API; every other model
+still goes through aisuite. A profile sets the latency distribution, the
+streaming token rate, how often calls fail or are rate limited and the size
+of the knowledge graph returned. Profile fields can be overridden inline,
+e.g. ``fake:typical?nodes=50&error_rate=0.2``.
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import parse_qsl
+import copy
+import json
+import math
+import os
+import random
+import threading
+import time
+
+from ..utils.token_counter import register_encoding
+
+# Serve "fake:<profile>" models locally. Off by default so production never answers with fakes.
+FAKE_PROVIDER_ENABLED = os.getenv("FAKE_PROVIDER_ENABLED", "false").lower() == "true"
+# Optional JSON file of extra profiles, {"name": {"ttft": 0.5, ...}}, merged over the built-ins
+FAKE_PROVIDER_PROFILES = os.getenv("FAKE_PROVIDER_PROFILES", "")
+# Seed for reproducible latencies, failures and graphs
+FAKE_PROVIDER_SEED = os.getenv("FAKE_PROVIDER_SEED")
+
+PROVIDER_KEY = "fake"
+
+
+class FakeProfile:
+    """Behaviour of one fake model.
+
+    Time to first token is log-normal with median ``ttft`` seconds and shape
+    ``ttft_sigma`` (0 makes it constant). Output then arrives at
+    ``tokens_per_second`` (0 means all at once). ``error_rate`` and
+    ``rate_limit_rate`` are per-call probabilities of a 500 and of a 429
+    carrying a ``retry_after`` header; ``truncate_rate`` cuts the JSON off
+    mid-way, as a model hitting its output limit does.
+    """
+
+    FIELDS = {
+        "ttft": float,
+        "ttft_sigma": float,
+        "tokens_per_second": float,
+        "error_rate": float,
+        "rate_limit_rate": float,
+        "retry_after": float,
+        "truncate_rate": float,
+        "nodes": int,
+    }
+
+    def __init__(
+        self,
+        ttft: float = 0.5,
+        ttft_sigma: float = 0.0,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        truncate_rate: float = 0.0,
+        nodes: int = 10,
+    ):
+        self.ttft = ttft
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.nodes = nodes
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "FakeProfile":
+        unknown = set(values) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fake profile fields: {', '.join(sorted(unknown))}")
+        return cls(**{name: cls.FIELDS[name](value) for name, value in values.items()})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "instant": {"ttft": 0.0, "nodes": 10},
+    "fast": {"ttft": 0.2, "ttft_sigma": 0.3, "tokens_per_second": 150, "nodes": 10},
+    "typical": {"ttft": 0.8, "ttft_sigma": 0.5, "tokens_per_second": 60, "nodes": 20},
+    "slow": {"ttft": 3.0, "ttft_sigma": 0.6, "tokens_per_second": 20, "nodes": 40},
+    "flaky": {
+        "ttft": 0.8, "ttft_sigma": 0.5, "tokens_per_second": 60, "nodes": 20,
+        "error_rate": 0.05, "rate_limit_rate": 0.1,
+    },
+}
+
+
+def load_profiles(path: str = FAKE_PROVIDER_PROFILES) -> Dict[str, Dict[str, Any]]:
+    profiles = {name: dict(values) for name, values in DEFAULT_PROFILES.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            profiles.update(json.load(f))
+    return profiles
+
+
+class FakeResponse:
+    """The parts of an HTTP response that provider error handling reads."""
+
+    def __init__(self, status_code: int, text: str, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeProviderError(Exception):
+    """A provider failure carrying its HTTP response, like the SDK errors aisuite surfaces."""
+
+    def __init__(self, message: str, status_code: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, json.dumps({"error": {"message": message}}), headers)
+
+
+def synthetic_graph(node_count: int, rng: Optional[random.Random] = None) -> Dict:
+    """A schema-shaped knowledge graph with three properties per node and about 1.5 edges per node."""
+    rng = rng or random.Random(0)
+    nodes = [
+        {
+            "id": f"n{i}",
+            "type": ("Company", "Person", "Fund", "Place")[i % 4],
+            "name": f"Entity {i}",
+            "properties": [
+                {"key": "founded", "value": 1990 + i % 35},
+                {"key": "public", "value": i % 2 == 0},
+                {"key": "summary", "value": f"Entity {i} appears in document {i % 50}"},
+            ],
+        }
+        for i in range(node_count)
+    ]
+    relationships = [
+        {
+            "source_id": f"n{rng.randrange(node_count)}",
+            "target_id": f"n{rng.randrange(node_count)}",
+            "type": ("INVESTED_IN", "FOUNDED", "LOCATED_IN")[i % 3],
+            "name": f"edge {i}",
+            "properties": [{"key": "year", "value": 2000 + i % 25}],
+        }
+        for i in range(node_count * 3 // 2)
+    ] if node_count else []
+    return {
+        "metadata": {"timestamp": "2024-05-01T00:00:00Z", "source": "fake", "date": "2024-05-01"},
+        "nodes": nodes,
+        "relationships": relationships,
+    }
+
+
+def graph_response(graph: Dict) -> str:
+    """A graph wrapped the way models tend to answer: prose, then a fenced JSON block."""
+    return (
+        "Here is the knowledge graph extracted from the document:\n\n```json\n"
+        + json.dumps(graph, indent=2)
+        + "\n```\n"
+    )
+
+
+def _pieces(text: str, size: int = 4) -> List[str]:
+    """Split text into token-sized pieces (about four characters, as BPE averages in English)."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class CharacterEncoding:
+    """Tokenizer of the fake models, matching the four-character pieces they stream.
+
+    Keeps token counting of ``fake:`` models offline, since tiktoken downloads its BPE files.
+    """
+
+    name = "fake-4-chars"
+
+    def encode(self, text: str, **kwargs) -> List[str]:
+        return _pieces(text)
+
+    def encode_batch(self, texts: Sequence[str], num_threads: int = 8, **kwargs) -> List[List[str]]:
+        return [_pieces(text) for text in texts]
+
+
+class FakeProviderClient:
+    """aisuite-compatible client answering ``fake:<profile>`` models locally.
+
+    Calls block for the simulated latency, just as the real SDK calls do on
+    the provider thread pool. Models of other providers are passed to
+    ``fallback`` (an ``aisuite.Client``), if one is given.
+    """
+
+    def __init__(
+        self,
+        fallback=None,
+        profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.fallback = fallback
+        self.profiles = profiles if profiles is not None else load_profiles()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_fallback(self, fallback) -> "FakeProviderClient":
+        """A client sharing this one's profiles and random stream that delegates to ``fallback``."""
+        client = copy.copy(self)
+        client.fallback = fallback
+        client.chat = SimpleNamespace(completions=SimpleNamespace(create=client.create))
+        return client
+
+    def profile_for(self, model_name: str) -> FakeProfile:
+        """Resolve "profile?field=value&..." to a FakeProfile."""
+        name, _, overrides = model_name.partition("?")
+        if name not in self.profiles:
+            raise ValueError(f"Unknown fake profile '{name}', expected one of {', '.join(self.profiles)}")
+        return FakeProfile.from_dict({**self.profiles[name], **dict(parse_qsl(overrides))})
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        provider, _, model_name = model.partition(":")
+        if provider != PROVIDER_KEY:
+            if self.fallback is None:
+                raise ValueError(f"No provider client for model '{model}'")
+            return self.fallback.chat.completions.create(model=model, messages=messages, **kwargs)
+
+        profile = self.profile_for(model_name)
+        with self._rng_lock:
+            roll = self._rng.random()
+            ttft = profile.ttft * (
+                math.exp(self._rng.gauss(0.0, profile.ttft_sigma)) if profile.ttft_sigma else 1.0
+            )
+            truncate = self._rng.random() < profile.truncate_rate
+            graph = synthetic_graph(profile.nodes, random.Random(self._rng.random()))
+
+        if roll < profile.rate_limit_rate:
+            raise FakeProviderError(
+                "Rate limit exceeded", 429, {"retry-after": f"{profile.retry_after:g}"}
+            )
+        text = graph_response(graph)
+        if truncate:
+            text = text[: len(text) // 2]
+        if kwargs.get("stream"):
+            return self._stream(text, ttft, profile, fail=roll < profile.rate_limit_rate + profile.error_rate)
+
+        time.sleep(ttft)
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            raise FakeProviderError("Internal server error", 500)
+        if profile.tokens_per_second:
+            time.sleep(len(_pieces(text)) / profile.tokens_per_second)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+    @staticmethod
+    def _stream(text: str, ttft: float, profile: FakeProfile, fail: bool) -> Iterator[SimpleNamespace]:
+        """Yield OpenAI-style chunks on schedule; a failing call errors once the stream opens."""
+        time.sleep(ttft)
+        if fail:
+            raise FakeProviderError("Internal server error", 500)
+        start = time.perf_counter()
+        for i, piece in enumerate(_pieces(text)):
+            if profile.tokens_per_second:
+                # Sleep only when ahead of schedule so slow consumers don't add drift
+                delay = start + i / profile.tokens_per_second - time.perf_counter()
+                if delay > 0.001:
+                    time.sleep(delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+_shared_client: Optional[FakeProviderClient] = None
+
+
+def with_fake_provider(client):
+    """Wrap a provider client so fake models are served locally, when FAKE_PROVIDER_ENABLED is set.
+
+    Every wrapper draws from one random stream, so a seeded process is
+    reproducible across runs.
+    """
+    global _shared_client
+    if not FAKE_PROVIDER_ENABLED:
+        return client
+    if _shared_client is None:
+        seed = int(FAKE_PROVIDER_SEED) if FAKE_PROVIDER_SEED is not None else None
+        _shared_client = FakeProviderClient(seed=seed)
+    return _shared_client.with_fallback(client)
+
+
+if FAKE_PROVIDER_ENABLED:
+    register_encoding(PROVIDER_KEY, CharacterEncoding())
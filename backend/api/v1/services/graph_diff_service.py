@@ -0,0 +1,100 @@
+"""Structural diffs between the graphs two runs (or two models) produced.
+
+A diff depends only on the two response texts, so it is cached under the
+pair of their content hashes: the same comparison opened again, or the same
+responses reached through other runs (cache hits, re-runs), is served
+without reading or parsing the outputs. Blob-backed outputs already carry
+their hash, so a cached diff of two large responses costs two row lookups.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+import os
+import threading
+
+from sqlalchemy.orm import Session
+
+from persistence import crud
+from persistence.blobs import content_hash, load_texts
+from ..utils.graph_diff import diff_graphs
+from ..utils.graph_stream_parser import GraphStreamParser
+
+# Number of computed diffs kept in memory
+GRAPH_DIFF_CACHE_SIZE = int(os.getenv("GRAPH_DIFF_CACHE_SIZE", "256"))
+
+
+class OutputNotFoundError(LookupError):
+    """The run has no response from the model (unknown run or model, or the model failed)."""
+
+
+class NoGraphError(ValueError):
+    """The response holds no JSON graph to compare."""
+
+
+class GraphDiffService:
+    """Computes graph diffs between stored responses, with an LRU cache keyed by their content hashes."""
+
+    def __init__(self, cache_size: int = GRAPH_DIFF_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _response(db: Session, experiment_id: int, model: str):
+        output = crud.get_output(db, experiment_id, f"{model}_response")
+        if output is None:
+            raise OutputNotFoundError(f"No response from {model} in experiment {experiment_id}")
+        return output
+
+    @staticmethod
+    def _output_hash(output) -> str:
+        if output.blob_hash is not None:
+            return output.blob_hash
+        return content_hash(output.output_value.encode("utf-8"))
+
+    @staticmethod
+    def _graph(db: Session, output, side: str) -> Tuple[Dict[str, Any], bool]:
+        text = output.output_value
+        if output.blob_hash is not None:
+            text = load_texts(db, [output.blob_hash]).get(output.blob_hash, "")
+        # Prose and code fences around the JSON are skipped; a truncated graph keeps its complete elements
+        parser = GraphStreamParser.parse(text, keep_elements=True)
+        if not parser.found:
+            raise NoGraphError(f"The {side} output contains no graph")
+        return parser.graph(), parser.truncated
+
+    def compare(
+        self, db: Session, before_id: int, before_model: str, after_id: int, after_model: str
+    ) -> Dict[str, Any]:
+        """Diff the response of ``before_model`` in run ``before_id`` against ``after_model`` in ``after_id``.
+
+        Raises OutputNotFoundError when either run has no response from the
+        model and NoGraphError when a response holds no graph.
+        """
+        before = self._response(db, before_id, before_model)
+        after = self._response(db, after_id, after_model)
+        key = (self._output_hash(before), self._output_hash(after))
+        sides = {
+            "before": {"experiment_id": before_id, "model": before_model, "hash": key[0]},
+            "after": {"experiment_id": after_id, "model": after_model, "hash": key[1]},
+        }
+
+        with self._lock:
+            diff = self._cache.get(key)
+            if diff is not None:
+                self._cache.move_to_end(key)
+        if diff is not None:
+            return {**sides, "cached": True, **diff}
+
+        before_graph, before_truncated = self._graph(db, before, "before")
+        after_graph, after_truncated = self._graph(db, after, "after")
+        diff = diff_graphs(before_graph, after_graph)
+        diff["truncated"] = {"before": before_truncated, "after": after_truncated}
+        with self._lock:
+            self._cache[key] = diff
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {**sides, "cached": False, **diff}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,166 @@
+from typing import Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+
+from persistence import schemas
+from persistence.base import AsyncSessionLocal
+from persistence.session import DbSession, close_db, run_db
+from persistence.models import ExperimentOutput
+from persistence import crud
+from .experiment_service import ExperimentService
+from ..utils.metrics import JOBS_QUEUED, JOBS_RUNNING
+
+logger = logging.getLogger(__name__)
+
+# Number of experiments executed concurrently in the background
+EXPERIMENT_JOB_WORKERS = int(os.getenv("EXPERIMENT_JOB_WORKERS", "2"))
+# Maximum number of submitted experiments waiting for a worker
+EXPERIMENT_JOB_QUEUE_SIZE = int(os.getenv("EXPERIMENT_JOB_QUEUE_SIZE", "100"))
+# Re-queue RUNNING experiments found at startup instead of marking them failed
+REQUEUE_ORPHANED_RUNS = os.getenv("REQUEUE_ORPHANED_RUNS", "true").lower() == "true"
+
+
+class QueueFullError(Exception):
+    """Raised when an experiment is submitted while the job queue is full."""
+
+
+class ExperimentJobQueue:
+    """Bounded in-process queue that executes experiments in the background."""
+
+    def __init__(
+        self,
+        service: ExperimentService,
+        session_factory: Callable[[], DbSession] = AsyncSessionLocal,
+        workers: int = EXPERIMENT_JOB_WORKERS,
+        max_queue_size: int = EXPERIMENT_JOB_QUEUE_SIZE,
+        requeue_orphans: bool = REQUEUE_ORPHANED_RUNS,
+    ):
+        self.service = service
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.requeue_orphans = requeue_orphans
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._progress: Dict[int, Dict[str, str]] = {}
+
+    async def start(self):
+        """Start the workers and pick up runs orphaned by a previous process."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        await self.recover_orphaned_runs()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"experiment-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} experiment workers (queue size {self.max_queue_size})")
+
+    async def stop(self):
+        """Cancel the workers. Unfinished runs stay RUNNING and are recovered on restart."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._queue is not None:
+            JOBS_QUEUED.dec(self._queue.qsize())
+            self._queue = None
+
+    async def submit(self, experiment: schemas.ExperimentCreate, db: DbSession) -> int:
+        """Create the experiment row and queue it, returning the run id.
+
+        Raises QueueFullError when the queue cannot accept more work, before
+        anything is written to the database.
+        """
+        if self._queue is None:
+            raise RuntimeError("Experiment job queue has not been started")
+        if self._queue.full():
+            raise QueueFullError("Experiment queue is full, try again later")
+        db_experiment = await run_db(db, lambda session: self.service.create_run(experiment, session))
+        if self._queue.full():
+            # Filled up while the row was being written; don't leave it RUNNING
+            await run_db(db, lambda session: self._fail_orphan(session, db_experiment, "Experiment queue is full"))
+            raise QueueFullError("Experiment queue is full, try again later")
+        self._enqueue(db_experiment.id, experiment)
+        return db_experiment.id
+
+    def progress(self, experiment_id: int) -> Optional[Dict[str, str]]:
+        """Return the per-model state of a queued or executing run."""
+        return self._progress.get(experiment_id)
+
+    def _enqueue(self, experiment_id: int, experiment: schemas.ExperimentCreate):
+        self._queue.put_nowait((experiment_id, experiment))
+        JOBS_QUEUED.inc()
+        self._progress[experiment_id] = {model: "PENDING" for model in experiment.models}
+
+    async def recover_orphaned_runs(self):
+        """Re-queue or fail experiments left RUNNING by a previous process."""
+        db = self.session_factory()
+        try:
+            await run_db(db, self._recover_orphaned_runs)
+        finally:
+            await close_db(db)
+
+    def _recover_orphaned_runs(self, db):
+        for run in crud.get_experiments_by_status(db, "RUNNING"):
+            experiment = self._experiment_from_run(run)
+            if self.requeue_orphans and experiment and not self._queue.full():
+                logger.info(f"Re-queueing orphaned experiment {run.id}")
+                self._enqueue(run.id, experiment)
+                continue
+            logger.warning(f"Marking orphaned experiment {run.id} as failed")
+            self._fail_orphan(db, run, "Experiment was interrupted by a server restart", commit=False)
+        db.commit()
+
+    @staticmethod
+    def _fail_orphan(db, run, reason: str, commit: bool = True):
+        run.status = "ERROR"
+        run.outputs.append(ExperimentOutput(
+            output_name="error_details",
+            output_value=reason,
+            output_datatype="str"
+        ))
+        if commit:
+            db.commit()
+
+    @staticmethod
+    def _experiment_from_run(run) -> Optional[schemas.ExperimentCreate]:
+        parameters = {p.name: p.value for p in run.parameters}
+        if not {"system_prompt", "user_prompt", "models"} <= parameters.keys():
+            return None
+        return schemas.ExperimentCreate(
+            name=run.name,
+            description=run.description,
+            system_prompt=parameters["system_prompt"],
+            user_prompt=parameters["user_prompt"],
+            models=parameters["models"].split(","),
+            tags=parameters["tags"].split(",") if parameters.get("tags") else None,
+            sampling=json.loads(parameters["sampling"]) if parameters.get("sampling") else None,
+        )
+
+    async def _worker(self):
+        while True:
+            experiment_id, experiment = await self._queue.get()
+            JOBS_QUEUED.dec()
+            JOBS_RUNNING.inc()
+            db = self.session_factory()
+            try:
+                db_experiment = await run_db(db, crud.get_experiment, experiment_id)
+                if db_experiment is None:
+                    logger.warning(f"Queued experiment {experiment_id} no longer exists")
+                    continue
+                await self.service.execute_run(
+                    db_experiment, experiment, db,
+                    progress=lambda model, state: self._set_progress(experiment_id, model, state),
+                )
+            except Exception:
+                logger.exception(f"Background experiment {experiment_id} failed")
+            finally:
+                await close_db(db)
+                JOBS_RUNNING.dec()
+                self._progress.pop(experiment_id, None)
+                self._queue.task_done()
+
+    def _set_progress(self, experiment_id: int, model: str, state: str):
+        if experiment_id in self._progress:
+            self._progress[experiment_id][model] = state
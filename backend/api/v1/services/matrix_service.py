@@ -0,0 +1,205 @@
+"""Experiment matrices: every combination of prompts, models and sampling parameters.
+
+A matrix is stored as a parent run with one child run ("cell") per prompt
+and sampling combination; each cell runs all of the matrix's models. Cells
+share one provider client, and the prompts' token counts are computed once
+per model up front instead of once per cell.
+"""
+from itertools import product
+from string import Template
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+
+from sqlalchemy.orm import Session
+
+from persistence import crud, schemas
+from persistence.base import AsyncSessionLocal
+from persistence.models import ExperimentRun, Parameter
+from persistence.session import DbSession, close_db, run_db
+from ..utils.metrics import stage
+from ..utils.token_counter import count_tokens_batch
+from .experiment_service import ExperimentService
+
+logger = logging.getLogger(__name__)
+
+# Largest matrix accepted in one request, counted in cells
+MATRIX_MAX_CELLS = int(os.getenv("MATRIX_MAX_CELLS", "500"))
+# Cells of one matrix run at once; provider concurrency limits still apply per call
+MATRIX_CONCURRENCY = int(os.getenv("MATRIX_CONCURRENCY", "8"))
+
+
+class MatrixTooLargeError(ValueError):
+    """Raised when a matrix expands to more than MATRIX_MAX_CELLS cells."""
+
+
+class TemplateSyntaxError(ValueError):
+    """Raised for a user prompt template with a malformed placeholder, e.g. a lone "$"."""
+
+
+def user_prompts_of(request: schemas.MatrixExperimentCreate) -> List[str]:
+    """Plain user prompts followed by every template filled in with every set of variables."""
+    prompts = list(request.user_prompts)
+    for template in request.user_prompt_templates:
+        for variables in request.template_variables:
+            try:
+                prompts.append(Template(template).substitute(variables))
+            except ValueError as e:
+                raise TemplateSyntaxError(f"Invalid user prompt template {template!r} ({e}); write $$ for a literal $")
+    return prompts
+
+
+def expand_matrix(
+    request: schemas.MatrixExperimentCreate, max_cells: int = MATRIX_MAX_CELLS
+) -> List[schemas.ExperimentCreate]:
+    """One ExperimentCreate per distinct (system prompt, user prompt, sampling) combination.
+
+    Duplicate prompts and models are dropped, so a cell is never run twice.
+    Raises KeyError for a template variable missing from a set of variables
+    and TemplateSyntaxError for a malformed template.
+    """
+    system_prompts = list(dict.fromkeys(request.system_prompts))
+    user_prompts = list(dict.fromkeys(user_prompts_of(request)))
+    models = list(dict.fromkeys(request.models))
+    names = sorted(request.sampling)
+    grid = [dict(zip(names, values)) for values in product(*(request.sampling[name] for name in names))]
+
+    cell_count = len(system_prompts) * len(user_prompts) * len(grid)
+    if cell_count > max_cells:
+        raise MatrixTooLargeError(f"Matrix has {cell_count} cells, more than the limit of {max_cells}")
+
+    name = request.name or "Unnamed Matrix"
+    cells = []
+    for (s, system_prompt), (u, user_prompt), sampling in product(
+        enumerate(system_prompts), enumerate(user_prompts), grid
+    ):
+        label = f"s{s + 1} u{u + 1}" + "".join(f" {key}={value}" for key, value in sampling.items())
+        cells.append(schemas.ExperimentCreate(
+            name=f"{name} [{label}]",
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            models=models,
+            tags=request.tags,
+            use_cache=request.use_cache,
+            sampling=sampling or None,
+        ))
+    return cells
+
+
+class MatrixRunner:
+    """Runs a matrix as a parent run and its cells, each cell on its own session."""
+
+    def __init__(
+        self,
+        service: ExperimentService,
+        session_factory: Callable[[], DbSession] = AsyncSessionLocal,
+        concurrency: int = MATRIX_CONCURRENCY,
+        max_cells: int = MATRIX_MAX_CELLS,
+    ):
+        self.service = service
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.max_cells = max_cells
+
+    async def run(self, request: schemas.MatrixExperimentCreate, db: DbSession) -> Dict[str, Any]:
+        """Create and execute the matrix, returning the parent's summary with every cell's."""
+        cells = expand_matrix(request, self.max_cells)
+        with stage("db_create_run"):
+            parent, runs = await run_db(db, lambda session: self.create_runs(request, cells, session))
+        logger.info(f"Running matrix {parent.id} with {len(cells)} cells of {len(cells[0].models)} models")
+
+        loop = asyncio.get_running_loop()
+        # Every cell would count the same prompts again; prime the memoized counts once per model
+        prompts = list(dict.fromkeys(text for cell in cells for text in (cell.system_prompt, cell.user_prompt)))
+        with stage("count_input_tokens"):
+            await asyncio.gather(*(
+                loop.run_in_executor(self.service._executor, count_tokens_batch, prompts, model)
+                for model in cells[0].models
+            ))
+
+        client = self.service.new_client()
+        semaphore = asyncio.Semaphore(request.concurrency or self.concurrency)
+
+        async def run_cell(run_id: int, cell: schemas.ExperimentCreate) -> Dict:
+            async with semaphore:
+                cell_db = self.session_factory()
+                try:
+                    run = await run_db(cell_db, crud.get_experiment, run_id)
+                    return await self.service.execute_run(run, cell, cell_db, client=client)
+                finally:
+                    await close_db(cell_db)
+
+        try:
+            # A failing cell must not abandon the others or leave the parent RUNNING
+            results = await asyncio.gather(
+                *(run_cell(run.id, cell) for run, cell in zip(runs, cells)), return_exceptions=True
+            )
+        except BaseException:
+            # Cancelled (client gone, shutdown): the cells are cancelled with it
+            await run_db(db, lambda session: self._finish(session, parent, "ERROR"))
+            raise
+        summaries, failed = [], []
+        for run, cell, result in zip(runs, cells, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Matrix {parent.id}: cell {run.id} failed: {result!r}")
+                failed.append(run)
+                result = {
+                    "id": run.id,
+                    "experiment_config": cell.model_dump(),
+                    "results": [],
+                    "status": "ERROR",
+                    "error_details": str(result),
+                }
+            summaries.append(result)
+        status = "COMPLETED" if all(summary["status"] == "COMPLETED" for summary in summaries) else "ERROR"
+        await run_db(db, lambda session: self._finish(session, parent, status, failed))
+        return {
+            "id": parent.id,
+            "experiment_config": request.model_dump(),
+            "status": status,
+            "cells": summaries,
+        }
+
+    def create_runs(
+        self, request: schemas.MatrixExperimentCreate, cells: List[schemas.ExperimentCreate], db: Session
+    ):
+        """The RUNNING parent and all of its cells, written in one commit."""
+        parent = crud.create_experiment(db, schemas.ExperimentCreate(
+            name=request.name or "Unnamed Matrix",
+            description=request.description,
+            system_prompt="",
+            user_prompt="",
+            models=cells[0].models,
+        ), commit=False)
+        parent.parameters.extend([
+            Parameter(name="models", value=",".join(cells[0].models), datatype="str"),
+            Parameter(name="matrix", value=request.model_dump_json(), datatype="json"),
+            Parameter(name="cells", value=str(len(cells)), datatype="int"),
+        ])
+        if request.tags:
+            parent.parameters.append(Parameter(name="tags", value=",".join(request.tags), datatype="str"))
+        runs = [self.service.create_run(cell, db, parent_id=parent.id, commit=False) for cell in cells]
+        db.commit()
+        return parent, runs
+
+    @staticmethod
+    def _finish(db: Session, parent: ExperimentRun, status: str, failed: List[ExperimentRun] = ()):
+        """Set the parent's final status, and mark cells that raised before recording their own."""
+        parent.status = status
+        for run in failed:
+            run.status = "ERROR"
+        db.commit()
+
+    @staticmethod
+    def list_cells(db: Session, parent_id: int) -> List[Dict[str, Any]]:
+        """Summaries of a matrix's cells with the parameters that tell them apart."""
+        return [
+            {
+                "id": run.id,
+                "name": run.name,
+                "status": run.status,
+                "parameters": {p.name: p.value for p in run.parameters},
+            }
+            for run in crud.get_child_experiments(db, parent_id)
+        ]
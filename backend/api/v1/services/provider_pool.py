@@ -0,0 +1,175 @@
+"""Process-wide provider client with pooled, kept-alive HTTP connections.
+
+aisuite creates one SDK client per provider the first time a model of that
+provider is called, and each SDK client owns an HTTP connection pool. A
+fresh ``ai.Client()`` per run therefore pays DNS, TCP and TLS setup on every
+experiment. ProviderClientPool keeps one aisuite client for the life of the
+process, so connections are reused across runs, and can open connections to
+the configured providers at startup.
+"""
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import asyncio
+import logging
+import os
+import threading
+
+import aisuite as ai
+from aisuite.provider import ProviderFactory
+
+from .fake_provider import with_fake_provider
+
+logger = logging.getLogger(__name__)
+
+# Providers to set up and connect to at startup, e.g. "openai,anthropic"
+PROVIDER_WARMUP = os.getenv("PROVIDER_WARMUP", "")
+# Seconds allowed for the warm-up connections before startup carries on without them
+PROVIDER_WARMUP_TIMEOUT = float(os.getenv("PROVIDER_WARMUP_TIMEOUT", "5.0"))
+# Idle connections kept open per provider, and for how many seconds
+PROVIDER_MAX_KEEPALIVE = int(os.getenv("PROVIDER_MAX_KEEPALIVE", "32"))
+PROVIDER_KEEPALIVE_SECONDS = float(os.getenv("PROVIDER_KEEPALIVE_SECONDS", "60"))
+
+# Providers whose SDK takes an ``http_client`` (httpx), so the pool settings can be applied
+HTTPX_PROVIDERS = {"openai", "anthropic", "groq", "cerebras", "deepseek", "sambanova", "inception"}
+
+
+def parse_providers(spec: str) -> List[str]:
+    return [provider.strip() for provider in spec.split(",") if provider.strip()]
+
+
+class _PooledCompletions:
+    """``chat.completions`` of the shared client.
+
+    aisuite sets providers up lazily without a lock, so two threads calling a
+    new provider at once would each build an SDK client and one connection
+    pool would leak. The pool sets each provider up exactly once instead.
+    """
+
+    def __init__(self, pool: "ProviderClientPool"):
+        self._pool = pool
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        self._pool.ensure_provider(model.split(":", 1)[0])
+        return self._pool.client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+
+class ProviderClientPool:
+    """One aisuite client shared by every run; safe to call from the provider thread pool.
+
+    ``client_factory`` builds the underlying client (default: ``ai.Client``
+    with pooled httpx clients), so tests and local stand-ins can replace it.
+    """
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable[[Dict[str, Dict[str, Any]]], Any]] = None,
+        warm_providers: Optional[Iterable[str]] = None,
+        max_keepalive: int = PROVIDER_MAX_KEEPALIVE,
+        keepalive_seconds: float = PROVIDER_KEEPALIVE_SECONDS,
+        warmup_timeout: float = PROVIDER_WARMUP_TIMEOUT,
+    ):
+        self.client_factory = client_factory or ai.Client
+        self.warm_providers = list(warm_providers) if warm_providers is not None else parse_providers(PROVIDER_WARMUP)
+        self.max_keepalive = max_keepalive
+        self.keepalive_seconds = keepalive_seconds
+        self.warmup_timeout = warmup_timeout
+        self._client = None
+        self._wrapped = None
+        self._http_clients: Dict[str, Any] = {}  # provider -> httpx.Client
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_PooledCompletions(self))
+
+    @property
+    def client(self):
+        """The underlying aisuite client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                # A fresh dict: ai.Client's default provider_configs is shared between instances
+                self._client = self.client_factory({})
+            return self._client
+
+    def ensure_provider(self, provider: str):
+        """Build the provider's SDK client once, under the lock, if the client sets providers up lazily.
+
+        SDKs built on httpx get a connection pool sized by the keep-alive settings.
+        """
+        client = self.client
+        providers = getattr(client, "providers", None)
+        if providers is None or provider in providers:
+            return
+        with self._lock:
+            if provider in providers:
+                return
+            config = dict(client.provider_configs.get(provider, {}))
+            if provider in HTTPX_PROVIDERS and "http_client" not in config:
+                # Imported here, like the SDKs themselves, to keep it out of startup
+                import httpx
+
+                config["http_client"] = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=None,
+                        max_keepalive_connections=self.max_keepalive,
+                        keepalive_expiry=self.keepalive_seconds,
+                    ),
+                    timeout=httpx.Timeout(600.0, connect=10.0),
+                )
+                self._http_clients[provider] = config["http_client"]
+            try:
+                providers[provider] = ProviderFactory.create_provider(provider, config)
+            except Exception:
+                http_client = self._http_clients.pop(provider, None)
+                if http_client is not None:
+                    http_client.close()
+                raise
+
+    def get(self):
+        """The client to give a run: this pool, serving fake models too when they are enabled."""
+        if self._wrapped is None:
+            self._wrapped = with_fake_provider(self)
+        return self._wrapped
+
+    def _warm(self, provider: str):
+        self.ensure_provider(provider)
+        sdk_client = getattr(getattr(self.client, "providers", {}).get(provider), "client", None)
+        http_client = self._http_clients.get(provider)
+        base_url = getattr(sdk_client, "base_url", None)
+        if http_client is not None and base_url is not None:
+            # Any response will do; the point is the TLS connection left in the pool
+            http_client.head(str(base_url))
+
+    async def start(self) -> Dict[str, str]:
+        """Set up the PROVIDER_WARMUP providers and open a connection to each, in parallel.
+
+        Failures (a missing API key, an unreachable host) are logged and
+        otherwise ignored; the provider is set up again on its first call.
+        Returns the outcome per provider.
+        """
+        if not self.warm_providers:
+            return {}
+        loop = asyncio.get_running_loop()
+        warmups = [loop.run_in_executor(None, self._warm, provider) for provider in self.warm_providers]
+        done, pending = await asyncio.wait(warmups, timeout=self.warmup_timeout)
+        outcomes = {}
+        for provider, warmup in zip(self.warm_providers, warmups):
+            if warmup in pending:
+                outcomes[provider] = f"not finished within {self.warmup_timeout}s"
+                logger.warning(f"Warm-up of {provider} did not finish within {self.warmup_timeout}s")
+            elif warmup.exception() is not None:
+                outcomes[provider] = f"failed: {warmup.exception()}"
+                logger.warning(f"Warm-up of {provider} failed: {warmup.exception()}")
+            else:
+                outcomes[provider] = "connected"
+                logger.info(f"Warmed up provider {provider}")
+        return outcomes
+
+    async def close(self):
+        """Close the pooled connections; the next call starts a new client."""
+        with self._lock:
+            http_clients = list(self._http_clients.values())
+            self._http_clients.clear()
+            self._client = None
+        for http_client in http_clients:
+            http_client.close()
+
+
+provider_pool = ProviderClientPool()
@@ -0,0 +1,251 @@
+"""Pacing and retrying of provider calls.
+
+Requests and tokens per minute are budgeted with token buckets per provider
+and per model. A 429 halves the throttled buckets' refill rate and pauses the
+provider until its Retry-After has passed; every success then wins back a
+little of the configured rate. Under a large batch calls therefore settle
+at the rate the provider actually sustains instead of alternating bursts
+and rejections. Retryable failures (429, 408, 5xx, connection errors) are
+retried with full-jitter exponential backoff.
+"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Budgets as "key=requests_per_minute/tokens_per_minute", either side may be empty,
+# e.g. "openai=500/200000,anthropic=50/40000" and "openai:gpt-4o=100/30000"
+PROVIDER_RATE_LIMITS = os.getenv("PROVIDER_RATE_LIMITS", "")
+MODEL_RATE_LIMITS = os.getenv("MODEL_RATE_LIMITS", "")
+# Attempts per model call, including the first, and the backoff bounds in seconds
+PROVIDER_MAX_ATTEMPTS = int(os.getenv("PROVIDER_MAX_ATTEMPTS", "4"))
+PROVIDER_RETRY_BASE_DELAY = float(os.getenv("PROVIDER_RETRY_BASE_DELAY", "1.0"))
+PROVIDER_RETRY_MAX_DELAY = float(os.getenv("PROVIDER_RETRY_MAX_DELAY", "60.0"))
+
+# Seconds of budget a bucket can save up; smaller bursts are gentler on provider-side smoothing
+BURST_SECONDS = 10.0
+# A throttled bucket never drops below this fraction of its configured rate
+MIN_RATE_FRACTION = 0.1
+# Fraction of the configured rate regained per successful call
+RECOVERY_FRACTION = 0.05
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+Limits = Tuple[Optional[float], Optional[float]]
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Limits]:
+    """Parse "key=rpm/tpm,key=rpm/tpm" into {key: (rpm, tpm)}; a missing side is None."""
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        key, _, budget = item.partition("=")
+        rpm, _, tpm = budget.partition("/")
+        limits[key.strip()] = (
+            float(rpm) if rpm.strip() else None,
+            float(tpm) if tpm.strip() else None,
+        )
+    return limits
+
+
+class TokenBucket:
+    """Budget refilling at ``per_minute / 60`` units per second, holding at most BURST_SECONDS of it.
+
+    The level may go negative: usage only known afterwards (output tokens)
+    is debited after the fact and delays later callers instead.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.configured_rate = per_minute / 60.0
+        self.rate = self.configured_rate
+        self.capacity = max(1.0, self.configured_rate * BURST_SECONDS)
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` may be taken (requests larger than the burst wait for a full bucket)."""
+        self._refill()
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def throttle(self):
+        """Multiplicative decrease after a rate limit; drop the saved-up burst too."""
+        self._refill()
+        self.rate = max(self.configured_rate * MIN_RATE_FRACTION, self.rate / 2)
+        self.level = min(self.level, 0.0)
+
+    def recover(self):
+        self.rate = min(self.configured_rate, self.rate + self.configured_rate * RECOVERY_FRACTION)
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    for candidate in (getattr(error, "status_code", None), getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After (or OpenAI's retry-after-ms) response header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds is not None:
+            return float(milliseconds) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, overload, server errors and transport failures, anywhere in the cause chain."""
+    current = error
+    while current is not None:
+        status = status_code_of(current)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES
+        name = type(current).__name__
+        if "Timeout" in name or "Connection" in name:
+            return True
+        current = current.__cause__
+    return False
+
+
+def _throttling_error(error: BaseException) -> Optional[BaseException]:
+    current = error
+    while current is not None:
+        if status_code_of(current) == 429:
+            return current
+        current = current.__cause__
+    return None
+
+
+class ProviderScheduler:
+    """Shared by every call of an ExperimentService; all methods run on the event loop."""
+
+    def __init__(
+        self,
+        provider_limits: Optional[Dict[str, Limits]] = None,
+        model_limits: Optional[Dict[str, Limits]] = None,
+        max_attempts: int = PROVIDER_MAX_ATTEMPTS,
+        base_delay: float = PROVIDER_RETRY_BASE_DELAY,
+        max_delay: float = PROVIDER_RETRY_MAX_DELAY,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ):
+        self.provider_limits = (
+            provider_limits if provider_limits is not None else parse_rate_limits(PROVIDER_RATE_LIMITS)
+        )
+        self.model_limits = model_limits if model_limits is not None else parse_rate_limits(MODEL_RATE_LIMITS)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._rng = rng or random.Random()
+        # key -> (request bucket, token bucket); keys are providers and full model ids
+        self._buckets: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self._paused_until: Dict[str, float] = {}
+
+    def _buckets_for(self, model: str) -> List[Tuple[Optional[TokenBucket], Optional[TokenBucket]]]:
+        provider = model.split(":", 1)[0]
+        buckets = []
+        for key, limits in ((provider, self.provider_limits), (model, self.model_limits)):
+            if key not in limits:
+                continue
+            if key not in self._buckets:
+                rpm, tpm = limits[key]
+                self._buckets[key] = (
+                    TokenBucket(rpm, self._clock) if rpm else None,
+                    TokenBucket(tpm, self._clock) if tpm else None,
+                )
+            buckets.append(self._buckets[key])
+        return buckets
+
+    def tracks_tokens(self, model: str) -> bool:
+        """Whether acquire needs a real input token count for this model."""
+        return any(tokens is not None for _, tokens in self._buckets_for(model))
+
+    async def acquire(self, model: str, input_tokens: int = 0) -> float:
+        """Wait until the model's budgets allow one request of ``input_tokens``; returns seconds waited."""
+        provider = model.split(":", 1)[0]
+        waited = 0.0
+        while True:
+            buckets = self._buckets_for(model)
+            delay = self._paused_until.get(provider, 0.0) - self._clock()
+            for requests, tokens in buckets:
+                if requests is not None:
+                    delay = max(delay, requests.wait_time(1))
+                if tokens is not None:
+                    delay = max(delay, tokens.wait_time(input_tokens))
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+            waited += delay
+        for requests, tokens in buckets:
+            if requests is not None:
+                requests.take(1)
+            if tokens is not None:
+                tokens.take(input_tokens)
+        return waited
+
+    def record_success(self, model: str, output_tokens: int = 0):
+        for requests, tokens in self._buckets_for(model):
+            if tokens is not None:
+                tokens.take(output_tokens)
+            for bucket in (requests, tokens):
+                if bucket is not None:
+                    bucket.recover()
+
+    def retry_delay(self, model: str, error: BaseException, attempt: int) -> float:
+        """Record a failed attempt (1-based) and return how long to back off before the next.
+
+        A rate limit pauses the whole provider until its Retry-After, so
+        concurrent calls stop piling on while it recovers.
+        """
+        # Full jitter spreads out callers that failed together
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        throttled = _throttling_error(error)
+        if throttled is not None:
+            retry_after = retry_after_of(throttled)
+            if retry_after is not None:
+                delay = min(self.max_delay, retry_after) + self._rng.uniform(0, self.base_delay / 4)
+            provider = model.split(":", 1)[0]
+            self._paused_until[provider] = max(self._paused_until.get(provider, 0.0), self._clock() + delay)
+            for bucket_pair in self._buckets_for(model):
+                for bucket in bucket_pair:
+                    if bucket is not None:
+                        bucket.throttle()
+        return delay
+
+
+class RetryableProviderError(Exception):
+    """Raised out of a model attempt that failed in a way worth retrying; wraps the provider error."""
+
+    def __init__(self, error: BaseException):
+        super().__init__(str(error))
+        self.error = error
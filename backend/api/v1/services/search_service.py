@@ -0,0 +1,80 @@
+"""Search over past runs by prompt wording or response text.
+
+Matching and ranking happen in the FTS5 index (persistence.search); the
+snippets are cut here from the matched texts, since the index is
+contentless and SQLite's snippet() needs the stored text.
+"""
+from typing import Dict, List, Optional
+import html
+import os
+import re
+
+from sqlalchemy.orm import Session
+
+from persistence import crud, search
+
+# Characters of context shown around the first match
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "160"))
+
+HIGHLIGHT_START, HIGHLIGHT_END = "<b>", "</b>"
+ELLIPSIS = "…"
+
+
+def make_snippet(text: str, terms: List[str], size: int = SEARCH_SNIPPET_CHARS, prefix: bool = False) -> str:
+    """About ``size`` characters of ``text`` around the first match of ``terms``, with matches highlighted.
+
+    The text is HTML-escaped, so the highlight tags are the only markup.
+    Whitespace is collapsed, so pretty-printed JSON reads as one line.
+    ``prefix`` lets the last term match the start of longer words.
+    """
+    if not terms:
+        return html.escape(" ".join(text[:size].split()))
+    alternatives = [re.escape(term) + r"\b" for term in terms]
+    if prefix:
+        alternatives[-1] = re.escape(terms[-1]) + r"\w*"
+    pattern = re.compile(r"\b(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+
+    match = pattern.search(text)
+    # Start a quarter of the window before the match, so the match has context on both sides
+    start = max(0, match.start() - size // 4) if match else 0
+    end = min(len(text), start + size)
+    window = " ".join(text[start:end].split())
+    parts, position = [], 0
+    for found in pattern.finditer(window):
+        parts.append(html.escape(window[position:found.start()]))
+        parts.append(f"{HIGHLIGHT_START}{html.escape(found.group(0))}{HIGHLIGHT_END}")
+        position = found.end()
+    parts.append(html.escape(window[position:]))
+    return (ELLIPSIS if start > 0 else "") + "".join(parts) + (ELLIPSIS if end < len(text) else "")
+
+
+def search_experiments(
+    db: Session,
+    query: str,
+    model: Optional[str] = None,
+    status: Optional[str] = None,
+    field: Optional[str] = None,
+    limit: int = 20,
+) -> List[Dict]:
+    """Runs matching ``query``, best first, each with a snippet of its best-matching text.
+
+    Raises ValueError when the query has no words to search for.
+    """
+    hits = crud.search_runs(db, query, model=model, status=status, field=field, limit=limit)
+    texts = search.document_texts(db, hits)
+    terms = search.query_terms(query)
+    prefix = query.rstrip().endswith("*")
+    return [
+        {
+            "id": hit["id"],
+            "name": hit["name"],
+            "timestamp": hit["timestamp"],
+            "status": hit["status"],
+            "field": hit["field"],
+            "model": hit["model"],
+            # bm25 scores are negative, lower being better; report higher-is-better
+            "score": round(-hit["rank"], 4),
+            "snippet": make_snippet(texts.get((hit["id"], hit["field"], hit["model"]), ""), terms, prefix=prefix),
+        }
+        for hit in hits
+    ]
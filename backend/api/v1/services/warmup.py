@@ -0,0 +1,64 @@
+"""Startup work that runs in the background, and the readiness it reports.
+
+Loading tokenizer encodings and connecting to providers makes the first
+experiments after a deploy fast, but need not hold up serving: the app is
+ready as soon as the database and job queue are, and /ready reports how far
+the warm-up has got.
+"""
+from typing import Any, Awaitable, Dict, List
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Models whose tokenizer encodings are loaded in the background at startup,
+# e.g. "openai:gpt-4o-mini,anthropic:claude-3-5-sonnet-20241022"
+PRELOAD_ENCODING_MODELS = os.getenv("PRELOAD_ENCODING_MODELS", "")
+
+
+class Warmup:
+    """Tracks background warm-up tasks by name, and whether the app is serving."""
+
+    def __init__(self):
+        self.ready = False
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._running: List[asyncio.Task] = []
+
+    def start(self, name: str, work: Awaitable):
+        """Run ``work`` in the background; its result (or error) ends up in status()."""
+        self.tasks[name] = {"state": "RUNNING"}
+        started = time.perf_counter()
+
+        async def run():
+            try:
+                result = await work
+            except Exception as e:
+                logger.warning(f"Warm-up task {name} failed: {e}")
+                self.tasks[name] = {"state": "ERROR", "error": str(e)}
+            else:
+                self.tasks[name] = {"state": "COMPLETED"}
+                if result:
+                    self.tasks[name]["result"] = result
+            self.tasks[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+        self._running.append(asyncio.create_task(run(), name=f"warmup-{name}"))
+
+    async def stop(self):
+        """Stop reporting ready and cancel unfinished warm-up tasks."""
+        self.ready = False
+        for task in self._running:
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        self._running = []
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warm": all(task["state"] != "RUNNING" for task in self.tasks.values()),
+            "warmup": self.tasks,
+        }
+
+
+warmup = Warmup()
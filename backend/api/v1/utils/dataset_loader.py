@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import json
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# validation_data/ lives next to the backend directory
+VALIDATION_DATA_DIR = os.getenv(
+    "VALIDATION_DATA_DIR", os.path.join(os.path.dirname(BACKEND_DIR), "validation_data")
+)
+
+SOURCE_FILE = "source.txt"
+GROUND_TRUTH_FILE = "ground_truth_graph.json"
+METADATA_FILE = "metadata.json"
+
+
+@dataclass
+class DatasetDocument:
+    """One validation document: validation_data/<domain>/<document_id>/."""
+
+    domain: str
+    document_id: str
+    path: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def complexity(self) -> Optional[str]:
+        return self.metadata.get("complexity")
+
+    @property
+    def tags(self) -> List[str]:
+        return self.metadata.get("tags", [])
+
+    def read_source(self) -> str:
+        with open(os.path.join(self.path, SOURCE_FILE), encoding="utf-8") as f:
+            return f.read()
+
+    def read_ground_truth(self) -> Dict[str, Any]:
+        with open(os.path.join(self.path, GROUND_TRUTH_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+
+def list_domains(data_dir: str = VALIDATION_DATA_DIR) -> List[str]:
+    if not os.path.isdir(data_dir):
+        return []
+    return sorted(
+        entry.name for entry in os.scandir(data_dir)
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
+
+
+def load_documents(
+    domain: str,
+    data_dir: str = VALIDATION_DATA_DIR,
+    document_ids: Optional[List[str]] = None,
+    complexity: Optional[List[str]] = None,
+    tags: Optional[List[str]] = None,
+) -> List[DatasetDocument]:
+    """Load the documents of a domain, optionally filtered.
+
+    A document matches ``tags`` when it carries any of them. Only
+    metadata.json is read here; source and ground truth load on demand.
+    """
+    domain_dir = os.path.join(data_dir, domain)
+    if not os.path.isdir(domain_dir):
+        raise ValueError(f"Unknown dataset '{domain}' in {data_dir}")
+
+    documents = []
+    for entry in sorted(os.scandir(domain_dir), key=lambda e: e.name):
+        if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, SOURCE_FILE)):
+            continue
+        if document_ids and entry.name not in document_ids:
+            continue
+        metadata = {}
+        metadata_path = os.path.join(entry.path, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+        document = DatasetDocument(domain, entry.name, entry.path, metadata)
+        if complexity and document.complexity not in complexity:
+            continue
+        if tags and not set(tags) & set(document.tags):
+            continue
+        documents.append(document)
+    return documents
@@ -1,5 +1,30 @@
 from typing import Dict, Any
 
+class GraphMetrics:
+    """Running totals behind GraphAnalyzer.analyze_graph, fed one element at a time."""
+
+    def __init__(self):
+        self.node_count = 0
+        self.relationship_count = 0
+        self.node_property_count = 0
+        self.relationship_property_count = 0
+
+    def add_node(self, node: Dict[str, Any]):
+        self.node_count += 1
+        self.node_property_count += len(node.get("properties", {}))
+
+    def add_relationship(self, relationship: Dict[str, Any]):
+        self.relationship_count += 1
+        self.relationship_property_count += len(relationship.get("properties", {}))
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "node_count": self.node_count,
+            "relationship_count": self.relationship_count,
+            "node_property_count": self.node_property_count,
+            "relationship_property_count": self.relationship_property_count
+        }
+
 class GraphAnalyzer:
     @staticmethod
     def analyze_graph(json_data: Dict[str, Any]) -> Dict[str, int]:
@@ -13,24 +38,9 @@ class GraphAnalyzer:
             - node_property_count: Total number of properties across all nodes
             - relationship_property_count: Total number of properties across all relationships
         """
-        nodes = json_data.get("nodes", [])
-        relationships = json_data.get("relationships", [])
-        
-        # Count total properties across all nodes
-        node_property_count = sum(
-            len(node.get("properties", {}))
-            for node in nodes
-        )
-        
-        # Count total properties across all relationships
-        relationship_property_count = sum(
-            len(rel.get("properties", {}))
-            for rel in relationships
-        )
-        
-        return {
-            "node_count": len(nodes),
-            "relationship_count": len(relationships),
-            "node_property_count": node_property_count,
-            "relationship_property_count": relationship_property_count
-        } 
\ No newline at end of file
+        metrics = GraphMetrics()
+        for node in json_data.get("nodes", []):
+            metrics.add_node(node)
+        for rel in json_data.get("relationships", []):
+            metrics.add_relationship(rel)
+        return metrics.as_dict()
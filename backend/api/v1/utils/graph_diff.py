@@ -0,0 +1,130 @@
+"""Structural diff of two knowledge graphs, e.g. the graphs two runs or two models produced.
+
+Nodes are paired with the GraphScorer matching and compared on their
+normalized properties, so formatting differences are not reported as changes.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Tuple
+
+from .graph_scorer import GraphScorer, normalize_label, normalize_value, relationship_endpoints
+
+
+def _properties(properties: Any) -> Dict[str, Tuple[str, Any]]:
+    """Normalized key -> (key as written, value as written), from either property layout."""
+    if isinstance(properties, list):
+        properties = {
+            item.get("key"): item.get("value")
+            for item in properties
+            if isinstance(item, dict) and "key" in item
+        }
+    if not isinstance(properties, dict):
+        return {}
+    return {normalize_label(key): (key, value) for key, value in properties.items()}
+
+
+def property_changes(before: Any, after: Any) -> Dict[str, Dict[str, Any]]:
+    """Properties added, removed or given a different value, as {key: {"before", "after"}}.
+
+    Values are compared in their normalized form, so 1000 and "1,000" or a
+    change of case are not reported.
+    """
+    before, after = _properties(before), _properties(after)
+    changes = {}
+    for key in before.keys() | after.keys():
+        old, new = before.get(key), after.get(key)
+        if old is not None and new is not None and normalize_value(old[1]) == normalize_value(new[1]):
+            continue
+        name = (new or old)[0]
+        changes[name] = {"before": old[1] if old else None, "after": new[1] if new else None}
+    return dict(sorted(changes.items()))
+
+
+def _similarity(matched: int, before: int, after: int) -> float:
+    """Matched elements over all distinct elements (Jaccard); 1.0 for two empty graphs."""
+    union = before + after - matched
+    return matched / union if union else 1.0
+
+
+def _summary(before: int, after: int, added: int, removed: int, changed: int) -> Dict[str, int]:
+    return {
+        "before": before,
+        "after": after,
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": before - removed - changed,
+    }
+
+
+def diff_graphs(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Structural diff of two knowledge graphs.
+
+    Nodes are paired the way GraphScorer matches them (exact type and name
+    first, then shared name tokens through its inverted index), so differing
+    ids or small renames do not show up as a removal plus an addition.
+    Relationships are paired on (source, type, target) after mapping the
+    ``before`` node ids onto their matched ``after`` ids.
+
+    Returns the added, removed and changed nodes and relationships, where a
+    change lists the properties that differ, and summary counts.
+    """
+    raw_before = [n for n in before.get("nodes", []) if isinstance(n, dict)]
+    raw_after = [n for n in after.get("nodes", []) if isinstance(n, dict)]
+    node_matches = GraphScorer.match_graph_nodes(raw_before, raw_after)
+
+    changed_nodes = []
+    for b, a in sorted(node_matches):
+        changes = property_changes(raw_before[b].get("properties", {}), raw_after[a].get("properties", {}))
+        renamed = raw_before[b].get("id") != raw_after[a].get("id")
+        if changes or renamed:
+            changed_nodes.append({
+                "before": {"id": raw_before[b].get("id"), "type": raw_before[b].get("type")},
+                "after": {"id": raw_after[a].get("id"), "type": raw_after[a].get("type")},
+                "properties": changes,
+            })
+    matched_before = {b for b, _ in node_matches}
+    matched_after = {a for _, a in node_matches}
+    id_map = {raw_before[b].get("id"): raw_after[a].get("id") for b, a in node_matches}
+
+    rels_before = [r for r in before.get("relationships", []) if isinstance(r, dict)]
+    rels_after = [r for r in after.get("relationships", []) if isinstance(r, dict)]
+    after_by_key: Dict[Hashable, List[int]] = defaultdict(list)
+    for index, rel in enumerate(rels_after):
+        source, target = relationship_endpoints(rel)
+        after_by_key[(source, normalize_label(rel.get("type", "")), target)].append(index)
+    removed_rels, changed_rels, paired_after = [], [], set()
+    for rel in rels_before:
+        source, target = relationship_endpoints(rel)
+        key = (id_map.get(source), normalize_label(rel.get("type", "")), id_map.get(target))
+        bucket = after_by_key.get(key)
+        if not bucket:
+            removed_rels.append(rel)
+            continue
+        index = bucket.pop(0)
+        paired_after.add(index)
+        changes = property_changes(rel.get("properties", {}), rels_after[index].get("properties", {}))
+        if changes:
+            source, target = relationship_endpoints(rels_after[index])
+            changed_rels.append({
+                "source": source,
+                "type": rels_after[index].get("type"),
+                "target": target,
+                "properties": changes,
+            })
+    added_rels = [rel for index, rel in enumerate(rels_after) if index not in paired_after]
+
+    added_nodes = [node for index, node in enumerate(raw_after) if index not in matched_after]
+    removed_nodes = [node for index, node in enumerate(raw_before) if index not in matched_before]
+    return {
+        "nodes": {"added": added_nodes, "removed": removed_nodes, "changed": changed_nodes},
+        "relationships": {"added": added_rels, "removed": removed_rels, "changed": changed_rels},
+        "summary": {
+            "nodes": _summary(len(raw_before), len(raw_after), len(added_nodes), len(removed_nodes), len(changed_nodes)),
+            "relationships": _summary(
+                len(rels_before), len(rels_after), len(added_rels), len(removed_rels), len(changed_rels)
+            ),
+            "property_changes": sum(len(change["properties"]) for change in changed_nodes + changed_rels),
+            "node_similarity": _similarity(len(node_matches), len(raw_before), len(raw_after)),
+            "relationship_similarity": _similarity(len(paired_after), len(rels_before), len(rels_after)),
+        },
+    }
@@ -0,0 +1,428 @@
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import heapq
+import re
+
+# Name tokens shared by more ground-truth nodes than this are too common to
+# propose fuzzy-match candidates (think "inc" or "capital")
+MAX_TOKEN_FREQUENCY = 50
+# Ambiguous groups larger than this are matched greedily instead of optimally
+MAX_ASSIGNMENT_SIZE = 200
+# Best-scoring candidates kept per node when matching greedily
+GREEDY_CANDIDATES = 8
+# Minimum similarity for two differently named nodes to be considered a match
+FUZZY_MATCH_THRESHOLD = 0.5
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_label(value: Any) -> str:
+    """Case- and punctuation-insensitive form of a type, key or relationship label."""
+    return _NON_ALNUM.sub("", str(value).lower())
+
+
+def normalize_value(value: Any) -> Any:
+    """Comparable form of a property value: numbers as floats, text collapsed."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = " ".join(str(value).lower().split())
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return text
+
+
+def normalize_properties(properties: Any) -> Dict[str, Any]:
+    """Accept both {"key": value} dicts and the schema's [{"key", "value"}] lists."""
+    if isinstance(properties, list):
+        properties = {
+            item.get("key"): item.get("value")
+            for item in properties
+            if isinstance(item, dict) and "key" in item
+        }
+    if not isinstance(properties, dict):
+        return {}
+    return {normalize_label(key): normalize_value(value) for key, value in properties.items()}
+
+
+def relationship_endpoints(relationship: Dict[str, Any]) -> Tuple[Any, Any]:
+    """(source, target) node ids of a relationship.
+
+    Model output follows the schema's ``source_id``/``target_id``; the
+    ground-truth files use ``source``/``target``.
+    """
+    source = relationship.get("source_id")
+    target = relationship.get("target_id")
+    return (
+        source if source is not None else relationship.get("source"),
+        target if target is not None else relationship.get("target"),
+    )
+
+
+def _name_tokens(name: str) -> List[str]:
+    return [token for token in (normalize_label(part) for part in name.split()) if token]
+
+
+def _f1(matched: int, predicted: int, expected: int) -> Tuple[float, float, float]:
+    precision = matched / predicted if predicted else (1.0 if not expected else 0.0)
+    recall = matched / expected if expected else (1.0 if not predicted else 0.0)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def optimal_assignment(scores: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """Maximum-weight assignment of rows to columns (Hungarian algorithm).
+
+    Returns (row, column) pairs; with a rectangular matrix the surplus rows or
+    columns stay unassigned.
+    """
+    rows = len(scores)
+    cols = len(scores[0]) if rows else 0
+    if not rows or not cols:
+        return []
+    transposed = rows > cols
+    if transposed:
+        scores = [list(column) for column in zip(*scores)]
+        rows, cols = cols, rows
+
+    # Minimise cost = -score with potentials u (rows) and v (columns); 1-based
+    inf = float("inf")
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (cols + 1)
+    owner = [0] * (cols + 1)
+    way = [0] * (cols + 1)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        min_slack = [inf] * (cols + 1)
+        used = [False] * (cols + 1)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            delta = inf
+            next_column = 0
+            for j in range(1, cols + 1):
+                if used[j]:
+                    continue
+                slack = -scores[current_row - 1][j - 1] - u[current_row] - v[j]
+                if slack < min_slack[j]:
+                    min_slack[j] = slack
+                    way[j] = column
+                if min_slack[j] < delta:
+                    delta = min_slack[j]
+                    next_column = j
+            for j in range(cols + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+
+    pairs = [(owner[j] - 1, j - 1) for j in range(1, cols + 1) if owner[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return pairs
+
+
+class _Node:
+    __slots__ = ("id", "type", "name", "properties", "tokens")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.id = raw.get("id")
+        self.properties = normalize_properties(raw.get("properties", {}))
+        self.type = normalize_label(raw.get("type", ""))
+        name = self.properties.get("name")
+        if not isinstance(name, str):
+            # Unnamed nodes (events, rounds) fall back to their id
+            name = str(self.id or "").replace("_", " ")
+        tokens = _name_tokens(name)
+        self.name = " ".join(tokens)
+        self.tokens = set(tokens)
+
+
+def _similarity(predicted: _Node, expected: _Node) -> float:
+    """Name-token overlap, nudged by agreement on the properties both nodes carry."""
+    union = predicted.tokens | expected.tokens
+    name_score = len(predicted.tokens & expected.tokens) / len(union) if union else 0.0
+    shared = (set(predicted.properties) & set(expected.properties)) - {"name"}
+    if not shared:
+        return name_score
+    agreeing = sum(1 for key in shared if predicted.properties[key] == expected.properties[key])
+    return 0.8 * name_score + 0.2 * agreeing / len(shared)
+
+
+def _signature(node: _Node) -> Hashable:
+    return node.name, frozenset(node.properties.items())
+
+
+def _features(node: _Node) -> List[Hashable]:
+    """Name tokens and property values; nodes sharing none are never greedy candidates."""
+    features: List[Hashable] = [("token", token) for token in node.tokens]
+    features.extend(("property", key, value) for key, value in node.properties.items() if key != "name")
+    return features
+
+
+class GraphScorer:
+    """Scores a predicted knowledge graph against a ground-truth graph.
+
+    Nodes are matched first on an exact (type, name) hash, then - within the
+    same type - through an inverted index over name tokens, with the optimal
+    assignment resolving ambiguous candidates. Relationships are compared as
+    (source, type, target) triples after mapping predicted node ids onto
+    their matched ground-truth ids.
+    """
+
+    @staticmethod
+    def score(predicted: Dict[str, Any], ground_truth: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Returns:
+            Dict containing precision, recall and F1 for nodes, relationships
+            (edge_*) and properties (property_*), plus the matched counts.
+        """
+        predicted_nodes = [_Node(n) for n in predicted.get("nodes", []) if isinstance(n, dict)]
+        expected_nodes = [_Node(n) for n in ground_truth.get("nodes", []) if isinstance(n, dict)]
+        node_matches = GraphScorer.match_nodes(predicted_nodes, expected_nodes)
+
+        id_map = {
+            predicted_nodes[p].id: expected_nodes[e].id
+            for p, e in node_matches
+        }
+        edge_pairs, predicted_edges, expected_edges = GraphScorer._match_edges(
+            predicted.get("relationships", []), ground_truth.get("relationships", []), id_map
+        )
+
+        # Properties are scored on matched elements, over all predicted/expected
+        property_matches = 0
+        for p, e in node_matches:
+            property_matches += GraphScorer._agreeing_properties(
+                predicted_nodes[p].properties, expected_nodes[e].properties
+            )
+        for predicted_props, expected_props in edge_pairs:
+            property_matches += GraphScorer._agreeing_properties(predicted_props, expected_props)
+        predicted_properties = sum(len(n.properties) for n in predicted_nodes) + sum(
+            len(props) for props in predicted_edges
+        )
+        expected_properties = sum(len(n.properties) for n in expected_nodes) + sum(
+            len(props) for props in expected_edges
+        )
+
+        metrics = {}
+        for prefix, matched, predicted_total, expected_total in (
+            ("node", len(node_matches), len(predicted_nodes), len(expected_nodes)),
+            ("edge", len(edge_pairs), len(predicted_edges), len(expected_edges)),
+            ("property", property_matches, predicted_properties, expected_properties),
+        ):
+            precision, recall, f1 = _f1(matched, predicted_total, expected_total)
+            metrics[f"{prefix}_precision"] = precision
+            metrics[f"{prefix}_recall"] = recall
+            metrics[f"{prefix}_f1"] = f1
+            metrics[f"{prefix}_matches"] = matched
+        return metrics
+
+    @staticmethod
+    def match_nodes(predicted: List[_Node], expected: List[_Node]) -> List[Tuple[int, int]]:
+        """Return (predicted index, expected index) pairs of matched nodes."""
+        matches: List[Tuple[int, int]] = []
+
+        # Pass 1: exact (type, name) buckets; ties inside a bucket go to the assignment
+        expected_by_key: Dict[Hashable, List[int]] = defaultdict(list)
+        for index, node in enumerate(expected):
+            expected_by_key[(node.type, node.name)].append(index)
+        predicted_by_key: Dict[Hashable, List[int]] = defaultdict(list)
+        for index, node in enumerate(predicted):
+            predicted_by_key[(node.type, node.name)].append(index)
+        for key, predicted_indexes in predicted_by_key.items():
+            expected_indexes = expected_by_key.get(key)
+            if expected_indexes:
+                matches.extend(GraphScorer._assign(predicted_indexes, expected_indexes, predicted, expected))
+
+        # Pass 2: remaining nodes of the same type that share a name token
+        matched_predicted = {p for p, _ in matches}
+        matched_expected = {e for _, e in matches}
+        token_index: Dict[Hashable, List[int]] = defaultdict(list)
+        for index, node in enumerate(expected):
+            if index not in matched_expected:
+                for token in node.tokens:
+                    token_index[(node.type, token)].append(index)
+
+        candidates: Dict[int, set] = {}
+        for index, node in enumerate(predicted):
+            if index in matched_predicted:
+                continue
+            found = set()
+            for token in node.tokens:
+                bucket = token_index.get((node.type, token), ())
+                if len(bucket) <= MAX_TOKEN_FREQUENCY:
+                    found.update(bucket)
+            if found:
+                candidates[index] = found
+
+        for predicted_group, expected_group in GraphScorer._components(candidates):
+            for p, e in GraphScorer._assign(predicted_group, expected_group, predicted, expected):
+                if _similarity(predicted[p], expected[e]) >= FUZZY_MATCH_THRESHOLD:
+                    matches.append((p, e))
+        return matches
+
+    @staticmethod
+    def match_graph_nodes(
+        predicted: List[Dict[str, Any]], expected: List[Dict[str, Any]]
+    ) -> List[Tuple[int, int]]:
+        """match_nodes over node dicts as they appear in a graph's "nodes" list."""
+        return GraphScorer.match_nodes([_Node(n) for n in predicted], [_Node(n) for n in expected])
+
+    @staticmethod
+    def _components(candidates: Dict[int, set]) -> List[Tuple[List[int], List[int]]]:
+        """Split the predicted -> expected candidate graph into connected groups."""
+        parent: Dict[Hashable, Hashable] = {}
+
+        def find(item):
+            parent.setdefault(item, item)
+            while parent[item] != item:
+                parent[item] = parent[parent[item]]
+                item = parent[item]
+            return item
+
+        for p, expected_indexes in candidates.items():
+            for e in expected_indexes:
+                parent[find(("p", p))] = find(("e", e))
+
+        groups: Dict[Hashable, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        for item in list(parent):
+            side, index = item
+            groups[find(item)][0 if side == "p" else 1].append(index)
+        return [(sorted(p), sorted(e)) for p, e in groups.values()]
+
+    @staticmethod
+    def _assign(
+        predicted_indexes: List[int],
+        expected_indexes: List[int],
+        predicted: List[_Node],
+        expected: List[_Node],
+    ) -> List[Tuple[int, int]]:
+        if len(predicted_indexes) == 1 and len(expected_indexes) == 1:
+            return [(predicted_indexes[0], expected_indexes[0])]
+        if max(len(predicted_indexes), len(expected_indexes)) > MAX_ASSIGNMENT_SIZE:
+            # Too large for the cubic assignment
+            return GraphScorer._assign_greedy(predicted_indexes, expected_indexes, predicted, expected)
+        scores = [
+            [_similarity(predicted[p], expected[e]) for e in expected_indexes]
+            for p in predicted_indexes
+        ]
+        return [(predicted_indexes[i], expected_indexes[j]) for i, j in optimal_assignment(scores)]
+
+    @staticmethod
+    def _assign_greedy(
+        predicted_indexes: List[int],
+        expected_indexes: List[int],
+        predicted: List[_Node],
+        expected: List[_Node],
+    ) -> List[Tuple[int, int]]:
+        """Near-linear approximation of the assignment for large groups.
+
+        Identical nodes are paired first. Each remaining predicted node is
+        scored only against the expected nodes sharing an uncommon name token
+        or property value, and its best few pairs compete greedily; the nodes
+        left over are paired in order.
+        """
+        pairs = []
+        by_signature: Dict[Hashable, List[int]] = defaultdict(list)
+        for e in reversed(expected_indexes):
+            by_signature[_signature(expected[e])].append(e)
+        remaining_predicted = []
+        for p in predicted_indexes:
+            bucket = by_signature.get(_signature(predicted[p]))
+            if bucket:
+                pairs.append((p, bucket.pop()))
+            else:
+                remaining_predicted.append(p)
+        used_predicted = {p for p, _ in pairs}
+        used_expected = {e for _, e in pairs}
+        remaining_expected = [e for e in expected_indexes if e not in used_expected]
+
+        feature_index: Dict[Hashable, List[int]] = defaultdict(list)
+        for e in remaining_expected:
+            for feature in _features(expected[e]):
+                feature_index[feature].append(e)
+        ranked = []
+        for p in remaining_predicted:
+            found = set()
+            for feature in _features(predicted[p]):
+                bucket = feature_index.get(feature, ())
+                if len(bucket) <= MAX_TOKEN_FREQUENCY:
+                    found.update(bucket)
+            ranked.extend(heapq.nlargest(
+                GREEDY_CANDIDATES, ((_similarity(predicted[p], expected[e]), p, e) for e in sorted(found))
+            ))
+        for _, p, e in sorted(ranked, reverse=True):
+            if p not in used_predicted and e not in used_expected:
+                used_predicted.add(p)
+                used_expected.add(e)
+                pairs.append((p, e))
+
+        pairs.extend(zip(
+            (p for p in remaining_predicted if p not in used_predicted),
+            (e for e in remaining_expected if e not in used_expected),
+        ))
+        return pairs
+
+    @staticmethod
+    def _match_edges(
+        predicted: List[Dict[str, Any]],
+        expected: List[Dict[str, Any]],
+        id_map: Dict[Any, Any],
+    ) -> Tuple[List[Tuple[Dict, Dict]], List[Dict], List[Dict]]:
+        """Match relationships on (source, type, target) after node id mapping.
+
+        Returns the matched (predicted, expected) property pairs and the
+        normalized properties of every predicted and expected relationship.
+        """
+        expected_by_key: Dict[Hashable, List[Dict]] = defaultdict(list)
+        expected_properties = []
+        for rel in expected:
+            if not isinstance(rel, dict):
+                continue
+            props = normalize_properties(rel.get("properties", {}))
+            expected_properties.append(props)
+            source, target = relationship_endpoints(rel)
+            key = (source, normalize_label(rel.get("type", "")), target)
+            expected_by_key[key].append(props)
+
+        pairs = []
+        predicted_properties = []
+        for rel in predicted:
+            if not isinstance(rel, dict):
+                continue
+            props = normalize_properties(rel.get("properties", {}))
+            predicted_properties.append(props)
+            source, target = (id_map.get(node_id) for node_id in relationship_endpoints(rel))
+            if source is None or target is None:
+                continue
+            bucket = expected_by_key.get((source, normalize_label(rel.get("type", "")), target))
+            if bucket:
+                pairs.append((props, bucket.pop()))
+        return pairs, predicted_properties, expected_properties
+
+    @staticmethod
+    def _agreeing_properties(predicted: Dict[str, Any], expected: Dict[str, Any]) -> int:
+        return sum(
+            1 for key, value in predicted.items()
+            if key in expected and expected[key] == value
+        )
+
+    @staticmethod
+    def summarize(scores: List[Optional[Dict[str, float]]]) -> Dict[str, Optional[float]]:
+        """Mean of each F1 score over the scored documents (None when unscored)."""
+        scored = [s for s in scores if s]
+        return {
+            f"mean_{name}": (sum(s[name] for s in scored) / len(scored) if scored else None)
+            for name in ("node_f1", "edge_f1", "property_f1")
+        }
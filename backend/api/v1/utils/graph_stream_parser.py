@@ -0,0 +1,220 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import re
+
+from .graph_analyzer import GraphMetrics
+
+# Top-level arrays whose elements are emitted, and the event name for each
+GRAPH_COLLECTIONS = {"nodes": "node", "relationships": "relationship"}
+
+_STRUCTURAL = re.compile(r'[{}\[\]":,]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NON_SPACE = re.compile(r"\S")
+# A "{" that opens an object: a key or the closing brace follows
+_OBJECT_START = re.compile(r'\{\s*["}]')
+_DECODER = json.JSONDecoder()
+
+
+class GraphStreamParser:
+    """Incremental parser for knowledge-graph JSON embedded in model output.
+
+    Text is fed chunk by chunk as it streams in. Leading prose and markdown
+    code fences are skipped until the JSON object starts, and each element of
+    the top-level ``nodes`` and ``relationships`` arrays is decoded as soon as
+    its closing brace arrives. Only the element currently being read is
+    buffered, so memory stays flat however long the output is; pass
+    ``keep_elements=True`` to also retain the decoded elements.
+
+    Graph metrics are updated as elements complete. If the output ends before
+    the JSON object closes, ``truncated`` is set and the metrics describe the
+    elements that were complete.
+    """
+
+    def __init__(self, keep_elements: bool = False):
+        self.keep_elements = keep_elements
+        self.metrics = GraphMetrics()
+        self.nodes: List[Dict[str, Any]] = []
+        self.relationships: List[Dict[str, Any]] = []
+        self.found = False  # a JSON object has started
+        self.complete = False  # ... and its closing brace was seen
+        self.invalid_elements = 0
+
+        self._seeking = True
+        self._root_pending = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_parts: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._collection: Optional[str] = None
+        self._element_parts: Optional[List[str]] = None
+        self._element_start = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.found and not self.complete
+
+    @classmethod
+    def parse(cls, text: str, keep_elements: bool = False) -> "GraphStreamParser":
+        """Parse a complete output in one go.
+
+        The graph object is decoded with a single json call; the incremental
+        parser only runs when that fails, i.e. for truncated or malformed
+        output, to recover the elements that are complete.
+        """
+        parser = cls(keep_elements=keep_elements)
+        if not parser._decode_complete(text):
+            parser.feed(text)
+        return parser
+
+    @classmethod
+    def parse_chunks(cls, chunks: Iterable[str], keep_elements: bool = False) -> "GraphStreamParser":
+        parser = cls(keep_elements=keep_elements)
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser
+
+    def graph(self) -> Dict[str, List[Dict[str, Any]]]:
+        """The retained elements as a graph dict (requires keep_elements)."""
+        return {"nodes": self.nodes, "relationships": self.relationships}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consume a chunk and return the ("node" | "relationship", element) pairs it completed."""
+        completed: List[Tuple[str, Dict[str, Any]]] = []
+        self._element_start = 0
+        position = 0
+        length = len(chunk)
+
+        while position < length and not self.complete:
+            if self._seeking:
+                brace = chunk.find("{", position)
+                if brace < 0:
+                    break
+                self._seeking = False
+                self._root_pending = True
+                self._depth = 1
+                position = brace + 1
+                continue
+
+            if self._root_pending:
+                # "{" only opens the graph if an object key (or "}") follows
+                match = _NON_SPACE.search(chunk, position)
+                if match is None:
+                    break
+                self._root_pending = False
+                if match.group() not in '"}':
+                    self._seeking = True
+                    self._depth = 0
+                    position = match.start()
+                    continue
+                self.found = True
+                position = match.start()
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._capture_key(chunk[position:position + 1])
+                    position += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, position)
+                if match is None:
+                    self._capture_key(chunk[position:])
+                    break
+                self._capture_key(chunk[position:match.start()])
+                if match.group() == "\\":
+                    self._escape = True
+                    self._capture_key("\\")
+                    position = match.end()
+                    continue
+                self._in_string = False
+                if self._key_parts is not None:
+                    self._last_string = "".join(self._key_parts)
+                    self._key_parts = None
+                position = match.end()
+                continue
+
+            match = _STRUCTURAL.search(chunk, position)
+            if match is None:
+                break
+            char = match.group()
+            position = match.end()
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._key_parts = []
+            elif char == ":":
+                if self._depth == 1:
+                    self._current_key = self._last_string
+            elif char == ",":
+                if self._depth == 1:
+                    self._current_key = None
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and char == "[" and self._current_key in GRAPH_COLLECTIONS:
+                    self._collection = GRAPH_COLLECTIONS[self._current_key]
+                elif self._depth == 3 and char == "{" and self._collection:
+                    self._element_parts = []
+                    self._element_start = match.start()
+            else:
+                self._depth -= 1
+                if self._depth == 2 and self._element_parts is not None:
+                    self._element_parts.append(chunk[self._element_start:position])
+                    element = self._finish_element()
+                    if element is not None:
+                        completed.append(element)
+                elif self._depth == 1:
+                    self._collection = None
+                elif self._depth == 0:
+                    self.complete = True
+
+        if self._element_parts is not None:
+            # Carry the unfinished element over to the next chunk
+            self._element_parts.append(chunk[self._element_start:])
+        return completed
+
+    def _decode_complete(self, text: str) -> bool:
+        """Decode the first JSON object in ``text`` whole; False, with nothing consumed, if it does not parse."""
+        match = _OBJECT_START.search(text)
+        if match is None:
+            return False
+        try:
+            graph, _ = _DECODER.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            return False
+        self._seeking = False
+        self.found = self.complete = True
+        for key, collection in GRAPH_COLLECTIONS.items():
+            elements = graph.get(key)
+            if isinstance(elements, list):
+                for element in elements:
+                    if isinstance(element, dict):
+                        self._add_element(collection, element)
+        return True
+
+    def _capture_key(self, text: str):
+        if self._key_parts is not None and text:
+            self._key_parts.append(text)
+
+    def _finish_element(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        text = "".join(self._element_parts)
+        self._element_parts = None
+        try:
+            element = json.loads(text)
+        except json.JSONDecodeError:
+            self.invalid_elements += 1
+            return None
+        self._add_element(self._collection, element)
+        return self._collection, element
+
+    def _add_element(self, collection: str, element: Dict[str, Any]):
+        if collection == "node":
+            self.metrics.add_node(element)
+            if self.keep_elements:
+                self.nodes.append(element)
+        else:
+            self.metrics.add_relationship(element)
+            if self.keep_elements:
+                self.relationships.append(element)
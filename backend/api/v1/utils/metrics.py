@@ -0,0 +1,374 @@
+"""In-process metrics in the Prometheus text exposition format, plus optional tracing spans.
+
+Recording is a dict lookup and a few additions under a per-metric lock, so
+instrumentation stays on in production. Label values must come from a
+small, bounded set (stage names, providers, route templates); model names
+come from requests, so they go through model_label.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import math
+import os
+import threading
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Tracing is optional
+    otel_trace = None
+
+# Set to "false" to turn every recording call into a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Emit an OpenTelemetry span per instrumented stage (requires opentelemetry-api)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true" and otel_trace is not None
+# Distinct models labelled by name; models seen after that many are recorded as "other"
+METRICS_MAX_MODELS = int(os.getenv("METRICS_MAX_MODELS", "50"))
+
+# Seconds; spans sub-millisecond parsing up to multi-minute completions
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+_labelled_models: Set[str] = set()
+_labelled_models_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def model_label(model: str) -> str:
+    """The value of a "model" label: the model itself, or "other" once METRICS_MAX_MODELS have been labelled."""
+    if not model or model in _labelled_models:
+        return model
+    with _labelled_models_lock:
+        if model in _labelled_models or len(_labelled_models) < METRICS_MAX_MODELS:
+            _labelled_models.add(model)
+            return model
+    return "other"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) triples for the exposition."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(
+            f"{self.name}{suffix}{labels} {_format_value(value)}"
+            for suffix, labels, value in self.samples()
+        )
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "_total", _format_labels(self.labelnames, key), value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the (unlabelled) value from ``function`` at scrape time."""
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self._function is not None:
+            yield "", "", self._function()
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def sum(self, **labels: str) -> float:
+        return self._sums.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        bucket_names = self.labelnames + ("le",)
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", _format_labels(bucket_names, key + (_format_value(bound),)), cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """Named metrics rendered together on /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "llm_eval_stage_duration_seconds",
+    "Time spent in each stage of a run (token counting, provider call, graph parsing, database).",
+    ("stage", "provider", "model"),
+)
+MODEL_REQUESTS = REGISTRY.counter(
+    "llm_eval_model_requests",
+    "Model calls by outcome (completed, error, cache_hit).",
+    ("provider", "model", "outcome"),
+)
+PROVIDER_RETRIES = REGISTRY.counter(
+    "llm_eval_provider_retries",
+    "Model calls retried after a rate limit or transient provider failure.",
+    ("provider", "model"),
+)
+TOKENS = REGISTRY.counter(
+    "llm_eval_tokens",
+    "Tokens sent to (input) and received from (output) models.",
+    ("provider", "model", "direction"),
+)
+MODELS_IN_FLIGHT = REGISTRY.gauge(
+    "llm_eval_model_requests_in_flight",
+    "Model calls currently running on the provider thread pool.",
+    ("provider",),
+)
+JOBS_QUEUED = REGISTRY.gauge(
+    "llm_eval_jobs_queued",
+    "Submitted experiments waiting for a background worker.",
+)
+JOBS_RUNNING = REGISTRY.gauge(
+    "llm_eval_jobs_running",
+    "Experiments being executed by background workers.",
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "llm_eval_http_request_duration_seconds",
+    "Time from request start until the response headers are sent.",
+    ("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "llm_eval_http_requests_in_flight",
+    "HTTP requests currently being handled.",
+)
+
+_tracer = otel_trace.get_tracer("llm_eval") if TRACING_ENABLED else None
+
+
+@contextmanager
+def stage(name: str, model: str = "", **attributes):
+    """Time a block into the stage histogram and, with tracing enabled, a span.
+
+    ``model`` is a "provider:model" identifier; the provider becomes its own label.
+    """
+    provider = model.split(":", 1)[0] if model else ""
+    span = (
+        _tracer.start_as_current_span(f"llm_eval.{name}", attributes={"model": model, **attributes})
+        if _tracer is not None
+        else nullcontext()
+    )
+    with span:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(
+                time.perf_counter() - start, stage=name, provider=provider, model=model_label(model)
+            )
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP latency by route template and the in-flight count.
+
+    Latency runs until the response headers are sent, so long-lived streams
+    count their setup rather than their whole lifetime.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500, "recorded": False}
+
+        def record():
+            if status["recorded"]:
+                return
+            status["recorded"] = True
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                # Unmatched paths share one label so they cannot blow up cardinality
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                record()
+            await send(message)
+
+        with HTTP_IN_FLIGHT.track_inprogress():
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                record()
@@ -1,10 +1,139 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Protocol, Sequence, Tuple
+
 import tiktoken
 
-def count_tokens(text: str, model: str) -> int:
-    """Count the number of tokens in a text string for a specific model."""
+# Encoding used for models tiktoken does not know about
+DEFAULT_ENCODING = "cl100k_base"
+# Number of (encoding, text) token counts kept in memory
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))
+
+# Keyed on a digest of the text, so cached counts of long prompts don't pin the prompts in memory
+_count_cache: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+
+class Encoding(Protocol):
+    """What token counting needs of an encoding; tiktoken.Encoding satisfies it."""
+
+    name: str
+
+    def encode(self, text: str, **kwargs) -> Sequence: ...
+
+    def encode_batch(self, texts: Sequence[str], num_threads: int = 8, **kwargs) -> List[Sequence]: ...
+
+
+# Encodings of providers tiktoken knows nothing about, by aisuite provider key
+_provider_encodings: Dict[str, Encoding] = {}
+
+
+def register_encoding(provider: str, encoding: Encoding):
+    """Count the tokens of ``<provider>:`` models with ``encoding`` instead of tiktoken."""
+    _provider_encodings[provider] = encoding
+    get_encoding.cache_clear()
+
+
+def normalize_model_name(model: str) -> str:
+    """Strip the aisuite provider prefix, e.g. "openai:gpt-4o-mini" -> "gpt-4o-mini"."""
+    return model.split(":", 1)[-1]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Encoding:
+    """Resolve (once per model name) the encoding for a model: a registered one, else tiktoken's."""
+    provider, _, _ = model.partition(":")
+    if provider in _provider_encodings:
+        return _provider_encodings[provider]
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(normalize_model_name(model))
     except KeyError:
         # Fall back to cl100k_base encoding for unknown models
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text)) 
\ No newline at end of file
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def _count_key(encoding, text: str) -> Tuple[str, bytes]:
+    return encoding.name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _cached_count(key: Tuple[str, bytes]):
+    with _count_cache_lock:
+        count = _count_cache.get(key)
+        if count is not None:
+            _count_cache.move_to_end(key)
+        return count
+
+
+def _store_count(key: Tuple[str, bytes], count: int):
+    with _count_cache_lock:
+        _count_cache[key] = count
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the number of tokens in a text string for a specific model."""
+    encoding = get_encoding(model)
+    key = _count_key(encoding, text)
+    count = _cached_count(key)
+    if count is None:
+        count = len(encoding.encode(text))
+        _store_count(key, count)
+    return count
+
+
+def count_tokens_batch(texts: Sequence[str], model: str, num_threads: int = 1) -> List[int]:
+    """Count tokens for many texts, encoding each distinct uncached text once.
+
+    Uncached texts are encoded with a single ``encode_batch`` call, which
+    spreads the work over ``num_threads`` threads.
+    """
+    encoding = get_encoding(model)
+    counts = {}
+    missing = []
+    for text in dict.fromkeys(texts):
+        count = _cached_count(_count_key(encoding, text))
+        if count is None:
+            missing.append(text)
+        else:
+            counts[text] = count
+
+    if missing:
+        encoded = encoding.encode_batch(missing, num_threads=max(1, num_threads))
+        for text, tokens in zip(missing, encoded):
+            counts[text] = len(tokens)
+            _store_count(_count_key(encoding, text), len(tokens))
+
+    return [counts[text] for text in texts]
+
+
+def preload_encodings(models: Iterable[str]) -> Dict[str, str]:
+    """Resolve and load the encodings of ``models`` ahead of their first count.
+
+    Loading a BPE file takes from a fraction of a second (cached on disk) to
+    a download; tiktoken serializes loads, so a request counting tokens
+    meanwhile waits for the one in progress. Returns each model's encoding
+    name; raises after trying every model if any failed.
+    """
+    loaded, failed = {}, {}
+    for model in models:
+        try:
+            encoding = get_encoding(model)
+            encoding.encode("warm up")
+            loaded[model] = encoding.name
+        except Exception as e:
+            failed[model] = f"{type(e).__name__}: {e}"
+    if failed:
+        raise RuntimeError(f"Could not load encodings: {failed}")
+    return loaded
+
+
+def clear_token_caches():
+    """Drop resolved encodings and memoized counts."""
+    get_encoding.cache_clear()
+    with _count_cache_lock:
+        _count_cache.clear()
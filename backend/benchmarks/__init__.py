@@ -0,0 +1 @@
+"""Reproducible micro-benchmarks of the backend hot paths; see __main__ for usage."""
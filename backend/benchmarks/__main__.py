@@ -0,0 +1,150 @@
+"""Micro-benchmarks for the backend hot paths.
+
+Run from the backend directory; everything is local, so it works offline
+(token counting needs tiktoken's BPE files in TIKTOKEN_CACHE_DIR, and is
+reported as skipped otherwise)::
+
+    python -m benchmarks run --output baseline.json
+    python -m benchmarks run --quick --output current.json --compare baseline.json
+    python -m benchmarks compare baseline.json current.json --threshold 0.1
+
+Comparisons exit with status 1 when any case regressed, so they can gate CI.
+
+``load`` drives the experiments endpoint at a fixed concurrency, either
+against a running server (start it with FAKE_PROVIDER_ENABLED=true to use
+``fake:<profile>`` models) or in-process on a scratch database::
+
+    python -m benchmarks load --in-process --concurrency 16 --requests 200
+    python -m benchmarks load --url http://localhost:8000 --duration 60 \
+        --models fake:typical fake:flaky --background
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from .harness import (
+    DEFAULT_THRESHOLD, compare_results, format_seconds, load_results, run_benchmarks, save_results,
+)
+
+
+def _print_case(case: str, result: dict):
+    if "skipped" in result:
+        print(f"{case:48} skipped: {result['skipped']}", file=sys.stderr)
+    else:
+        print(
+            f"{case:48} {format_seconds(result['median']):>10} median  "
+            f"{format_seconds(result['min']):>10} min  ({result['rounds']} x {result['loops']} loops)",
+            file=sys.stderr,
+        )
+
+
+def _print_comparison(rows, threshold: float) -> int:
+    regressions = 0
+    for row in rows:
+        marker = {"regression": "!!", "improvement": "++"}.get(row["status"], "  ")
+        print(
+            f"{marker} {row['case']:48} {format_seconds(row['baseline']):>10} -> "
+            f"{format_seconds(row['current']):>10}  x{row['ratio']:.2f}"
+        )
+        regressions += row["status"] == "regression"
+    print(f"{regressions} regression(s) beyond {threshold:.0%} in {len(rows)} compared case(s)")
+    return 1 if regressions else 0
+
+
+def run(args: argparse.Namespace) -> int:
+    from .suites import BENCHMARKS
+
+    document = run_benchmarks(
+        BENCHMARKS, quick=args.quick, pattern=args.filter,
+        repeat=args.repeat, min_time=args.min_time, report=_print_case,
+    )
+    if args.output:
+        save_results(document, args.output)
+    if args.compare:
+        return _print_comparison(
+            compare_results(load_results(args.compare), document, args.threshold), args.threshold
+        )
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    return _print_comparison(rows, args.threshold)
+
+
+def load(args: argparse.Namespace) -> int:
+    import httpx
+    from .load import DEFAULT_MODELS, drive, format_report, in_process_client
+
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+
+    async def main():
+        if args.in_process:
+            client_context = in_process_client()
+        else:
+            client_context = httpx.AsyncClient(base_url=args.url, timeout=None)
+        async with client_context as client:
+            return await drive(
+                client, args.models or DEFAULT_MODELS, args.concurrency,
+                requests=args.requests, duration=args.duration,
+                background=args.background, use_cache=args.use_cache,
+            )
+
+    summary = asyncio.run(main())
+    print(format_report(summary), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Backend micro-benchmarks")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--output", help="Write the results as JSON to this file")
+    run_parser.add_argument("--quick", action="store_true", help="Only the smaller sizes of each case")
+    run_parser.add_argument("-k", "--filter", help="Only cases whose name contains this string")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per case")
+    run_parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per round")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="Compare against saved results afterwards")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="Slowdown fraction counted as a regression")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subcommands.add_parser("compare", help="Compare two saved result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Slowdown fraction counted as a regression")
+    compare_parser.set_defaults(handler=compare)
+
+    load_parser = subcommands.add_parser("load", help="Load-test POST /api/v1/experiments/")
+    target = load_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running backend")
+    target.add_argument("--in-process", action="store_true", help="Run the app in this process on a scratch DB")
+    load_parser.add_argument("--models", nargs="+", help="Models per experiment (default: fake:typical fake:fast)")
+    load_parser.add_argument("--concurrency", type=int, default=8, help="Experiments in flight at once")
+    load_parser.add_argument("--requests", type=int, help="Stop after this many requests (default: 100)")
+    load_parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    load_parser.add_argument("--background", action="store_true",
+                             help="Queue runs with ?background=true and poll their status")
+    load_parser.add_argument("--use-cache", action="store_true", help="Let the completion cache answer repeats")
+    load_parser.add_argument("--output", help="Write the summary as JSON to this file")
+    load_parser.set_defaults(handler=load)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
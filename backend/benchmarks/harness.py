@@ -0,0 +1,157 @@
+"""Timing, result files and baseline comparison for the micro-benchmarks."""
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+
+RESULTS_FORMAT_VERSION = 1
+# A case is a regression when its median per-call time grows by more than this fraction
+DEFAULT_THRESHOLD = 0.15
+
+
+class SkipBenchmark(Exception):
+    """Raised by a setup function when a case cannot run here (e.g. missing offline data)."""
+
+
+class Benchmark:
+    """A named hot path measured once per parameter value.
+
+    ``setup(param)`` does the untimed preparation and returns the zero-argument
+    callable to time; an optional ``teardown`` callable may be returned as
+    well, as ``(call, teardown)``.
+    """
+
+    def __init__(self, name: str, setup: Callable, params: Iterable = (None,), quick_params: Iterable = None):
+        self.name = name
+        self.setup = setup
+        self.params = tuple(params)
+        self.quick_params = tuple(quick_params) if quick_params is not None else self.params
+
+    def cases(self, quick: bool = False) -> List[Tuple[str, object]]:
+        return [
+            (self.name if param is None else f"{self.name}[{param}]", param)
+            for param in (self.quick_params if quick else self.params)
+        ]
+
+
+def measure(call: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> Dict[str, float]:
+    """Per-call timings over ``repeat`` rounds, each looping ``call`` for at least ``min_time`` seconds.
+
+    Uses timeit, so garbage collection is paused while a round runs.
+    """
+    timer = timeit.Timer(call)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        # Aim a little past min_time so calibration settles in a step or two
+        number = max(number * 2, int(number * min_time * 1.2 / max(elapsed, 1e-9)))
+    rounds = [elapsed / number] + [timer.timeit(number) / number for _ in range(repeat - 1)]
+    return {
+        "min": min(rounds),
+        "median": statistics.median(rounds),
+        "mean": statistics.fmean(rounds),
+        "stdev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "loops": number,
+        "rounds": len(rounds),
+    }
+
+
+def environment() -> Dict[str, Optional[str]]:
+    """Where the numbers came from; comparisons across machines are meaningless."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "system": platform.platform(),
+    }
+
+
+def run_benchmarks(
+    benchmarks: Iterable[Benchmark],
+    quick: bool = False,
+    pattern: Optional[str] = None,
+    repeat: int = 5,
+    min_time: float = 0.05,
+    report: Callable[[str, Dict], None] = None,
+) -> Dict:
+    """Run every case whose name contains ``pattern`` and return the results document."""
+    results = {}
+    for benchmark in benchmarks:
+        for case, param in benchmark.cases(quick):
+            if pattern and pattern not in case:
+                continue
+            try:
+                prepared = benchmark.setup(param)
+            except SkipBenchmark as e:
+                results[case] = {"skipped": str(e)}
+            else:
+                call, teardown = prepared if isinstance(prepared, tuple) else (prepared, None)
+                try:
+                    results[case] = measure(call, repeat=repeat, min_time=min_time)
+                finally:
+                    if teardown is not None:
+                        teardown()
+            if report:
+                report(case, results[case])
+    return {"version": RESULTS_FORMAT_VERSION, "environment": environment(), "results": results}
+
+
+def save_results(document: Dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("version") != RESULTS_FORMAT_VERSION:
+        raise ValueError(f"{path} has results format {document.get('version')}, expected {RESULTS_FORMAT_VERSION}")
+    return document
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Median per-call time of every case measured in both documents, with a verdict.
+
+    ``status`` is "regression" or "improvement" when the ratio current/baseline
+    moves past ``1 ± threshold``, "unchanged" otherwise.
+    """
+    rows = []
+    for case, before in baseline["results"].items():
+        after = current["results"].get(case)
+        if after is None or "median" not in before or "median" not in after:
+            continue
+        ratio = after["median"] / before["median"] if before["median"] else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        rows.append({
+            "case": case, "baseline": before["median"], "current": after["median"],
+            "ratio": ratio, "status": status,
+        })
+    return rows
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
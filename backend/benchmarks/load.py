@@ -0,0 +1,179 @@
+"""Closed-loop load generator for POST /api/v1/experiments/.
+
+``concurrency`` clients each submit an experiment, wait for it to finish
+and submit the next, until ``requests`` have been sent or ``duration``
+seconds have passed. Pair it with the fake provider to size a deployment
+without calling a paid API.
+"""
+from typing import Dict, List, Optional
+import asyncio
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+DEFAULT_MODELS = ["fake:typical", "fake:fast"]
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadReport:
+    """Outcomes of every request, summarized into throughput, latency and error rates."""
+
+    def __init__(self):
+        self.latencies: List[float] = []  # successful requests only
+        self.outcomes: Dict[str, int] = {}
+        self.model_calls = 0
+        self.model_errors = 0
+        self.rate_limited = 0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, outcome: str, latency: Optional[float] = None):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def record_models(self, errors: List[str], total: int):
+        self.model_calls += total
+        self.model_errors += len(errors)
+        self.rate_limited += sum("Response status: 429" in error for error in errors)
+
+    def summary(self) -> Dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        requests = sum(self.outcomes.values())
+        latencies = sorted(self.latencies)
+        return {
+            "requests": requests,
+            "duration": elapsed,
+            "throughput": requests / elapsed if elapsed > 0 else 0.0,
+            "outcomes": dict(sorted(self.outcomes.items())),
+            "error_rate": 1 - self.outcomes.get("ok", 0) / requests if requests else 0.0,
+            "model_calls": self.model_calls,
+            "model_error_rate": self.model_errors / self.model_calls if self.model_calls else 0.0,
+            "rate_limited": self.rate_limited,
+            "latency": {
+                "mean": statistics.fmean(latencies) if latencies else None,
+                **{f"p{pct}": percentile(latencies, pct) for pct in PERCENTILES},
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+
+async def _wait_for_run(client: httpx.AsyncClient, experiment_id: int, poll_interval: float) -> Dict:
+    while True:
+        response = await client.get(f"/api/v1/experiments/{experiment_id}/status")
+        response.raise_for_status()
+        status = response.json()
+        if status["status"] != "RUNNING":
+            return status
+        await asyncio.sleep(poll_interval)
+
+
+async def _one_request(
+    client: httpx.AsyncClient, payload: Dict, report: LoadReport, background: bool, poll_interval: float
+):
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/v1/experiments/", json=payload, params={"background": "true"} if background else None
+        )
+        if response.status_code >= 400:
+            report.record(f"http_{response.status_code}")
+            return
+        if background:
+            status = await _wait_for_run(client, response.json()["id"], poll_interval)
+            # The status endpoint has states, not messages, so rate limits are not told apart here
+            errors = [model for model, state in status["models"].items() if state == "ERROR"]
+            report.record_models(errors, len(status["models"]))
+            run_status = status["status"]
+        else:
+            body = response.json()
+            errors = [r["response"] for r in body["results"] if r["response"].startswith("Error: ")]
+            report.record_models(errors, len(body["results"]))
+            run_status = body["status"]
+    except httpx.HTTPError as e:
+        report.record(type(e).__name__)
+        return
+    report.record("ok" if run_status == "COMPLETED" else "run_error", time.perf_counter() - start)
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    models: List[str],
+    concurrency: int,
+    requests: Optional[int] = None,
+    duration: Optional[float] = None,
+    background: bool = False,
+    poll_interval: float = 0.1,
+    use_cache: bool = False,
+) -> Dict:
+    """Keep ``concurrency`` experiments in flight and return the report summary."""
+    report = LoadReport()
+    sent = 0
+    deadline = report.started + duration if duration else None
+
+    async def worker():
+        nonlocal sent
+        while (requests is None or sent < requests) and (deadline is None or time.perf_counter() < deadline):
+            sent += 1
+            payload = {
+                "name": f"load test {sent}",
+                "system_prompt": "Extract a knowledge graph of the companies and people mentioned.",
+                "user_prompt": f"Document {sent}: Company {sent} was founded by Person {sent}.",
+                "models": models,
+                "tags": ["load-test"],
+                "use_cache": use_cache,
+            }
+            await _one_request(client, payload, report, background, poll_interval)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    report.finished = time.perf_counter()
+    return report.summary()
+
+
+@contextlib.asynccontextmanager
+async def in_process_client():
+    """Client for the app running in this process on a scratch database, with fake models enabled.
+
+    The settings are read at import time, so this must run before anything
+    imports the app. The generator then shares the event loop with the app,
+    so numbers are a lower bound on what a separate server would sustain.
+    """
+    scratch = tempfile.mkdtemp(prefix="llm-eval-load-")
+    os.environ.setdefault("DATABASE_PATH", os.path.join(scratch, "experiments.db"))
+    os.environ.setdefault("FAKE_PROVIDER_ENABLED", "true")
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            yield client
+
+
+def format_report(summary: Dict) -> str:
+    def seconds(value):
+        return "-" if value is None else f"{value * 1000:.0f} ms"
+
+    latency = summary["latency"]
+    lines = [
+        f"requests     {summary['requests']} in {summary['duration']:.1f}s "
+        f"({summary['throughput']:.2f} req/s)",
+        "outcomes     " + ", ".join(f"{name}={count}" for name, count in summary["outcomes"].items()),
+        f"error rate   {summary['error_rate']:.1%} of requests, {summary['model_error_rate']:.1%} of "
+        f"{summary['model_calls']} model calls ({summary['rate_limited']} rate limited)",
+        "latency      " + "  ".join(
+            f"{name} {seconds(latency[name])}" for name in ("mean", "p50", "p90", "p95", "p99", "max")
+        ),
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,264 @@
+"""Benchmarked hot paths: token counting, graph analysis, model output parsing and crud."""
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import atexit
+import json
+import random
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.services.fake_provider import graph_response, synthetic_graph
+from api.v1.utils import token_counter
+from api.v1.utils.graph_analyzer import GraphAnalyzer
+from api.v1.utils.graph_stream_parser import GraphStreamParser
+from persistence import crud, schemas
+from persistence.base import Base, configure_sqlite
+from persistence.models import ExperimentOutput, ExperimentRun, ModelResult, Parameter
+
+from .harness import Benchmark, SkipBenchmark
+
+MODELS = ("openai:gpt-4o-mini", "anthropic:claude-3-5-sonnet-20241022", "google:gemini-1.5-pro")
+GRAPH_SIZES = (10, 100, 1_000, 10_000, 100_000)
+DATABASE_SIZES = (1_000, 10_000, 100_000)
+# Rows per executemany while seeding a database
+SEED_BATCH_SIZE = 5_000
+
+SHORT_TEXT = "Extract the companies, founders and investors mentioned in the article."
+LONG_TEXT = " ".join(
+    f"In {2000 + i % 25}, Company {i} raised ${i * 3 % 97} million from Fund {i % 13} "
+    f"to expand its platform into {('Europe', 'Asia', 'South America')[i % 3]}."
+    for i in range(400)
+)
+
+
+def model_output(node_count: int) -> str:
+    return graph_response(synthetic_graph(node_count))
+
+
+# --- token counting ------------------------------------------------------
+
+def _encoding_or_skip(model: str):
+    try:
+        encoding = token_counter.get_encoding(model)
+        encoding.encode("warm up")
+    except Exception as e:
+        token_counter.get_encoding.cache_clear()
+        raise SkipBenchmark(
+            f"tiktoken encoding unavailable ({type(e).__name__}); point TIKTOKEN_CACHE_DIR "
+            "at a directory holding the BPE files to run offline"
+        )
+    return encoding
+
+
+def _token_text(length: str) -> str:
+    return SHORT_TEXT if length == "short" else LONG_TEXT
+
+
+def bench_count_tokens(length: str):
+    """Memoized path: the same prompt counted again, as for every model of a run."""
+    model = MODELS[0]
+    _encoding_or_skip(model)
+    text = _token_text(length)
+    token_counter.count_tokens(text, model)
+    return lambda: token_counter.count_tokens(text, model)
+
+
+def bench_count_tokens_uncached(length: str):
+    """First sight of a text: a full BPE encode."""
+    model = MODELS[0]
+    _encoding_or_skip(model)
+    text = _token_text(length)
+
+    def call():
+        with token_counter._count_cache_lock:
+            token_counter._count_cache.clear()
+        token_counter.count_tokens(text, model)
+
+    return call
+
+
+# --- graphs and model output ---------------------------------------------
+
+def bench_analyze_graph(node_count: int):
+    graph = synthetic_graph(node_count)
+    return lambda: GraphAnalyzer.analyze_graph(graph)
+
+
+def bench_json_loads(node_count: int):
+    """Decoding the bare JSON document, the baseline for the parsers below."""
+    text = json.dumps(synthetic_graph(node_count))
+    return lambda: json.loads(text)
+
+
+def bench_parse_model_output(node_count: int):
+    """The service path: locate the graph in a whole response and compute its metrics."""
+    text = model_output(node_count)
+    return lambda: GraphStreamParser.parse(text)
+
+
+def bench_parse_model_output_streamed(node_count: int):
+    """The same response fed in 64-character chunks, as a streamed completion arrives."""
+    text = model_output(node_count)
+    chunks = [text[i:i + 64] for i in range(0, len(text), 64)]
+    return lambda: GraphStreamParser.parse_chunks(chunks)
+
+
+# --- persistence ---------------------------------------------------------
+
+_databases: Dict[int, Tuple[sessionmaker, List[int]]] = {}
+_tmpdir = None
+
+
+def _cleanup():
+    for factory, _ in _databases.values():
+        factory.kw["bind"].dispose()
+    _databases.clear()
+    if _tmpdir is not None:
+        shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+atexit.register(_cleanup)
+
+
+def seeded_database(run_count: int) -> Tuple[sessionmaker, List[int]]:
+    """A WAL database file with ``run_count`` completed runs, built once per size.
+
+    Every run has the usual parameters, one response output and one
+    model_results row per model.
+    """
+    global _tmpdir
+    if run_count in _databases:
+        return _databases[run_count]
+    if _tmpdir is None:
+        _tmpdir = tempfile.mkdtemp(prefix="llm-eval-bench-")
+    engine = create_engine(f"sqlite:///{_tmpdir}/runs-{run_count}.db", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", configure_sqlite)
+    Base.metadata.create_all(bind=engine)
+
+    response = model_output(10)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for first in range(1, run_count + 1, SEED_BATCH_SIZE):
+            ids = range(first, min(first + SEED_BATCH_SIZE, run_count + 1))
+            conn.execute(insert(ExperimentRun), [
+                {"id": i, "name": f"run {i}", "description": None, "status": "COMPLETED",
+                 "timestamp": start + timedelta(minutes=i)}
+                for i in ids
+            ])
+            parameters, outputs, results = [], [], []
+            for i in ids:
+                models = MODELS[: 1 + i % len(MODELS)]
+                parameters += [
+                    {"run_id": i, "name": "system_prompt", "value": SHORT_TEXT, "datatype": "str"},
+                    {"run_id": i, "name": "user_prompt", "value": f"Document {i}", "datatype": "str"},
+                    {"run_id": i, "name": "models", "value": ",".join(models), "datatype": "str"},
+                    {"run_id": i, "name": "tags", "value": f"batch-{i % 10}", "datatype": "str"},
+                ]
+                for model in models:
+                    outputs.append({
+                        "run_id": i, "output_name": f"{model}_response",
+                        "output_value": response, "output_datatype": "str",
+                    })
+                    results.append({
+                        "run_id": i, "model": model, "status": "COMPLETED",
+                        "input_tokens": 120, "output_tokens": 400, "total_tokens": 520,
+                        "elapsed_time": 1.0 + i % 7, "tokens_per_second": 80.0,
+                        "time_to_first_token": None, "inter_token_latency": None,
+                        "node_count": 10, "relationship_count": 15,
+                        "node_property_count": 30, "relationship_property_count": 15,
+                        "cache_hit": False, "graph_truncated": False,
+                    })
+            conn.execute(insert(Parameter), parameters)
+            conn.execute(insert(ExperimentOutput), outputs)
+            conn.execute(insert(ModelResult), results)
+
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    _databases[run_count] = (factory, list(range(1, run_count + 1)))
+    return _databases[run_count]
+
+
+def _session(run_count: int):
+    factory, ids = seeded_database(run_count)
+    return factory(), ids
+
+
+def bench_crud_get_experiment(run_count: int):
+    """The detail view: a run with its parameters, outputs and model results."""
+    db, ids = _session(run_count)
+    rng = random.Random(0)
+
+    def call():
+        run_id = rng.choice(ids)
+        crud.get_experiment(db, run_id)
+        crud.get_model_results(db, run_id)
+        db.expunge_all()
+
+    return call, db.close
+
+
+def bench_crud_list_experiments(run_count: int):
+    """First page of the listing."""
+    db, _ = _session(run_count)
+    return (lambda: crud.get_experiments(db, limit=100)), db.close
+
+
+def bench_crud_list_experiments_deep(run_count: int):
+    """A page in the middle of the history, reached by keyset cursor."""
+    db, ids = _session(run_count)
+    middle = ids[len(ids) // 2]
+    cursor = crud.encode_cursor(datetime(2024, 1, 1) + timedelta(minutes=middle), middle)
+    return (lambda: crud.get_experiments(db, limit=100, cursor=cursor)), db.close
+
+
+def bench_crud_list_experiments_filtered(run_count: int):
+    """A page filtered by model and tag, both matched through the parameters table."""
+    db, _ = _session(run_count)
+    return (lambda: crud.get_experiments(db, limit=100, model=MODELS[2], tag="batch-3")), db.close
+
+
+def bench_crud_create_experiment(run_count: int):
+    """Insert and commit a run with its parameters, as create_run does."""
+    db, _ = _session(run_count)
+    experiment = schemas.ExperimentCreate(
+        name="benchmark", system_prompt=SHORT_TEXT, user_prompt="Document", models=list(MODELS[:2])
+    )
+
+    def call():
+        run = crud.create_experiment(db, experiment, commit=False)
+        run.parameters.extend([
+            Parameter(name="system_prompt", value=experiment.system_prompt, datatype="str"),
+            Parameter(name="user_prompt", value=experiment.user_prompt, datatype="str"),
+            Parameter(name="models", value=",".join(experiment.models), datatype="str"),
+        ])
+        db.commit()
+        db.expunge_all()
+
+    return call, db.close
+
+
+# Order matters for crud: creating runs last keeps the read cases on the seeded data
+BENCHMARKS = [
+    Benchmark("count_tokens", bench_count_tokens, ("short", "long")),
+    Benchmark("count_tokens_uncached", bench_count_tokens_uncached, ("short", "long")),
+    Benchmark("analyze_graph", bench_analyze_graph, GRAPH_SIZES, quick_params=GRAPH_SIZES[:3]),
+    Benchmark("json_loads", bench_json_loads, GRAPH_SIZES, quick_params=GRAPH_SIZES[:3]),
+    Benchmark("parse_model_output", bench_parse_model_output, GRAPH_SIZES, quick_params=GRAPH_SIZES[:3]),
+    Benchmark(
+        "parse_model_output_streamed", bench_parse_model_output_streamed,
+        GRAPH_SIZES, quick_params=GRAPH_SIZES[:3],
+    ),
+    Benchmark("crud_get_experiment", bench_crud_get_experiment, DATABASE_SIZES, quick_params=DATABASE_SIZES[:1]),
+    Benchmark("crud_list_experiments", bench_crud_list_experiments, DATABASE_SIZES, quick_params=DATABASE_SIZES[:1]),
+    Benchmark(
+        "crud_list_experiments_deep", bench_crud_list_experiments_deep,
+        DATABASE_SIZES, quick_params=DATABASE_SIZES[:1],
+    ),
+    Benchmark(
+        "crud_list_experiments_filtered", bench_crud_list_experiments_filtered,
+        DATABASE_SIZES, quick_params=DATABASE_SIZES[:1],
+    ),
+    Benchmark("crud_create_experiment", bench_crud_create_experiment, DATABASE_SIZES, quick_params=DATABASE_SIZES[:1]),
+]
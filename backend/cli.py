@@ -0,0 +1,170 @@
+"""Command line entry points for offline work against the backend.
+
+Run from the backend directory, e.g.::
+
+    python cli.py evaluate --name extraction-v2 --dataset tech_startups \
+        --models openai:gpt-4o-mini anthropic:claude-3-5-sonnet-20241022 \
+        --system-prompt-file prompts/system.txt
+    python cli.py evaluate --name extraction-v3 --dataset tech_startups --adaptive \
+        --models openai:gpt-4o-mini anthropic:claude-3-5-sonnet-20241022 \
+        --system-prompt-file prompts/system.txt
+    python cli.py export --format parquet --output experiments.parquet
+    python cli.py reindex
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def evaluate(args: argparse.Namespace) -> int:
+    from persistence import schemas
+    from persistence.base import init_db
+    from api.v1.services.evaluation_runner import EvaluationRunner, CheckpointMismatchError
+    from api.v1.services.experiment_service import ExperimentService
+
+    init_db()
+    request = schemas.EvaluationCreate(
+        name=args.name,
+        dataset=args.dataset,
+        models=args.models,
+        system_prompt=_read(args.system_prompt_file),
+        user_prompt_template=(
+            _read(args.user_prompt_template_file) if args.user_prompt_template_file else "$source"
+        ),
+        document_ids=args.ids,
+        complexity=args.complexity,
+        tags=args.tags,
+        concurrency=args.concurrency,
+        use_cache=not args.no_cache,
+        adaptive=schemas.AdaptiveSampling(
+            metric=args.metric, precision=args.precision, confidence=args.confidence,
+            min_documents=args.min_documents, seed=args.seed,
+        ) if args.adaptive else None,
+    )
+    runner = EvaluationRunner(ExperimentService())
+
+    def report(record):
+        print(f"{record['status']:9} {record['document_id']} x {record['model']} "
+              f"({record['elapsed_time']:.2f}s)", file=sys.stderr)
+
+    try:
+        status = asyncio.run(runner.run(request, on_cell=report))
+    except (CheckpointMismatchError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(status, indent=2))
+    return 0
+
+
+def export(args: argparse.Namespace) -> int:
+    from persistence.base import SessionLocal, init_db
+    from api.v1.services.export_service import EXPORT_CHUNK_SIZE, ExportFormatError, check_format, iter_export
+
+    try:
+        check_format(args.format)
+    except ExportFormatError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.output == "-" and args.format != "ndjson":
+        print("error: binary formats need --output", file=sys.stderr)
+        return 2
+
+    init_db()
+    db = SessionLocal()
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for data in iter_export(
+            db, args.format, chunk_size=args.chunk_size or EXPORT_CHUNK_SIZE, status=args.status,
+            since=args.since, until=args.until, model=args.model, tag=args.tag,
+        ):
+            out.write(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        db.close()
+    return 0
+
+
+def reindex(args: argparse.Namespace) -> int:
+    from persistence.base import SessionLocal, init_db
+    from persistence.search import REBUILD_BATCH_SIZE, rebuild_index
+
+    init_db()
+    db = SessionLocal()
+    try:
+        indexed = rebuild_index(db, batch_size=args.batch_size or REBUILD_BATCH_SIZE)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Indexed {indexed} prompts and responses")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="LLM evaluation backend tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    evaluate_parser = subcommands.add_parser(
+        "evaluate", help="Run a prompt over a validation dataset (resumable)"
+    )
+    evaluate_parser.add_argument("--name", required=True, help="Evaluation name; reuse it to resume")
+    evaluate_parser.add_argument("--dataset", required=True, help="Domain under validation_data/")
+    evaluate_parser.add_argument("--models", nargs="+", required=True)
+    evaluate_parser.add_argument("--system-prompt-file", required=True)
+    evaluate_parser.add_argument(
+        "--user-prompt-template-file",
+        help="Template with $source, $document_id and $domain placeholders (default: $source)",
+    )
+    evaluate_parser.add_argument("--ids", nargs="+", help="Only these document ids")
+    evaluate_parser.add_argument("--complexity", nargs="+", help="Only these complexity levels")
+    evaluate_parser.add_argument("--tags", nargs="+", help="Only documents with any of these tags")
+    evaluate_parser.add_argument("--concurrency", type=int, help="Cells in flight at once")
+    evaluate_parser.add_argument("--no-cache", action="store_true", help="Bypass the completion cache")
+    evaluate_parser.add_argument(
+        "--adaptive", action="store_true",
+        help="Sample documents by complexity and tag and stop once the scores are precise enough",
+    )
+    evaluate_parser.add_argument("--metric", default="node_f1", help="Score estimated per model (adaptive)")
+    evaluate_parser.add_argument("--precision", type=float, default=0.05, help="Confidence interval half-width to reach (adaptive)")
+    evaluate_parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level (adaptive)")
+    evaluate_parser.add_argument("--min-documents", type=int, default=10, help="Documents per model before stopping (adaptive)")
+    evaluate_parser.add_argument("--seed", type=int, default=0, help="Sampling seed; keep it to resume (adaptive)")
+    evaluate_parser.set_defaults(handler=evaluate)
+
+    export_parser = subcommands.add_parser("export", help="Export experiments as NDJSON, Parquet or Arrow")
+    export_parser.add_argument("--format", default="ndjson", choices=["ndjson", "parquet", "arrow"])
+    export_parser.add_argument("--output", default="-", help="File to write (default: stdout, NDJSON only)")
+    export_parser.add_argument("--status", help="Only runs with this status")
+    export_parser.add_argument("--since", type=datetime.fromisoformat, help="ISO timestamp, inclusive")
+    export_parser.add_argument("--until", type=datetime.fromisoformat, help="ISO timestamp, exclusive")
+    export_parser.add_argument("--model", help="Only runs that included this model")
+    export_parser.add_argument("--tag", help="Only runs with this tag")
+    export_parser.add_argument("--chunk-size", type=int, help="Runs read per query")
+    export_parser.set_defaults(handler=export)
+
+    reindex_parser = subcommands.add_parser("reindex", help="Rebuild the full-text search index from stored runs")
+    reindex_parser.add_argument("--batch-size", type=int, help="Rows read per query")
+    reindex_parser.set_defaults(handler=reindex)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    logging.basicConfig(level=logging.WARNING)
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,21 +14,26 @@
 
 from fastapi import FastAPI, Depends
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from dotenv import load_dotenv
 
+# Before the application imports: their settings are read from the environment at import time
+load_dotenv()
+
 from persistence.session import get_db
-from persistence.base import init_db
-from api.v1.endpoints import experiments
+from persistence.base import async_engine, init_db
+from api.v1.endpoints import experiments, cache, evaluations, datasets, analytics, export, metrics, health
+from api.v1.services.provider_pool import provider_pool
+from api.v1.services.warmup import PRELOAD_ENCODING_MODELS, warmup
+from api.v1.utils.token_counter import preload_encodings
+from api.v1.utils.metrics import MetricsMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables at startup
-load_dotenv()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle event handler for FastAPI application"""
@@ -39,7 +44,20 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise
+    await experiments.job_queue.start()
+    # Warm-up runs in the background; requests are served (and /ready says so) meanwhile
+    encoding_models = [model.strip() for model in PRELOAD_ENCODING_MODELS.split(",") if model.strip()]
+    if encoding_models:
+        warmup.start("encodings", asyncio.to_thread(preload_encodings, encoding_models))
+    if provider_pool.warm_providers:
+        warmup.start("providers", provider_pool.start())
+    warmup.ready = True
     yield
+    await warmup.stop()
+    await evaluations.shutdown()
+    await experiments.job_queue.stop()
+    await provider_pool.close()
+    await async_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -49,7 +67,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
-app.include_router(experiments.router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(experiments.router, prefix="/api/v1")
+app.include_router(cache.router, prefix="/api/v1")
+app.include_router(evaluations.router, prefix="/api/v1")
+app.include_router(datasets.router, prefix="/api/v1")
+app.include_router(analytics.router, prefix="/api/v1")
+app.include_router(export.router, prefix="/api/v1")
+# Served at the conventional scrape and probe paths rather than under /api/v1
+app.include_router(metrics.router)
+app.include_router(health.router)
\ No newline at end of file
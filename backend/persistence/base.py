@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import logging
 from sqlalchemy import inspect
@@ -10,26 +11,82 @@ logger = logging.getLogger(__name__)
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Use absolute path for SQLite database
-DB_PATH = os.path.join(DATA_DIR, 'experiments.db')
-engine = create_engine(f'sqlite:///{DB_PATH}', echo=True)
+# Use absolute path for SQLite database; DATABASE_PATH points elsewhere, e.g. a scratch file for load tests
+DB_PATH = os.getenv("DATABASE_PATH", os.path.join(DATA_DIR, 'experiments.db'))
+
+# Log every SQL statement (very noisy; for debugging only)
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+# Connections kept open per engine, and extra ones allowed under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# How long a writer waits for the SQLite lock before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Page cache per connection in KiB, and the memory-mapped I/O window in bytes
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+def configure_sqlite(dbapi_connection, connection_record):
+    """Per-connection pragmas. WAL lets readers proceed while a run is being written."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Durable at checkpoints; safe against corruption in WAL mode
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+# Sync engine for request handlers run in the threadpool, the CLI and migrations
+engine = create_engine(
+    f'sqlite:///{DB_PATH}',
+    echo=SQL_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    connect_args={"check_same_thread": False},
+)
+event.listen(engine, "connect", configure_sqlite)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for work done on the event loop (experiment runs, streaming)
+async_engine = create_async_engine(
+    f'sqlite+aiosqlite:///{DB_PATH}',
+    echo=SQL_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
+event.listen(async_engine.sync_engine, "connect", configure_sqlite)
+# Objects stay usable after commit; runs are read back after their final commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def init_db():
-    """Initialize the database and create all tables"""
-    from .models import ExperimentRun, Parameter, ExperimentOutput
+    """Initialize the database, create missing tables and apply migrations"""
+    from .models import ExperimentRun, Parameter, ExperimentOutput, ModelResult, CompletionCacheEntry, Blob, SearchDocument
+    from .migrations import migrate, stamp
     
     logger.info("Checking database initialization...")
     inspector = inspect(engine)
-    if inspector.has_table("experiment_runs"):
-        logger.info("Database tables already exist, skipping initialization")
-        return
-        
-    logger.info("Creating database tables...")
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
-        raise
\ No newline at end of file
+    fresh = not inspector.has_table(ExperimentRun.__tablename__)
+    missing = [
+        table for table in Base.metadata.sorted_tables
+        if not inspector.has_table(table.name)
+    ]
+    if missing:
+        logger.info(f"Creating database tables: {[table.name for table in missing]}")
+        try:
+            # create_all only creates the tables that don't exist yet
+            Base.metadata.create_all(bind=engine)
+            logger.info("Database tables created successfully")
+        except Exception as e:
+            logger.error(f"Error creating database tables: {e}")
+            raise
+    else:
+        logger.info("Database tables already exist, skipping creation")
+
+    # A new database already has the current schema; older ones are upgraded
+    if fresh:
+        stamp(engine)
+    else:
+        migrate(engine)
@@ -0,0 +1,119 @@
+"""Content-addressed, compressed storage for large output texts.
+
+Model responses and error bodies above BLOB_MIN_SIZE are zlib-compressed
+into the blobs table under the SHA-256 of their text, so a response that
+repeats across re-runs is stored once. The experiment_outputs row keeps its
+name and an empty value, which keeps scans of that table small; the text is
+only read back for the detail view, exports and the raw output endpoint,
+which can stream a byte range without decompressing the rest.
+"""
+from typing import Dict, Iterable, Iterator, Optional, Union
+import hashlib
+import os
+import zlib
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import Blob, ExperimentOutput
+
+# Texts of at least this many UTF-8 bytes are moved into the blob store
+BLOB_MIN_SIZE = int(os.getenv("BLOB_MIN_SIZE", "2048"))
+# zlib level, 1 (fastest) to 9 (smallest)
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+
+CODEC = "zlib"
+# Compressed bytes read per query while streaming a blob
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def offload_outputs(db: Session, outputs: Iterable[ExperimentOutput], min_size: int = BLOB_MIN_SIZE):
+    """Move the large texts of unsaved outputs into the blob store, compressing only unseen ones.
+
+    Call before the outputs are flushed; the blobs are written in the
+    caller's transaction.
+    """
+    pending: Dict[str, bytes] = {}
+    for output in outputs:
+        # A character is at most four UTF-8 bytes, so short texts are skipped without encoding them
+        if output.blob_hash is not None or len(output.output_value) < min_size // 4:
+            continue
+        data = output.output_value.encode("utf-8")
+        if len(data) < min_size:
+            continue
+        output.blob_hash = content_hash(data)
+        output.output_value = ""
+        pending[output.blob_hash] = data
+    store_blobs(db, pending)
+
+
+def store_blobs(db: Union[Session, Connection], texts: Dict[str, bytes]):
+    """Compress and insert the UTF-8 ``texts`` (by content hash) that are not stored yet."""
+    if not texts:
+        return
+    known = set(db.execute(select(Blob.hash).where(Blob.hash.in_(list(texts)))).scalars())
+    rows = [
+        {"hash": key, "codec": CODEC, "size": len(data), "data": zlib.compress(data, BLOB_COMPRESSION_LEVEL)}
+        for key, data in texts.items()
+        if key not in known
+    ]
+    if rows:
+        # A concurrent run may store the same text first; either copy will do
+        db.execute(insert(Blob).on_conflict_do_nothing(index_elements=["hash"]), rows)
+
+
+def load_texts(db: Union[Session, Connection], hashes: Iterable[str]) -> Dict[str, str]:
+    """Decompressed texts by hash, in one query."""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    return {
+        key: zlib.decompress(data).decode("utf-8")
+        for key, data in db.execute(select(Blob.hash, Blob.data).where(Blob.hash.in_(hashes)))
+    }
+
+
+def output_texts(db: Session, outputs: Iterable[ExperimentOutput]) -> Dict[str, str]:
+    """Output texts by output name, with blob-backed ones read from the store."""
+    outputs = list(outputs)
+    texts = load_texts(db, (o.blob_hash for o in outputs if o.blob_hash is not None))
+    return {
+        o.output_name: texts.get(o.blob_hash, "") if o.blob_hash is not None else o.output_value
+        for o in outputs
+    }
+
+
+def blob_size(db: Session, blob_hash: str) -> Optional[int]:
+    return db.query(Blob.size).filter(Blob.hash == blob_hash).scalar()
+
+
+def iter_blob(db: Session, blob_hash: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Stream the UTF-8 bytes ``[start, end)`` of a blob.
+
+    The compressed data is read a chunk at a time and decompression stops
+    once ``end`` is reached, so neither the whole blob nor its text is held
+    in memory.
+    """
+    decompressor = zlib.decompressobj()
+    position = 0  # offset in the decompressed text
+    offset = 1  # SQLite substr() is 1-based
+    while end is None or position < end:
+        compressed = db.query(
+            func.substr(Blob.data, offset, READ_CHUNK_SIZE)
+        ).filter(Blob.hash == blob_hash).scalar()
+        if compressed:
+            offset += len(compressed)
+            chunk = decompressor.decompress(compressed)
+        else:
+            chunk = decompressor.flush()
+        chunk_start, position = position, position + len(chunk)
+        if position > start and chunk:
+            yield chunk[max(0, start - chunk_start):None if end is None else end - chunk_start]
+        if not compressed:
+            return
@@ -1,22 +1,225 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
+from sqlalchemy import Float, Integer, and_, exists, func, insert, literal, or_, text
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, Iterable, List, Optional, Tuple
+from . import models, schemas, search
 from datetime import datetime
-from .models import ExperimentRun
+from .models import ExperimentRun, ModelResult
+import base64
 
-def create_experiment(db: Session, experiment: schemas.ExperimentCreate) -> models.ExperimentRun:
+def create_experiment(
+    db: Session, experiment: schemas.ExperimentCreate, commit: bool = True, parent_id: Optional[int] = None
+) -> models.ExperimentRun:
+    """Add a RUNNING run. With ``commit=False`` it is only flushed (to get its id)."""
     db_experiment = models.ExperimentRun(
         name=experiment.name or "Unnamed Experiment",
         timestamp=datetime.now(),
         description=experiment.description,
-        status="RUNNING"
+        status="RUNNING",
+        parent_id=parent_id,
     )
     db.add(db_experiment)
+    if not commit:
+        db.flush()
+        return db_experiment
     db.commit()
     db.refresh(db_experiment)
     return db_experiment
 
 def get_experiment(db: Session, experiment_id: int) -> models.ExperimentRun:
-    return db.query(models.ExperimentRun).filter(models.ExperimentRun.id == experiment_id).first() 
+    """Fetch a run with its parameters and outputs loaded up front (one query each)."""
+    return (
+        db.query(models.ExperimentRun)
+        .options(selectinload(ExperimentRun.parameters), selectinload(ExperimentRun.outputs))
+        .filter(models.ExperimentRun.id == experiment_id)
+        .first()
+    )
+
+def encode_cursor(timestamp: datetime, experiment_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{experiment_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        timestamp, experiment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(experiment_id)
+    except (UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def run_has_listed_parameter(name: str, item: str):
+    """Filter for runs whose comma-separated parameter ``name`` contains ``item``."""
+    return exists().where(
+        models.Parameter.run_id == ExperimentRun.id,
+        models.Parameter.name == name,
+        (literal(",") + models.Parameter.value + ",").contains(f",{item},", autoescape=True),
+    )
+
+def get_experiments(
+    db: Session,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    model: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    """Summary columns of top-level runs, newest first, one keyset page at a time.
+
+    ``cursor`` comes from encode_cursor on the last row of the previous page;
+    (timestamp, id) ordering keeps pages stable while new runs are added.
+    Matrix cells are reached through their parent instead.
+    """
+    query = db.query(
+        ExperimentRun.id,
+        ExperimentRun.name,
+        ExperimentRun.timestamp,
+        ExperimentRun.description,
+        ExperimentRun.status,
+    ).filter(ExperimentRun.parent_id.is_(None))
+    if cursor:
+        timestamp, experiment_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            ExperimentRun.timestamp < timestamp,
+            and_(ExperimentRun.timestamp == timestamp, ExperimentRun.id < experiment_id),
+        ))
+    query = filter_experiments(query, status=status, since=since, until=until, model=model, tag=tag)
+    query = query.order_by(ExperimentRun.timestamp.desc(), ExperimentRun.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def filter_experiments(
+    query,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    model: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    """Apply the listing filters shared by the experiment listing and exports."""
+    if status:
+        query = query.filter(ExperimentRun.status == status)
+    if since:
+        query = query.filter(ExperimentRun.timestamp >= since)
+    if until:
+        query = query.filter(ExperimentRun.timestamp < until)
+    if model:
+        query = query.filter(run_has_listed_parameter("models", model))
+    if tag:
+        query = query.filter(run_has_listed_parameter("tags", tag))
+    return query
+
+def get_child_experiments(db: Session, parent_id: int):
+    """Cells of a matrix experiment with their parameters, in creation order."""
+    return (
+        db.query(ExperimentRun)
+        .options(selectinload(ExperimentRun.parameters))
+        .filter(ExperimentRun.parent_id == parent_id)
+        .order_by(ExperimentRun.id)
+        .all()
+    )
+
+def get_output(db: Session, experiment_id: int, output_name: str) -> Optional[models.ExperimentOutput]:
+    return (
+        db.query(models.ExperimentOutput)
+        .filter(
+            models.ExperimentOutput.run_id == experiment_id,
+            models.ExperimentOutput.output_name == output_name,
+        )
+        .first()
+    )
+
+def index_run_texts(db: Session, run_id: int, documents: Iterable[search.Document]):
+    """Add a run's prompts or responses to the full-text index, in the caller's transaction."""
+    search.index_texts(db, run_id, documents)
 
-def get_experiments(db: Session):
-    return db.query(ExperimentRun).order_by(ExperimentRun.timestamp.desc()).all() 
\ No newline at end of file
+def search_runs(
+    db: Session,
+    query: str,
+    model: Optional[str] = None,
+    status: Optional[str] = None,
+    field: Optional[str] = None,
+    limit: int = 20,
+) -> List[Dict]:
+    """Runs matching the full-text ``query``, best first, with the best-matching text of each.
+
+    ``model`` keeps runs that included the model; ``field`` ("response" or a
+    prompt parameter name) searches only those texts.
+    """
+    # bm25() is lower for better matches. It only works in the FTS query itself,
+    # so the matches are materialized before being grouped by run
+    hits = text(
+        "SELECT rowid AS doc_id, bm25(search_index) AS rank FROM search_index WHERE search_index MATCH :match"
+    ).columns(doc_id=Integer, rank=Float).cte("hits").prefix_with("MATERIALIZED")
+    best = func.min(hits.c.rank).label("rank")
+    results = (
+        db.query(
+            ExperimentRun.id, ExperimentRun.name, ExperimentRun.timestamp, ExperimentRun.status,
+            models.SearchDocument.field, models.SearchDocument.model, best,
+        )
+        .select_from(hits)
+        .join(models.SearchDocument, models.SearchDocument.id == hits.c.doc_id)
+        .join(ExperimentRun, ExperimentRun.id == models.SearchDocument.run_id)
+    )
+    if status:
+        results = results.filter(ExperimentRun.status == status)
+    if field:
+        results = results.filter(models.SearchDocument.field == field)
+    if model:
+        results = results.filter(run_has_listed_parameter("models", model))
+    # SQLite fills the bare columns from the row that has the minimum rank
+    results = results.group_by(ExperimentRun.id).order_by(best, ExperimentRun.id).limit(limit)
+    return [
+        dict(row._mapping)
+        for row in results.params(match=search.match_expression(query))
+    ]
+
+def get_experiment_chunk(db: Session, after_id: int, limit: int, **filters):
+    """Summary columns of the next ``limit`` runs with id > ``after_id``, in id order."""
+    query = db.query(
+        ExperimentRun.id,
+        ExperimentRun.name,
+        ExperimentRun.timestamp,
+        ExperimentRun.description,
+        ExperimentRun.status,
+    ).filter(ExperimentRun.id > after_id)
+    return filter_experiments(query, **filters).order_by(ExperimentRun.id).limit(limit).all()
+
+def get_experiments_by_status(db: Session, status: str):
+    return db.query(ExperimentRun).filter(ExperimentRun.status == status).order_by(ExperimentRun.id).all()
+
+
+def get_experiment_progress(db: Session, experiment_id: int):
+    """Return (status, models, finished output names) without loading full outputs."""
+    status = db.query(ExperimentRun.status).filter(ExperimentRun.id == experiment_id).scalar()
+    if status is None:
+        return None
+    models_value = (
+        db.query(models.Parameter.value)
+        .filter(models.Parameter.run_id == experiment_id, models.Parameter.name == "models")
+        .scalar()
+    )
+    finished = {
+        name
+        for (name,) in db.query(models.ExperimentOutput.output_name).filter(
+            models.ExperimentOutput.run_id == experiment_id,
+            models.ExperimentOutput.output_name.like("%\\_response", escape="\\")
+            | models.ExperimentOutput.output_name.like("%\\_error", escape="\\"),
+        )
+    }
+    return status, (models_value.split(",") if models_value else []), finished
+
+
+def add_model_results(db: Session, rows: List[Dict]):
+    """Bulk insert model result rows (dicts of ModelResult columns); the caller commits."""
+    if rows:
+        db.execute(insert(ModelResult), rows)
+
+
+def get_model_results(db: Session, experiment_id: int) -> List[ModelResult]:
+    return (
+        db.query(ModelResult)
+        .filter(ModelResult.run_id == experiment_id)
+        .order_by(ModelResult.id)
+        .all()
+    )
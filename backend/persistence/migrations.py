@@ -0,0 +1,172 @@
+"""Schema migrations for existing databases, tracked with SQLite's user_version."""
+from collections import defaultdict
+from typing import Callable, Dict, List
+import logging
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.engine import Connection, Engine
+
+from .blobs import BLOB_MIN_SIZE, content_hash, store_blobs
+from .models import (
+    Blob, ExperimentOutput, ExperimentRun, ModelResult, Parameter, SearchDocument,
+    MODEL_RESULT_FLAGS, MODEL_RESULT_METRICS,
+)
+from .search import rebuild_index
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+DELETE_BATCH_SIZE = 500
+
+
+def _create_indexes(conn: Connection):
+    """create_all skips existing tables, so add their new indexes here."""
+    for table in (Parameter.__table__, ExperimentOutput.__table__, ModelResult.__table__):
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _move_metrics_to_model_results(conn: Connection):
+    """Convert the stringly-typed ``{model}_{metric}`` output rows into model_results."""
+    models_by_run = {
+        run_id: value.split(",")
+        for run_id, value in conn.execute(
+            text("SELECT run_id, value FROM parameters WHERE name = 'models'")
+        )
+    }
+    outputs_by_run: Dict[int, Dict[str, tuple]] = defaultdict(dict)
+    for output_id, run_id, name, value in conn.execute(text(
+        "SELECT id, run_id, output_name, "
+        "CASE WHEN output_name LIKE '%\\_response' ESCAPE '\\' THEN NULL ELSE output_value END "
+        "FROM experiment_outputs"
+    )):
+        outputs_by_run[run_id][name] = (output_id, value)
+
+    rows: List[Dict] = []
+    converted: List[int] = []
+    for run_id, outputs in outputs_by_run.items():
+        for model in models_by_run.get(run_id, []):
+            if f"{model}_error" in outputs:
+                status = "ERROR"
+            elif f"{model}_response" in outputs:
+                status = "COMPLETED"
+            else:
+                continue
+            # Every row carries every column so the insert can run as one executemany
+            row = {"run_id": run_id, "model": model, "status": status}
+            for metric, cast in MODEL_RESULT_METRICS.items():
+                row[metric] = None
+                output_id, value = outputs.get(f"{model}_{metric}", (None, None))
+                if output_id is None:
+                    continue
+                try:
+                    row[metric] = cast(float(value))
+                except (TypeError, ValueError):
+                    logger.warning(f"Dropping unparseable {model}_{metric}={value!r} of run {run_id}")
+                converted.append(output_id)
+            for flag in MODEL_RESULT_FLAGS:
+                output_id, value = outputs.get(f"{model}_{flag}", (None, None))
+                row[flag] = value == "true"
+                if output_id is not None:
+                    converted.append(output_id)
+            rows.append(row)
+
+    if rows:
+        conn.execute(insert(ModelResult), rows)
+    for start in range(0, len(converted), DELETE_BATCH_SIZE):
+        batch = converted[start:start + DELETE_BATCH_SIZE]
+        conn.execute(delete(ExperimentOutput.__table__).where(ExperimentOutput.id.in_(batch)))
+    logger.info(f"Moved {len(converted)} metric outputs into {len(rows)} model results")
+
+
+def _create_index(conn: Connection, table, name: str):
+    next(index for index in table.indexes if index.name == name).create(conn, checkfirst=True)
+
+
+def _index_experiment_runs(conn: Connection):
+    _create_index(conn, ExperimentRun.__table__, "ix_experiment_runs_timestamp_id")
+
+
+def _add_parent_run(conn: Connection):
+    """Matrix cells are runs pointing at their parent run."""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(experiment_runs)")}
+    if "parent_id" not in columns:
+        conn.exec_driver_sql(
+            "ALTER TABLE experiment_runs ADD COLUMN parent_id INTEGER "
+            "REFERENCES experiment_runs(id) ON DELETE CASCADE"
+        )
+    _create_index(conn, ExperimentRun.__table__, "ix_experiment_runs_parent_id")
+
+
+def _move_outputs_to_blobs(conn: Connection):
+    """Compress large response and error texts into the content-addressed blob store."""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(experiment_outputs)")}
+    if "blob_hash" not in columns:
+        conn.exec_driver_sql(
+            "ALTER TABLE experiment_outputs ADD COLUMN blob_hash VARCHAR(64) REFERENCES blobs(hash)"
+        )
+    Blob.__table__.create(conn, checkfirst=True)
+
+    moved, after_id = 0, 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, output_value FROM experiment_outputs "
+            "WHERE id > :after_id AND blob_hash IS NULL AND length(CAST(output_value AS BLOB)) >= :min_size "
+            "ORDER BY id LIMIT :batch"
+        ), {"after_id": after_id, "min_size": BLOB_MIN_SIZE, "batch": DELETE_BATCH_SIZE}).all()
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        texts, updates = {}, []
+        for output_id, value in rows:
+            data = value.encode("utf-8")
+            key = content_hash(data)
+            texts[key] = data
+            updates.append({"output_id": output_id, "blob_hash": key})
+        store_blobs(conn, texts)
+        conn.execute(
+            text("UPDATE experiment_outputs SET blob_hash = :blob_hash, output_value = '' WHERE id = :output_id"),
+            updates,
+        )
+        moved += len(rows)
+    logger.info(f"Moved {moved} large outputs into the blob store; VACUUM the database to reclaim the space")
+
+
+def _add_search_index(conn: Connection):
+    """Full-text index over prompts and responses, filled from the stored runs."""
+    # Also creates the search_index FTS5 table
+    SearchDocument.__table__.create(conn, checkfirst=True)
+    rebuild_index(conn)
+
+
+# Applied in order; the database's user_version is the number already applied
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    _create_indexes,
+    _move_metrics_to_model_results,
+    _index_experiment_runs,
+    _add_parent_run,
+    _move_outputs_to_blobs,
+    _add_search_index,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def stamp(engine: Engine, version: int = SCHEMA_VERSION):
+    """Record a version without running migrations, e.g. for a freshly created database."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def migrate(engine: Engine):
+    """Apply pending migrations, each in its own transaction."""
+    with engine.connect() as conn:
+        version = get_schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Applying migration {number}: {migration.__name__}")
+        with engine.begin() as conn:
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
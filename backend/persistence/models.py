@@ -1,24 +1,33 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import DDL, Boolean, Column, Float, Index, Integer, LargeBinary, String, ForeignKey, DateTime, Text
+from sqlalchemy import event
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class ExperimentRun(Base):
     __tablename__ = 'experiment_runs'
+    __table_args__ = (
+        # Newest-first listing and its keyset pagination
+        Index('ix_experiment_runs_timestamp_id', 'timestamp', 'id'),
+        Index('ix_experiment_runs_parent_id', 'parent_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     timestamp = Column(DateTime, nullable=False)
     description = Column(Text)
     status = Column(String, nullable=False)
+    # Set on the cells of a matrix experiment; the listing shows only top-level runs
+    parent_id = Column(Integer, ForeignKey('experiment_runs.id', ondelete='CASCADE'))
     
     parameters = relationship("Parameter", back_populates="experiment", cascade="all, delete-orphan")
     outputs = relationship("ExperimentOutput", back_populates="experiment", cascade="all, delete-orphan")
+    results = relationship("ModelResult", back_populates="experiment", cascade="all, delete-orphan")
 
 class Parameter(Base):
     __tablename__ = 'parameters'
     
     id = Column(Integer, primary_key=True)
-    run_id = Column(Integer, ForeignKey('experiment_runs.id', ondelete='CASCADE'))
+    run_id = Column(Integer, ForeignKey('experiment_runs.id', ondelete='CASCADE'), index=True)
     name = Column(String, nullable=False)
     value = Column(String, nullable=False)
     datatype = Column(String, nullable=False)
@@ -26,12 +35,105 @@ class Parameter(Base):
     experiment = relationship("ExperimentRun", back_populates="parameters")
 
 class ExperimentOutput(Base):
+    """Free-text outputs of a run: model responses, errors and error details.
+
+    Large texts live in the blobs table; output_value is then empty and
+    blob_hash points at the text (see persistence.blobs).
+    """
     __tablename__ = 'experiment_outputs'
+    __table_args__ = (
+        Index('ix_experiment_outputs_run_id_output_name', 'run_id', 'output_name'),
+    )
     
     id = Column(Integer, primary_key=True)
     run_id = Column(Integer, ForeignKey('experiment_runs.id', ondelete='CASCADE'))
     output_name = Column(String, nullable=False)
     output_value = Column(String, nullable=False)
     output_datatype = Column(String, nullable=False)
+    blob_hash = Column(String(64), ForeignKey('blobs.hash'))
     
-    experiment = relationship("ExperimentRun", back_populates="outputs") 
\ No newline at end of file
+    experiment = relationship("ExperimentRun", back_populates="outputs")
+
+# Typed per-model metrics; NULL when a run did not produce the metric
+MODEL_RESULT_METRICS = {
+    "elapsed_time": float,
+    "time_to_first_token": float,
+    "inter_token_latency": float,
+    "tokens_per_second": float,
+    "input_tokens": int,
+    "output_tokens": int,
+    "total_tokens": int,
+    "node_count": int,
+    "relationship_count": int,
+    "node_property_count": int,
+    "relationship_property_count": int,
+}
+MODEL_RESULT_FLAGS = ("cache_hit", "graph_truncated")
+
+class ModelResult(Base):
+    """One row per model per run with its metrics in typed columns."""
+    __tablename__ = 'model_results'
+    __table_args__ = (
+        Index('ix_model_results_run_id_model', 'run_id', 'model'),
+        Index('ix_model_results_model_status', 'model', 'status'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('experiment_runs.id', ondelete='CASCADE'), nullable=False)
+    model = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    elapsed_time = Column(Float)
+    time_to_first_token = Column(Float)
+    inter_token_latency = Column(Float)
+    tokens_per_second = Column(Float)
+    input_tokens = Column(Integer)
+    output_tokens = Column(Integer)
+    total_tokens = Column(Integer)
+    node_count = Column(Integer)
+    relationship_count = Column(Integer)
+    node_property_count = Column(Integer)
+    relationship_property_count = Column(Integer)
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    graph_truncated = Column(Boolean, nullable=False, default=False)
+
+    experiment = relationship("ExperimentRun", back_populates="results")
+
+class Blob(Base):
+    """A compressed text stored once however many outputs share it, keyed by its SHA-256."""
+    __tablename__ = 'blobs'
+
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)  # bytes of UTF-8 before compression
+    data = Column(LargeBinary, nullable=False)
+
+class SearchDocument(Base):
+    """A text in the full-text index: which run, field and model it came from.
+
+    The text itself is only tokenized into search_index, a contentless FTS5
+    table whose rowid is this row's id (see persistence.search).
+    """
+    __tablename__ = 'search_documents'
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('experiment_runs.id', ondelete='CASCADE'), nullable=False, index=True)
+    field = Column(String, nullable=False)  # "system_prompt", "user_prompt" or "response"
+    model = Column(String)  # set for responses
+
+# The virtual table has no model; it is created and dropped along with search_documents
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "content, content='', tokenize='unicode61 remove_diacritics 2')"
+))
+event.listen(SearchDocument.__table__, "before_drop", DDL("DROP TABLE IF EXISTS search_index"))
+
+class CompletionCacheEntry(Base):
+    __tablename__ = 'completion_cache'
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
+    last_accessed = Column(DateTime, nullable=False, index=True)
+    hit_count = Column(Integer, nullable=False, default=0)
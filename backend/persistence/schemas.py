@@ -1,16 +1,109 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 
+# Sampling parameters a request may set; they are passed to the provider as is
+SAMPLING_PARAMETERS = {"temperature", "top_p", "max_tokens", "presence_penalty", "frequency_penalty", "seed"}
+
+def _check_sampling_names(names):
+    unknown = set(names) - SAMPLING_PARAMETERS
+    if unknown:
+        raise ValueError(
+            f"Unsupported sampling parameters: {', '.join(sorted(unknown))} "
+            f"(allowed: {', '.join(sorted(SAMPLING_PARAMETERS))})"
+        )
+
 class ExperimentCreate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     system_prompt: str
     user_prompt: str
     models: List[str]
+    # Free-form labels for filtering listings and analytics, e.g. "prod-candidate"
+    tags: Optional[List[str]] = None
+    # Serve identical deterministic completions from the response cache
+    use_cache: bool = True
+    # Skip the cache lookup but store the fresh completion
+    refresh_cache: bool = False
+    # Overrides of the default sampling parameters (temperature 0.0)
+    sampling: Optional[Dict[str, Any]] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+    @field_validator("sampling")
+    @classmethod
+    def check_sampling(cls, sampling):
+        if sampling:
+            _check_sampling_names(sampling)
+        return sampling
+
+class MatrixExperimentCreate(BaseModel):
+    """A grid of prompts x models x sampling parameters, run as one parent experiment."""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    system_prompts: List[str] = Field(min_length=1)
+    user_prompts: List[str] = []
+    # string.Template user prompts, each filled in with every entry of template_variables
+    user_prompt_templates: List[str] = []
+    template_variables: List[Dict[str, str]] = []
+    models: List[str] = Field(min_length=1)
+    # Values to sweep per sampling parameter, e.g. {"temperature": [0.0, 0.7]}
+    sampling: Dict[str, List[Any]] = {}
+    tags: Optional[List[str]] = None
+    use_cache: bool = True
+    # Cells (one prompt and sampling combination, all models) in flight at once
+    concurrency: Optional[int] = Field(default=None, ge=1)
+
+    @field_validator("sampling")
+    @classmethod
+    def check_sampling(cls, sampling):
+        _check_sampling_names(sampling)
+        empty = [name for name, values in sampling.items() if not values]
+        if empty:
+            raise ValueError(f"No values to sweep for: {', '.join(empty)}")
+        return sampling
+
+    @model_validator(mode="after")
+    def check_user_prompts(self):
+        if not self.user_prompts and not self.user_prompt_templates:
+            raise ValueError("Give user_prompts, user_prompt_templates or both")
+        if self.user_prompt_templates and not self.template_variables:
+            raise ValueError("user_prompt_templates need template_variables")
+        return self
+
+class AdaptiveSampling(BaseModel):
+    """Evaluate a stratified sample of the documents, stopping once the estimates are precise enough."""
+    # Per-document GraphScorer score, or a GraphAnalyzer count, to estimate per model
+    metric: Literal[
+        "node_f1", "edge_f1", "property_f1",
+        "node_precision", "node_recall", "edge_precision", "edge_recall",
+        "node_count", "relationship_count",
+    ] = "node_f1"
+    # A model stops once its confidence interval is at most +/- precision
+    precision: float = Field(default=0.05, gt=0)
+    confidence: float = Field(default=0.95, gt=0.5, lt=1)
+    # Documents scored per model before any stopping rule applies
+    min_documents: int = Field(default=10, ge=2)
+    # Stop every model once their intervals no longer overlap (or all are within precision)
+    stop_on_ranking: bool = True
+    # Shuffles the documents within each stratum; keep it to resume the same sample
+    seed: int = 0
+
+class EvaluationCreate(BaseModel):
+    # Also names the checkpoint file, so reusing a name resumes that evaluation
+    name: str = Field(pattern=r"^[A-Za-z0-9_.-]+$")
+    dataset: str
+    models: List[str]
+    system_prompt: str
+    # string.Template placeholders: $source, $document_id, $domain
+    user_prompt_template: str = "$source"
+    document_ids: Optional[List[str]] = None
+    complexity: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    use_cache: bool = True
+    adaptive: Optional[AdaptiveSampling] = None
+
 class ParameterCreate(BaseModel):
     name: str
     value: str
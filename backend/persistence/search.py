@@ -0,0 +1,152 @@
+"""Full-text search over prompts and model responses with SQLite FTS5.
+
+search_index is a contentless FTS5 table: it keeps only the inverted index,
+so responses are not stored a second time next to the blob store. Every
+indexed text has a search_documents row with the same id saying which run,
+field and model it came from. Runs are indexed as they are written;
+rebuild_index() re-reads everything, for databases that predate the index
+or after bulk changes.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import logging
+import re
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .blobs import load_texts
+from .models import ExperimentOutput, ExperimentRun, Parameter, SearchDocument
+
+logger = logging.getLogger(__name__)
+
+PROMPT_FIELDS = ("system_prompt", "user_prompt")
+RESPONSE_FIELD = "response"
+RESPONSE_SUFFIX = "_response"
+# Rows read per query while rebuilding
+REBUILD_BATCH_SIZE = 500
+
+# (field, model, text) of one indexed text
+Document = Tuple[str, Optional[str], str]
+
+
+def index_texts(db: Union[Session, Connection], run_id: int, documents: Iterable[Document]):
+    """Add a run's texts to the index, in the caller's transaction."""
+    _insert_documents(db, [(run_id, *document) for document in documents])
+
+
+def _insert_documents(db: Union[Session, Connection], documents: List[Tuple[int, str, Optional[str], str]]):
+    documents = [document for document in documents if document[3]]
+    if not documents:
+        return
+    ids = db.execute(
+        insert(SearchDocument).returning(SearchDocument.id, sort_by_parameter_order=True),
+        [{"run_id": run_id, "field": field, "model": model} for run_id, field, model, _ in documents],
+    ).scalars().all()
+    db.execute(
+        text("INSERT INTO search_index (rowid, content) VALUES (:id, :content)"),
+        [{"id": doc_id, "content": document[3]} for doc_id, document in zip(ids, documents)],
+    )
+
+
+def response_documents(outputs: Iterable[ExperimentOutput]) -> List[Document]:
+    """The responses among a run's unsaved outputs, before their texts are offloaded."""
+    return [
+        (RESPONSE_FIELD, output.output_name[:-len(RESPONSE_SUFFIX)], output.output_value)
+        for output in outputs
+        if output.output_name.endswith(RESPONSE_SUFFIX) and output.blob_hash is None
+    ]
+
+
+def rebuild_index(db: Union[Session, Connection], batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Re-index every stored prompt and response; returns the number of texts indexed.
+
+    Runs in the caller's transaction, so searches see the old index until it commits.
+    """
+    db.execute(text("INSERT INTO search_index (search_index) VALUES ('delete-all')"))
+    db.execute(SearchDocument.__table__.delete())
+    indexed = 0
+
+    after_id = 0
+    while True:
+        rows = db.execute(
+            select(Parameter.id, Parameter.run_id, Parameter.name, Parameter.value)
+            .where(Parameter.name.in_(PROMPT_FIELDS), Parameter.id > after_id)
+            .order_by(Parameter.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        _insert_documents(db, [(run_id, name, None, value) for _, run_id, name, value in rows])
+        indexed += len(rows)
+
+    after_id = 0
+    while True:
+        rows = db.execute(
+            select(ExperimentOutput.id, ExperimentOutput.run_id, ExperimentOutput.output_name,
+                   ExperimentOutput.output_value, ExperimentOutput.blob_hash)
+            .where(ExperimentOutput.output_name.like(f"%\\{RESPONSE_SUFFIX}", escape="\\"),
+                   ExperimentOutput.id > after_id)
+            .order_by(ExperimentOutput.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        blobs = load_texts(db, (row.blob_hash for row in rows if row.blob_hash is not None))
+        _insert_documents(db, [
+            (run_id, RESPONSE_FIELD, name[:-len(RESPONSE_SUFFIX)],
+             blobs.get(blob_hash, "") if blob_hash is not None else value)
+            for _, run_id, name, value, blob_hash in rows
+        ])
+        indexed += len(rows)
+
+    # Merge the index b-trees written batch by batch
+    db.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+    logger.info(f"Rebuilt the search index with {indexed} texts")
+    return indexed
+
+
+def query_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query)
+
+
+def match_expression(query: str) -> str:
+    """FTS5 query matching texts that contain every word of ``query``.
+
+    Words are quoted, so punctuation (e.g. "gpt-4o") is not read as query
+    syntax; a trailing ``*`` makes the last word a prefix. Raises ValueError
+    when ``query`` has no words.
+    """
+    terms = query_terms(query)
+    if not terms:
+        raise ValueError("Search query has no words")
+    expression = " ".join(f'"{term}"' for term in terms)
+    return expression + "*" if query.rstrip().endswith("*") else expression
+
+
+def document_texts(db: Session, hits: List[Dict]) -> Dict[Tuple[int, str, Optional[str]], str]:
+    """Full texts of the matched documents, keyed by (run id, field, model)."""
+    texts: Dict[Tuple[int, str, Optional[str]], str] = {}
+    prompts = [hit for hit in hits if hit["field"] != RESPONSE_FIELD]
+    if prompts:
+        for run_id, name, value in db.execute(
+            select(Parameter.run_id, Parameter.name, Parameter.value).where(
+                Parameter.run_id.in_({hit["id"] for hit in prompts}),
+                Parameter.name.in_({hit["field"] for hit in prompts}),
+            )
+        ):
+            texts[(run_id, name, None)] = value
+    responses = {f"{hit['model']}{RESPONSE_SUFFIX}" for hit in hits if hit["field"] == RESPONSE_FIELD}
+    if responses:
+        rows = db.execute(
+            select(ExperimentOutput.run_id, ExperimentOutput.output_name,
+                   ExperimentOutput.output_value, ExperimentOutput.blob_hash).where(
+                ExperimentOutput.run_id.in_({hit["id"] for hit in hits if hit["field"] == RESPONSE_FIELD}),
+                ExperimentOutput.output_name.in_(responses),
+            )
+        ).all()
+        blobs = load_texts(db, (row.blob_hash for row in rows if row.blob_hash is not None))
+        for run_id, name, value, blob_hash in rows:
+            model = name[:-len(RESPONSE_SUFFIX)]
+            texts[(run_id, RESPONSE_FIELD, model)] = blobs.get(blob_hash, "") if blob_hash is not None else value
+    return texts
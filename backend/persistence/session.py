@@ -1,10 +1,37 @@
-from typing import Generator
+from typing import AsyncGenerator, Callable, Generator, TypeVar, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .base import SessionLocal
+from .base import AsyncSessionLocal, SessionLocal
+
+T = TypeVar("T")
+
+# Service code accepts either; see run_db
+DbSession = Union[Session, AsyncSession]
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def run_db(db: DbSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run ORM code written against a sync Session on either kind of session.
+
+    With an AsyncSession the statements go through aiosqlite, so the event
+    loop is not blocked on SQLite I/O or locks; a plain Session (CLI, tests)
+    runs ``fn`` inline.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
+
+async def close_db(db: DbSession):
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        db.close()
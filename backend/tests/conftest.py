@@ -6,4 +6,69 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent.absolute()
 
 # Add the backend directory to Python path
-sys.path.insert(0, str(backend_dir)) 
\ No newline at end of file
+sys.path.insert(0, str(backend_dir)) 
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory bound to a fresh in-memory SQLite database."""
+    from persistence.base import Base
+    from persistence import models  # noqa: F401 - register the tables
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_session_factory(tmp_path):
+    """AsyncSession factory (aiosqlite) on a fresh WAL database file.
+
+    A file rather than a shared in-memory connection, so concurrent sessions
+    get their own connections as they do in production.
+    """
+    from sqlalchemy import event
+    from persistence.base import Base, configure_sqlite
+    from persistence import models  # noqa: F401 - register the tables
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'experiments.db'}")
+    event.listen(engine.sync_engine, "connect", configure_sqlite)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    await engine.dispose()
+
+
+class WhitespaceEncoding:
+    """Offline stand-in for a tiktoken encoding: one token per word."""
+
+    name = "whitespace"
+
+    def encode(self, text, **kwargs):
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8, **kwargs):
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def fake_encoding(monkeypatch):
+    """Count tokens without downloading tiktoken BPE files."""
+    from api.v1.utils import token_counter
+
+    token_counter.clear_token_caches()
+    monkeypatch.setattr(token_counter.tiktoken, "encoding_for_model", lambda name: WhitespaceEncoding())
+    monkeypatch.setattr(token_counter.tiktoken, "get_encoding", lambda name: WhitespaceEncoding())
+    yield WhitespaceEncoding
+    token_counter.clear_token_caches()
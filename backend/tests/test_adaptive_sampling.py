@@ -0,0 +1,130 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from api.v1.services.adaptive_sampling import AdaptiveStopper, stratified_order
+from api.v1.services.completion_cache import CompletionCache
+from api.v1.services.evaluation_runner import EvaluationRunner
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.utils.dataset_loader import DatasetDocument
+from persistence import schemas
+
+GRAPH = {"nodes": [{"id": "a", "type": "Company", "properties": {"name": "Acme"}}], "relationships": []}
+WRONG = {"nodes": [{"id": "b", "type": "Person", "properties": {"name": "Bob"}}], "relationships": []}
+
+
+def document(doc_id, complexity, tags):
+    return DatasetDocument("startups", doc_id, f"/data/{doc_id}", {"complexity": complexity, "tags": tags})
+
+
+def record(model, node_f1, status="COMPLETED"):
+    return {"model": model, "status": status, "graph_metrics": None, "scores": {"node_f1": node_f1}}
+
+
+def test_stratified_order_keeps_every_prefix_proportional():
+    documents = [document(f"{i:03}", "micro", ["funding"]) for i in range(20)]
+    documents += [document(f"{i:03}", "small", ["funding", "ipo"]) for i in range(20, 30)]
+
+    order = stratified_order(documents, seed=1)
+
+    assert sorted(d.document_id for d in order) == sorted(d.document_id for d in documents)
+    assert [d.complexity for d in order[:6]].count("small") == 2
+    assert [d.complexity for d in order[:15]].count("small") == 5
+    assert [d.document_id for d in stratified_order(list(reversed(documents)), seed=1)] == [
+        d.document_id for d in order
+    ]
+    assert [d.document_id for d in stratified_order(documents, seed=2)] != [d.document_id for d in order]
+
+
+def test_stopper_stops_on_precision_and_on_a_settled_ranking():
+    settings = schemas.AdaptiveSampling(precision=0.1, min_documents=5)
+    stopper = AdaptiveStopper(settings, ["a", "b"], population=100)
+    for value in (0.9, 0.92, 0.91, 0.9):
+        stopper.add(record("a", value))
+    # Too few documents for any rule yet
+    assert stopper.is_active("a")
+    stopper.add(record("a", 0.0, status="ERROR"))
+    # Five close scores are not yet enough for +/- 0.1 on a [0, 1] metric
+    for value in (0.91, 0.9, 0.92, 0.91, 0.9):
+        stopper.add(record("a", value))
+    assert stopper.is_active("a")
+    while stopper.is_active("a"):
+        stopper.add(record("a", 0.91))
+    assert stopper.report()["models"]["a"]["stopped"] == "precision"
+    assert 10 < stopper.report()["models"]["a"]["documents"] < 25
+
+    # Scores spread too widely for the precision, but far below the other model's
+    for value in (0.1, 0.4, 0.2, 0.5, 0.3):
+        stopper.add(record("b", value))
+    assert stopper.ranking_resolved()
+    assert stopper.report()["models"]["b"]["stopped"] == "ranking"
+
+
+def test_identical_first_scores_do_not_end_sampling():
+    settings = schemas.AdaptiveSampling(precision=0.05, min_documents=5, stop_on_ranking=False)
+    stopper = AdaptiveStopper(settings, ["a"], population=1000)
+    for _ in range(10):
+        stopper.add(record("a", 1.0))
+
+    assert stopper.is_active("a")
+    low, high = stopper.interval("a")
+    assert high - low > 0.2
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for i in range(40):
+        doc_dir = tmp_path / "startups" / f"{i:03}"
+        doc_dir.mkdir(parents=True)
+        (doc_dir / "source.txt").write_text(f"Source text {i}")
+        (doc_dir / "ground_truth_graph.json").write_text(json.dumps(GRAPH))
+        (doc_dir / "metadata.json").write_text(json.dumps({
+            "complexity": "micro" if i % 4 else "small", "tags": ["funding"],
+        }))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+async def test_adaptive_evaluation_stops_early_and_resumes_without_new_calls(
+    mock_client, data_dir, tmp_path, session_factory, fake_encoding
+):
+    calls = []
+
+    def create(model, messages, **kwargs):
+        calls.append(model)
+        graph = GRAPH if model.startswith("openai") else WRONG
+        return Mock(choices=[Mock(message=Mock(content=json.dumps(graph)))])
+
+    mock_client.return_value.chat.completions.create.side_effect = create
+    runner = EvaluationRunner(
+        ExperimentService(cache=CompletionCache()),
+        data_dir=str(data_dir),
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+        session_factory=session_factory,
+    )
+    request = schemas.EvaluationCreate(
+        name="adaptive", dataset="startups", system_prompt="Extract a knowledge graph",
+        models=["openai:gpt-4o-mini", "anthropic:claude-3-5-sonnet-20241022"],
+        concurrency=2, use_cache=False, adaptive=schemas.AdaptiveSampling(min_documents=8),
+    )
+
+    status = await runner.run(request)
+
+    assert status["total_cells"] == 80
+    # Both models stop once they have their minimum documents, plus the cells already in flight
+    assert 16 <= len(calls) <= 18
+    assert status["completed_cells"] == len(calls)
+    report = status["adaptive"]["models"]
+    assert report["openai:gpt-4o-mini"]["mean"] == 1.0
+    assert report["anthropic:claude-3-5-sonnet-20241022"]["mean"] == 0.0
+    # Perfect and zero scores only separate the models; neither is precise after 8 documents
+    assert {model["stopped"] for model in report.values()} == {"ranking"}
+    # The first documents sampled mirror the 1-in-4 share of "small" ones
+    sampled = {record[0] for record in runner.load_checkpoint("adaptive")}
+    assert sum(int(doc_id) % 4 == 0 for doc_id in sampled) == 2
+
+    calls.clear()
+    await runner.run(request)
+    assert calls == []
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+import threading
+
+import pytest
+
+from api.v1.services.analytics_service import ModelAnalytics
+from persistence import crud
+from persistence.models import ExperimentRun, Parameter
+
+MODEL = "openai:gpt-4o-mini"
+OTHER = "anthropic:claude-3-5-sonnet-20241022"
+
+
+def add_run(db, results, timestamp=None, tags=None):
+    run = ExperimentRun(name="run", timestamp=timestamp or datetime.now(), status="COMPLETED")
+    if tags:
+        run.parameters.append(Parameter(name="tags", value=",".join(tags), datatype="str"))
+    db.add(run)
+    db.flush()
+    crud.add_model_results(db, [{
+        "run_id": run.id, "model": MODEL, "status": "COMPLETED", "cache_hit": False,
+        "elapsed_time": None, "tokens_per_second": None, "total_tokens": None, "node_count": None,
+        **result,
+    } for result in results])
+    db.commit()
+
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
+
+
+def test_model_stats_aggregates_percentiles_and_errors(db):
+    add_run(db, [
+        {"elapsed_time": float(i), "tokens_per_second": 10.0, "total_tokens": 100, "node_count": i}
+        for i in range(1, 101)
+    ])
+    add_run(db, [
+        {"status": "ERROR"},
+        {"elapsed_time": 0.0, "cache_hit": True, "node_count": 1},
+        {"model": OTHER, "elapsed_time": 2.0, "node_count": 3},
+    ])
+
+    stats = ModelAnalytics().model_stats(db)
+
+    gpt = stats[MODEL]
+    assert gpt["runs"] == 102 and gpt["errors"] == 1 and gpt["cache_hits"] == 1
+    assert gpt["error_rate"] == pytest.approx(1 / 102)
+    # The cache hit is excluded from latency
+    assert gpt["latency"]["mean"] == pytest.approx(50.5)
+    assert gpt["latency"]["p50"] == pytest.approx(50.5)
+    assert gpt["latency"]["p99"] == pytest.approx(99.01)
+    assert gpt["tokens_per_second"]["mean"] == 10.0
+    assert gpt["graph"]["node_count"]["min"] == 1 and gpt["graph"]["node_count"]["max"] == 100
+    assert stats[OTHER]["time_to_first_token"] == {"mean": None, "p50": None, "p95": None}
+
+
+def test_new_runs_are_folded_in_incrementally(db):
+    analytics = ModelAnalytics()
+    add_run(db, [{"elapsed_time": 1.0}])
+    first = analytics.model_stats(db)
+    assert analytics.model_stats(db) is first  # nothing new: served from cache
+
+    add_run(db, [{"elapsed_time": 3.0}])
+    second = analytics.model_stats(db)
+    assert second[MODEL]["runs"] == 2
+    assert second[MODEL]["latency"]["mean"] == 2.0
+
+
+def test_window_and_tag_filters(db):
+    analytics = ModelAnalytics()
+    add_run(db, [{"elapsed_time": 9.0}], timestamp=datetime.now() - timedelta(days=30))
+    add_run(db, [{"elapsed_time": 1.0}], tags=["prod-candidate"])
+    add_run(db, [{"elapsed_time": 2.0}], tags=["nightly"])
+
+    assert analytics.model_stats(db, days=7)[MODEL]["runs"] == 2
+    tagged = analytics.model_stats(db, tag="prod-candidate")
+    assert tagged[MODEL]["latency"]["mean"] == 1.0
+    assert analytics.model_stats(db, models=[OTHER]) == {}
+
+
+def test_slow_aggregation_does_not_block_other_filters(session_factory, monkeypatch):
+    analytics = ModelAnalytics()
+    db = session_factory()
+    add_run(db, [{"elapsed_time": 1.0}, {"model": OTHER, "elapsed_time": 2.0}])
+    summarize = ModelAnalytics.summarize
+    release = threading.Event()
+
+    def slow_summarize(frame):
+        if set(frame["model"]) == {OTHER}:
+            release.wait(5)
+        return summarize(frame)
+
+    monkeypatch.setattr(ModelAnalytics, "summarize", staticmethod(slow_summarize))
+    slow = threading.Thread(target=analytics.model_stats, args=(session_factory(),), kwargs={"models": [OTHER]})
+    slow.start()
+    try:
+        assert analytics.model_stats(db, models=[MODEL])[MODEL]["runs"] == 1
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join()
+    assert analytics.model_stats(db, models=[OTHER])[OTHER]["runs"] == 1
@@ -0,0 +1,42 @@
+from benchmarks.harness import Benchmark, SkipBenchmark, compare_results, measure, run_benchmarks
+from benchmarks.suites import synthetic_graph
+from api.v1.utils.graph_analyzer import GraphAnalyzer
+
+
+def test_measure_reports_per_call_statistics():
+    result = measure(lambda: sum(range(100)), repeat=3, min_time=0.001)
+    assert result["rounds"] == 3 and result["loops"] >= 1
+    assert 0 < result["min"] <= result["median"]
+
+
+def test_run_benchmarks_filters_and_records_skips():
+    def skipped(param):
+        raise SkipBenchmark("no data")
+
+    torn_down = []
+    document = run_benchmarks(
+        [
+            Benchmark("sized", lambda n: ((lambda: list(range(n))), lambda: torn_down.append(n)), (10, 1000), (10,)),
+            Benchmark("offline", skipped),
+        ],
+        quick=True, repeat=2, min_time=0.001,
+    )
+    assert set(document["results"]) == {"sized[10]", "offline"}
+    assert document["results"]["offline"] == {"skipped": "no data"}
+    assert torn_down == [10]
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}, "gone": {"median": 1.0}}}
+    current = {"results": {"a": {"median": 1.1}, "b": {"median": 1.5}, "c": {"median": 0.5}, "new": {"median": 1.0}}}
+    statuses = {row["case"]: row["status"] for row in compare_results(baseline, current, threshold=0.15)}
+    assert statuses == {"a": "unchanged", "b": "regression", "c": "improvement"}
+
+
+def test_synthetic_graph_shape():
+    assert GraphAnalyzer.analyze_graph(synthetic_graph(100)) == {
+        "node_count": 100,
+        "relationship_count": 150,
+        "node_property_count": 300,
+        "relationship_property_count": 150,
+    }
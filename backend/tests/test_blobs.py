@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.v1.endpoints.experiments import parse_byte_range
+from api.v1.services.export_service import iter_run_chunks
+from persistence import blobs
+from persistence.base import Base
+from persistence.migrations import MIGRATIONS, _move_outputs_to_blobs, migrate
+from persistence.models import Blob, ExperimentOutput, ExperimentRun
+
+# Large enough for the blob store, with a multi-byte character to keep offsets honest
+GRAPH = '{"nodes": [' + ", ".join(f'{{"id": "n{i}", "name": "Société {i}"}}' for i in range(200)) + "]}"
+
+
+def run_with_outputs(outputs):
+    run = ExperimentRun(name="run", timestamp=datetime(2024, 5, 1), status="COMPLETED")
+    run.outputs.extend(
+        ExperimentOutput(output_name=name, output_value=value, output_datatype="str")
+        for name, value in outputs.items()
+    )
+    return run
+
+
+def test_large_outputs_are_compressed_once_and_read_back(session_factory):
+    db = session_factory()
+    runs = [run_with_outputs({"a_response": GRAPH, "b_response": GRAPH, "error_details": "short"}) for _ in range(2)]
+    for run in runs:
+        blobs.offload_outputs(db, run.outputs)
+        db.add(run)
+    db.commit()
+
+    assert db.query(Blob).count() == 1
+    blob = db.query(Blob).one()
+    assert blob.size == len(GRAPH.encode("utf-8")) and len(blob.data) < blob.size / 4
+    stored = {o.output_name: o.output_value for o in runs[0].outputs}
+    assert stored == {"a_response": "", "b_response": "", "error_details": "short"}
+    assert blobs.output_texts(db, runs[1].outputs) == {"a_response": GRAPH, "b_response": GRAPH, "error_details": "short"}
+
+    [chunk] = iter_run_chunks(db)
+    assert chunk[1]["outputs"]["b_response"] == GRAPH
+    db.close()
+
+
+@pytest.mark.parametrize("start,end", [(0, None), (0, 1), (100, 5000), (5000, None), (0, 10 ** 9)])
+def test_iter_blob_streams_byte_ranges(session_factory, monkeypatch, start, end):
+    monkeypatch.setattr(blobs, "READ_CHUNK_SIZE", 64)
+    db = session_factory()
+    run = run_with_outputs({"a_response": GRAPH})
+    blobs.offload_outputs(db, run.outputs)
+    db.add(run)
+    db.commit()
+
+    data = GRAPH.encode("utf-8")
+    streamed = b"".join(blobs.iter_blob(db, run.outputs[0].blob_hash, start, end))
+    assert streamed == data[start:end]
+    db.close()
+
+
+def test_parse_byte_range():
+    assert parse_byte_range("bytes=10-19", 100) == (10, 20)
+    assert parse_byte_range("bytes=90-", 100) == (90, 100)
+    assert parse_byte_range("bytes=-5", 100) == (95, 100)
+    assert parse_byte_range("bytes=50-500", 100) == (50, 100)
+    for header in ("bytes=100-", "bytes=1-2,5-6", "lines=1-2"):
+        with pytest.raises(HTTPException) as error:
+            parse_byte_range(header, 100)
+        assert error.value.status_code == 416
+
+
+def test_migration_moves_existing_outputs_into_blobs():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(run_with_outputs({"a_response": GRAPH, "b_error": "Error: boom"}))
+    db.commit()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {MIGRATIONS.index(_move_outputs_to_blobs)}")
+
+    migrate(engine)
+
+    outputs = db.query(ExperimentOutput).order_by(ExperimentOutput.id).all()
+    assert [o.blob_hash is not None for o in outputs] == [True, False]
+    assert blobs.output_texts(db, outputs)["a_response"] == GRAPH
+    db.close()
+    engine.dispose()
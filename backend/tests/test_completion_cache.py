@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from api.v1.services.completion_cache import CompletionCache
+from api.v1.services.experiment_service import ExperimentService
+from persistence import schemas
+from persistence.models import CompletionCacheEntry, ExperimentRun
+
+MESSAGES = [{"role": "user", "content": "Extract the graph"}]
+PARAMS = {"temperature": 0.0}
+
+
+def test_key_depends_on_model_messages_and_params():
+    key = CompletionCache.make_key("openai:gpt-4o", MESSAGES, PARAMS)
+    assert key == CompletionCache.make_key("openai:gpt-4o", list(MESSAGES), dict(PARAMS))
+    assert key != CompletionCache.make_key("openai:gpt-4o-mini", MESSAGES, PARAMS)
+    assert key != CompletionCache.make_key("openai:gpt-4o", MESSAGES, {"temperature": 0.5})
+    assert CompletionCache.is_cacheable(PARAMS)
+    assert not CompletionCache.is_cacheable({"temperature": 0.7})
+
+
+def test_get_and_put_track_hits_and_misses(session_factory):
+    cache = CompletionCache()
+    db = session_factory()
+
+    assert cache.get_many(db, ["a"]) == {}
+    cache.put_many(db, {"a": {"model": "openai:gpt-4o", "response": "hello"}})
+    assert cache.get_many(db, ["a", "b"]) == {"a": "hello"}
+
+    stats = cache.stats(db)
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    assert db.get(CompletionCacheEntry, "a").hit_count == 1
+
+
+def test_evicts_expired_and_least_recently_used(session_factory):
+    cache = CompletionCache(max_entries=2, max_age=timedelta(days=1))
+    db = session_factory()
+    old = datetime.now() - timedelta(days=2)
+    db.add(CompletionCacheEntry(
+        key="expired", model="m", response="x", size=1,
+        created_at=old, last_accessed=old, hit_count=0,
+    ))
+    db.commit()
+
+    for key in ("a", "b"):
+        cache.put_many(db, {key: {"model": "m", "response": key}})
+    cache.get_many(db, ["a"])
+    cache.put_many(db, {"c": {"model": "m", "response": "c"}})
+
+    assert {entry.key for entry in db.query(CompletionCacheEntry)} == {"a", "c"}
+
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+async def test_repeated_experiment_is_served_from_cache(mock_client, session_factory, fake_encoding):
+    mock_client_instance = Mock()
+    mock_client_instance.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content="cached answer"))]
+    )
+    mock_client.return_value = mock_client_instance
+
+    service = ExperimentService(cache=CompletionCache())
+    experiment = schemas.ExperimentCreate(
+        system_prompt="sys", user_prompt="user", models=["openai:gpt-4o-mini"]
+    )
+    db = session_factory()
+
+    first = await service.run_experiment(experiment, db)
+    second = await service.run_experiment(experiment, db)
+    refreshed = await service.run_experiment(
+        experiment.model_copy(update={"refresh_cache": True}), db
+    )
+
+    assert mock_client_instance.chat.completions.create.call_count == 2
+    assert "cache_hit" not in first["results"][0]
+    assert second["results"][0]["cache_hit"] is True
+    assert second["results"][0]["response"] == "cached answer"
+    assert [r.cache_hit for r in db.get(ExperimentRun, second["id"]).results] == [True]
+    assert "cache_hit" not in refreshed["results"][0]
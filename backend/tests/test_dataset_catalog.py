@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from api.v1.services.dataset_catalog import DatasetCatalog
+
+GRAPH = {"nodes": [{"id": "a", "type": "Company", "properties": {"name": "A"}}], "relationships": []}
+
+
+def write_document(root, domain, doc_id, complexity, tags, entity_types):
+    doc_dir = root / domain / doc_id
+    doc_dir.mkdir(parents=True, exist_ok=True)
+    (doc_dir / "source.txt").write_text(f"Source text {doc_id}")
+    (doc_dir / "ground_truth_graph.json").write_text(json.dumps(GRAPH))
+    (doc_dir / "metadata.json").write_text(json.dumps({
+        "complexity": complexity,
+        "tags": tags,
+        "metrics": {"entity_types": entity_types, "expected_entity_count": len(entity_types)},
+    }))
+    return doc_dir
+
+
+def touch(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10 ** 9))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_document(tmp_path, "startups", "001", "micro", ["funding"], ["Company", "Person"])
+    write_document(tmp_path, "startups", "002", "small", ["hiring", "funding"], ["Company"])
+    write_document(tmp_path, "biotech", "001", "micro", ["trials"], ["Drug"])
+    return tmp_path
+
+
+def ids(documents):
+    return [(d.domain, d.document_id) for d in documents]
+
+
+def test_query_uses_the_indexes(data_dir):
+    catalog = DatasetCatalog(str(data_dir), refresh_seconds=60)
+
+    assert catalog.domains() == ["biotech", "startups"]
+    assert ids(catalog.query(complexity=["micro"])) == [("biotech", "001"), ("startups", "001")]
+    assert ids(catalog.query(domain="startups", tags=["funding"], entity_types=["Person"])) == [("startups", "001")]
+    assert ids(catalog.query(domain="startups", tags=["hiring", "trials"])) == [("startups", "002")]
+    assert catalog.query(entity_types=["Planet"]) == []
+    assert catalog.get("startups", "002").summary()["expected_entity_count"] == 1
+    assert catalog.facets("startups")["tag"] == {"funding": 2, "hiring": 1}
+    with pytest.raises(ValueError):
+        catalog.query(domain="missing")
+
+
+def test_refresh_reindexes_only_changed_documents(data_dir):
+    catalog = DatasetCatalog(str(data_dir), refresh_seconds=60)
+    assert catalog.refresh() == {"added": 3, "updated": 0, "removed": 0}
+    assert catalog.refresh() == {"added": 0, "updated": 0, "removed": 0}
+
+    doc_dir = write_document(data_dir, "startups", "002", "large", ["hiring"], ["Company"])
+    touch(doc_dir / "metadata.json", 5)
+    write_document(data_dir, "startups", "003", "micro", [], [])
+    shutil.rmtree(data_dir / "biotech")
+    # Within refresh_seconds queries keep the current index
+    assert ids(catalog.query(complexity=["large"])) == []
+
+    assert catalog.refresh() == {"added": 1, "updated": 1, "removed": 1}
+    assert ids(catalog.query(complexity=["large"])) == [("startups", "002")]
+    assert ids(catalog.query(tags=["funding"])) == [("startups", "001")]
+    assert catalog.domains() == ["startups"]
+
+
+def test_files_are_loaded_lazily_and_cached(data_dir):
+    catalog = DatasetCatalog(str(data_dir), cache_size=2, refresh_seconds=60)
+    first, second = catalog.query(domain="startups")
+
+    assert first.read_source() == "Source text 001"
+    assert first.read_ground_truth() == GRAPH
+    assert first.read_source() == "Source text 001"
+    assert (catalog.hits, catalog.misses) == (1, 2)
+
+    # Evicts the least recently used entry (001's ground truth)
+    second.read_source()
+    first.read_source()
+    first.read_ground_truth()
+    assert (catalog.hits, catalog.misses) == (2, 4)
+
+    # An edited file is read again
+    (data_dir / "startups" / "001" / "source.txt").write_text("Revised")
+    touch(data_dir / "startups" / "001" / "source.txt", 5)
+    assert first.read_source() == "Revised"
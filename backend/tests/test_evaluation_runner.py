@@ -0,0 +1,89 @@
+import json
+import pytest
+from unittest.mock import Mock, patch
+
+from api.v1.services.completion_cache import CompletionCache
+from api.v1.services.evaluation_runner import CheckpointMismatchError, EvaluationRunner
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.utils.dataset_loader import load_documents
+from persistence import schemas
+
+GRAPH = {"nodes": [{"id": "a", "type": "Company", "properties": {"name": "A"}}], "relationships": []}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for doc_id, complexity, tags in [("001", "micro", ["funding"]), ("002", "small", ["hiring"])]:
+        doc_dir = tmp_path / "startups" / doc_id
+        doc_dir.mkdir(parents=True)
+        (doc_dir / "source.txt").write_text(f"Source text {doc_id}")
+        (doc_dir / "ground_truth_graph.json").write_text(json.dumps(GRAPH))
+        (doc_dir / "metadata.json").write_text(json.dumps({"complexity": complexity, "tags": tags}))
+    return tmp_path
+
+
+@pytest.fixture
+def request_config():
+    return schemas.EvaluationCreate(
+        name="prompt-v1",
+        dataset="startups",
+        models=["openai:gpt-4o-mini", "anthropic:claude-3-5-sonnet-20241022"],
+        system_prompt="Extract a knowledge graph",
+        user_prompt_template="Document $document_id:\n$source",
+        concurrency=2,
+        use_cache=False,
+    )
+
+
+def test_load_documents_filters(data_dir):
+    assert [d.document_id for d in load_documents("startups", data_dir=str(data_dir))] == ["001", "002"]
+    assert [d.document_id for d in load_documents("startups", data_dir=str(data_dir), complexity=["small"])] == ["002"]
+    assert [d.document_id for d in load_documents("startups", data_dir=str(data_dir), tags=["funding"])] == ["001"]
+    with pytest.raises(ValueError):
+        load_documents("missing", data_dir=str(data_dir))
+
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+async def test_run_checkpoints_and_resumes_failed_cells(mock_client, data_dir, tmp_path, request_config, session_factory, fake_encoding):
+    calls = []
+    fail_anthropic = True
+
+    def create(model, messages, **kwargs):
+        calls.append((model, messages[1]["content"]))
+        if model.startswith("anthropic") and fail_anthropic:
+            raise Exception("rate limited")
+        return Mock(choices=[Mock(message=Mock(content=json.dumps(GRAPH)))])
+
+    mock_client.return_value.chat.completions.create.side_effect = create
+    runner = EvaluationRunner(
+        ExperimentService(cache=CompletionCache()),
+        data_dir=str(data_dir),
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+        session_factory=session_factory,
+    )
+
+    status = await runner.run(request_config)
+    assert status["completed_cells"] == 4
+    assert status["summary"]["anthropic:claude-3-5-sonnet-20241022"]["errors"] == 2
+    assert ("openai:gpt-4o-mini", "Document 001:\nSource text 001") in calls
+    record = runner.load_checkpoint("prompt-v1")[("001", "openai:gpt-4o-mini")]
+    assert record["graph_metrics"]["node_count"] == 1
+    assert record["scores"]["node_f1"] == 1.0
+    assert status["summary"]["openai:gpt-4o-mini"]["mean_node_f1"] == 1.0
+
+    # Resuming only re-runs the failed cells
+    calls.clear()
+    fail_anthropic = False
+    pending = runner.plan(request_config)
+    assert [model for _, model in pending] == ["anthropic:claude-3-5-sonnet-20241022"] * 2
+    status = await runner.run(request_config, pending=pending)
+    assert sorted(model for model, _ in calls) == ["anthropic:claude-3-5-sonnet-20241022"] * 2
+    assert status["summary"]["anthropic:claude-3-5-sonnet-20241022"]["errors"] == 0
+
+
+def test_resume_with_changed_configuration_is_rejected(data_dir, tmp_path, request_config):
+    runner = EvaluationRunner(Mock(), data_dir=str(data_dir), checkpoint_dir=str(tmp_path / "checkpoints"))
+    runner.plan(request_config)
+    with pytest.raises(CheckpointMismatchError):
+        runner.plan(request_config.model_copy(update={"system_prompt": "Something else"}))
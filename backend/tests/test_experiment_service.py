@@ -117,4 +117,85 @@ def test_get_experiment_not_found(mock_crud, service, mock_db):
     with pytest.raises(Exception) as exc_info:
         service.get_experiment(999, mock_db)
     
-    assert "Experiment not found" in str(exc_info.value)
\ No newline at end of file
+    assert "Experiment not found" in str(exc_info.value)
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+@patch('api.v1.services.experiment_service.crud')
+async def test_run_experiment_dispatches_models_concurrently(mock_crud, mock_client, mock_db, fake_encoding):
+    import time
+
+    latencies = {"openai:a": 0.3, "openai:b": 0.1, "anthropic:c": 0.2}
+
+    def create(model, messages, temperature):
+        time.sleep(latencies[model])
+        return Mock(choices=[Mock(message=Mock(content=f"{model} response"))])
+
+    mock_client_instance = Mock()
+    mock_client_instance.chat.completions.create.side_effect = create
+    mock_client.return_value = mock_client_instance
+
+    mock_experiment = Mock(id=1, status="RUNNING", parameters=[], outputs=[])
+    mock_crud.create_experiment.return_value = mock_experiment
+
+    experiment = schemas.ExperimentCreate(
+        system_prompt="sys", user_prompt="user", models=list(latencies)
+    )
+    service = ExperimentService(default_concurrency=2)
+
+    start = time.monotonic()
+    result = await service.run_experiment(experiment, mock_db)
+    elapsed = time.monotonic() - start
+
+    # Roughly the slowest model, not the sum of all three
+    assert elapsed < sum(latencies.values())
+    assert result["status"] == "COMPLETED"
+    # Results and outputs follow the requested model order, not completion order
+    assert [r["model"] for r in result["results"]] == list(latencies)
+    response_outputs = [
+        o.output_name for o in mock_experiment.outputs if o.output_name.endswith("_response")
+    ]
+    assert response_outputs == [f"{m}_response" for m in latencies]
+
+
+def test_parse_provider_limits():
+    from api.v1.services.experiment_service import parse_provider_limits
+
+    assert parse_provider_limits("openai=8, anthropic=2") == {"openai": 8, "anthropic": 2}
+    assert parse_provider_limits("") == {}
+
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+@patch('api.v1.services.experiment_service.crud')
+async def test_stream_experiment_relays_tokens_and_records_timings(mock_crud, mock_client, service, mock_db, fake_encoding):
+    def chunk(text):
+        return Mock(choices=[Mock(delta=Mock(content=text))])
+
+    mock_client_instance = Mock()
+    mock_client_instance.chat.completions.create.side_effect = (
+        lambda **kwargs: iter([chunk('{"nodes"'), chunk(": []}")])
+    )
+    mock_client.return_value = mock_client_instance
+
+    mock_experiment = Mock(id=7, status="RUNNING", parameters=[], outputs=[])
+    mock_crud.create_experiment.return_value = mock_experiment
+
+    experiment = schemas.ExperimentCreate(
+        system_prompt="sys", user_prompt="user", models=["openai:gpt-4o-mini"]
+    )
+    events = [e async for e in service.stream_experiment(experiment, mock_db)]
+
+    names = [name for name, _ in events]
+    assert names[0] == "run" and names[-1] == "done"
+    deltas = [data["delta"] for name, data in events if name == "token"]
+    assert "".join(deltas) == '{"nodes": []}'
+    assert names.index("model_done") > names.index("token")
+    assert events[-1][1]["status"] == "COMPLETED"
+
+    assert {o.output_name for o in mock_experiment.outputs} == {"openai:gpt-4o-mini_response"}
+    db, rows = mock_crud.add_model_results.call_args.args
+    assert rows[0]["run_id"] == 7 and rows[0]["status"] == "COMPLETED"
+    for metric in ("time_to_first_token", "inter_token_latency", "elapsed_time", "tokens_per_second"):
+        assert isinstance(rows[0][metric], float)
+    assert rows[0]["node_count"] == 0
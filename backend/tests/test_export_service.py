@@ -0,0 +1,77 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from api.v1.services import export_service
+from api.v1.services.export_service import ExportFormatError, iter_export
+from persistence import crud
+from persistence.models import ExperimentOutput, ExperimentRun, Parameter
+
+MODEL = "openai:gpt-4o-mini"
+
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    for i in range(5):
+        run = ExperimentRun(name=f"run {i}", timestamp=datetime(2024, 5, i + 1), status="COMPLETED")
+        run.parameters.append(Parameter(name="models", value=MODEL, datatype="str"))
+        run.outputs.append(ExperimentOutput(
+            output_name=f"{MODEL}_response", output_value=f"response {i}", output_datatype="str"
+        ))
+        db.add(run)
+        db.flush()
+        crud.add_model_results(db, [{
+            "run_id": run.id, "model": MODEL, "status": "COMPLETED",
+            "elapsed_time": float(i), "total_tokens": 10 * i, "cache_hit": False,
+        }])
+    failed = ExperimentRun(name="failed", timestamp=datetime(2024, 6, 1), status="ERROR")
+    failed.outputs.append(ExperimentOutput(output_name="error_details", output_value="boom", output_datatype="str"))
+    db.add(failed)
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_ndjson_streams_every_run_in_chunks(db):
+    chunks = list(iter_export(db, "ndjson", chunk_size=2))
+    records = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+
+    assert len(chunks) == 3
+    assert [r["name"] for r in records] == ["run 0", "run 1", "run 2", "run 3", "run 4", "failed"]
+    assert records[1]["timestamp"] == "2024-05-02T00:00:00"
+    assert records[1]["outputs"] == {f"{MODEL}_response": "response 1"}
+    assert records[1]["results"][0]["elapsed_time"] == 1.0
+    assert [r["name"] for r in (json.loads(line) for line in b"".join(
+        iter_export(db, "ndjson", status="ERROR")
+    ).splitlines())] == ["failed"]
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_columnar_export_has_typed_metric_columns(db, export_format):
+    pa = pytest.importorskip("pyarrow")
+    data = b"".join(iter_export(db, export_format, chunk_size=2))
+
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(data))
+        assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == 3
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+
+    assert table.num_rows == 6
+    assert table.schema.field("elapsed_time").type == pa.float64()
+    assert table.schema.field("total_tokens").type == pa.int64()
+    assert table.column("response").to_pylist()[:2] == ["response 0", "response 1"]
+    last = table.slice(5).to_pylist()[0]
+    assert last["model"] is None and last["error_details"] == "boom"
+
+
+def test_unknown_or_unavailable_format(db, monkeypatch):
+    with pytest.raises(ExportFormatError):
+        iter_export(db, "csv")
+    monkeypatch.setattr(export_service.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ExportFormatError, match="pyarrow"):
+        iter_export(db, "parquet")
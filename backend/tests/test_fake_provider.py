@@ -0,0 +1,86 @@
+import httpx
+import pytest
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.services.fake_provider import PROVIDER_KEY, CharacterEncoding, FakeProviderClient, FakeProviderError
+from api.v1.utils import token_counter
+from api.v1.utils.graph_stream_parser import GraphStreamParser
+from benchmarks.load import drive
+
+MESSAGES = [{"role": "user", "content": "Extract the graph"}]
+
+
+def test_profiles_resolve_with_inline_overrides():
+    client = FakeProviderClient(seed=1)
+    profile = client.profile_for("typical?nodes=3&error_rate=0.5")
+    assert profile.nodes == 3 and profile.error_rate == 0.5 and profile.tokens_per_second == 60
+    with pytest.raises(ValueError):
+        client.profile_for("typical?colour=blue")
+    with pytest.raises(ValueError):
+        client.profile_for("missing")
+
+
+def test_completions_return_graphs_and_stream_the_same_text():
+    client = FakeProviderClient(seed=1)
+    response = client.chat.completions.create("fake:instant?nodes=4", MESSAGES)
+    parser = GraphStreamParser.parse(response.choices[0].message.content)
+    assert parser.complete and parser.metrics.node_count == 4 and parser.metrics.relationship_count == 6
+
+    chunks = list(client.chat.completions.create("fake:instant?nodes=4", MESSAGES, stream=True))
+    assert len(chunks) > 1
+    streamed = "".join(chunk.choices[0].delta.content for chunk in chunks)
+    assert GraphStreamParser.parse(streamed).metrics.as_dict() == parser.metrics.as_dict()
+
+
+def test_rate_limits_carry_status_and_retry_after():
+    client = FakeProviderClient(seed=1)
+    with pytest.raises(FakeProviderError) as error:
+        client.chat.completions.create("fake:instant?rate_limit_rate=1&retry_after=2.5", MESSAGES)
+    assert error.value.response.status_code == 429
+    assert error.value.response.headers["retry-after"] == "2.5"
+    with pytest.raises(FakeProviderError):
+        client.chat.completions.create("fake:instant?error_rate=1", MESSAGES)
+
+
+def test_other_providers_go_to_the_fallback():
+    with pytest.raises(ValueError):
+        FakeProviderClient().chat.completions.create("openai:gpt-4o-mini", MESSAGES)
+
+
+@pytest.mark.asyncio
+async def test_service_runs_fake_models_through_an_injected_client(monkeypatch):
+    # As FAKE_PROVIDER_ENABLED would at import
+    monkeypatch.setitem(token_counter._provider_encodings, PROVIDER_KEY, CharacterEncoding())
+    token_counter.clear_token_caches()
+    service = ExperimentService(client_factory=lambda: FakeProviderClient(seed=3))
+    outputs, result, failed = await service.run_model(
+        service.new_client(), "fake:instant?nodes=5", MESSAGES, on_token=lambda text: None
+    )
+    assert not failed
+    assert result["graph_metrics"]["node_count"] == 5
+    assert result["token_counts"]["output"] == -(-len(result["response"]) // 4)
+
+
+@pytest.mark.asyncio
+async def test_load_generator_reports_outcomes_and_percentiles():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) % 5 == 0:
+            return httpx.Response(503, json={"detail": "queue full"})
+        return httpx.Response(200, json={
+            "status": "COMPLETED",
+            "results": [
+                {"model": "fake:fast", "response": "{}"},
+                {"model": "fake:flaky", "response": "Error: Error with fake:flaky:\nResponse status: 429"},
+            ],
+        })
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+        summary = await drive(client, ["fake:fast", "fake:flaky"], concurrency=3, requests=10)
+
+    assert summary["requests"] == 10
+    assert summary["outcomes"] == {"http_503": 2, "ok": 8}
+    assert summary["model_calls"] == 16 and summary["rate_limited"] == 8
+    assert summary["latency"]["p50"] is not None
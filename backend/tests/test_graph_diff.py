@@ -0,0 +1,136 @@
+import copy
+import json
+import random
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from api.v1.services.fake_provider import synthetic_graph
+from api.v1.services.graph_diff_service import GraphDiffService, NoGraphError, OutputNotFoundError
+from api.v1.utils.graph_diff import diff_graphs, property_changes
+from persistence import blobs
+from persistence.models import ExperimentOutput, ExperimentRun
+
+BEFORE = {
+    "nodes": [
+        {"id": "acme", "type": "Company", "properties": {"name": "Acme Corp", "employees": 1000}},
+        {"id": "bob", "type": "Person", "properties": {"name": "Bob Smith"}},
+        {"id": "old", "type": "Product", "properties": {"name": "Widget"}},
+    ],
+    "relationships": [
+        {"source": "bob", "type": "WORKS_AT", "target": "acme", "properties": {"since": 2019}},
+        {"source": "acme", "type": "MAKES", "target": "old"},
+    ],
+}
+AFTER = {
+    "nodes": [
+        {"id": "company_1", "type": "Company", "properties": [
+            {"key": "name", "value": "Acme Corp"}, {"key": "employees", "value": "1,000"},
+            {"key": "founded", "value": 1999},
+        ]},
+        {"id": "bob", "type": "Person", "properties": {"name": "Bob Smith"}},
+        {"id": "alice", "type": "Person", "properties": {"name": "Alice Jones"}},
+    ],
+    "relationships": [
+        {"source": "bob", "type": "works_at", "target": "company_1", "properties": {"since": 2020}},
+        {"source": "alice", "type": "WORKS_AT", "target": "company_1"},
+    ],
+}
+
+
+def test_diff_graphs_pairs_renamed_nodes_and_reports_property_changes():
+    diff = diff_graphs(BEFORE, AFTER)
+
+    assert [node["id"] for node in diff["nodes"]["added"]] == ["alice"]
+    assert [node["id"] for node in diff["nodes"]["removed"]] == ["old"]
+    [changed] = diff["nodes"]["changed"]
+    assert changed["before"]["id"] == "acme" and changed["after"]["id"] == "company_1"
+    # "1,000" equals 1000 once normalized
+    assert changed["properties"] == {"founded": {"before": None, "after": 1999}}
+
+    assert diff["relationships"]["changed"] == [{
+        "source": "bob", "type": "works_at", "target": "company_1",
+        "properties": {"since": {"before": 2019, "after": 2020}},
+    }]
+    assert [r["type"] for r in diff["relationships"]["added"]] == ["WORKS_AT"]
+    assert [r["type"] for r in diff["relationships"]["removed"]] == ["MAKES"]
+    assert diff["summary"]["nodes"] == {
+        "before": 3, "after": 3, "added": 1, "removed": 1, "changed": 1, "unchanged": 1,
+    }
+    assert diff["summary"]["property_changes"] == 2
+    assert diff["summary"]["node_similarity"] == 0.5
+
+
+def test_identical_graphs_have_an_empty_diff():
+    diff = diff_graphs(BEFORE, BEFORE)
+    assert diff["nodes"] == diff["relationships"] == {"added": [], "removed": [], "changed": []}
+    assert diff["summary"]["relationship_similarity"] == 1.0
+    assert property_changes({"Name": "Acme"}, [{"key": "name", "value": "ACME"}]) == {}
+
+
+def test_schema_shaped_relationships_pair_on_their_endpoints():
+    before = synthetic_graph(20, random.Random(1))
+    after = synthetic_graph(20, random.Random(2))
+    edges = {(r["source_id"], r["type"], r["target_id"]) for r in before["relationships"]}
+    moved = sum(1 for r in after["relationships"] if (r["source_id"], r["type"], r["target_id"]) not in edges)
+
+    diff = diff_graphs(before, after)
+
+    assert diff["summary"]["nodes"]["unchanged"] == 20
+    assert diff["summary"]["relationships"]["added"] == moved > 0
+    assert diff["summary"]["relationship_similarity"] < 1.0
+
+    edited = copy.deepcopy(before)
+    edge = edited["relationships"][0]
+    edge["properties"] = [{"key": "year", "value": 1900}]
+    [changed] = diff_graphs(before, edited)["relationships"]["changed"]
+    assert (changed["source"], changed["target"]) == (edge["source_id"], edge["target_id"])
+
+
+def test_large_graph_diff_is_fast():
+    nodes = [{"id": f"n{i}", "type": "Company", "properties": {"name": f"Company {i}", "rank": i}} for i in range(3000)]
+    relationships = [{"source": f"n{i}", "type": "OWNS", "target": f"n{i + 1}"} for i in range(2999)]
+    changed = [dict(node, properties=dict(node["properties"], rank=-1)) if i % 10 == 0 else node
+               for i, node in enumerate(nodes)]
+
+    started = time.perf_counter()
+    diff = diff_graphs({"nodes": nodes, "relationships": relationships}, {"nodes": changed, "relationships": relationships})
+    assert time.perf_counter() - started < 2.0
+    assert diff["summary"]["nodes"]["changed"] == 300
+    assert diff["summary"]["relationships"]["unchanged"] == 2999
+
+
+def store_run(db, responses):
+    run = ExperimentRun(name="run", timestamp=datetime(2024, 5, 1), status="COMPLETED")
+    run.outputs.extend(
+        ExperimentOutput(output_name=f"{model}_response", output_value=text, output_datatype="str")
+        for model, text in responses.items()
+    )
+    blobs.offload_outputs(db, run.outputs, min_size=100)
+    db.add(run)
+    db.commit()
+    return run.id
+
+
+def test_service_caches_diffs_by_output_hashes(session_factory):
+    db = session_factory()
+    first = store_run(db, {"a": json.dumps(BEFORE), "b": "```json\n" + json.dumps(AFTER) + "\n```"})
+    second = store_run(db, {"a": json.dumps(BEFORE), "c": "I could not find a graph."})
+    service = GraphDiffService(cache_size=1)
+
+    diff = service.compare(db, first, "a", first, "b")
+    assert not diff["cached"] and diff["summary"]["nodes"]["added"] == 1
+    # The same texts in another run hit the cache without being parsed again
+    with patch("api.v1.services.graph_diff_service.diff_graphs") as diff_graphs_mock:
+        again = service.compare(db, second, "a", first, "b")
+    diff_graphs_mock.assert_not_called()
+    assert again["cached"] and again["nodes"] == diff["nodes"]
+    assert again["before"] == {"experiment_id": second, "model": "a", "hash": diff["before"]["hash"]}
+
+    with pytest.raises(OutputNotFoundError):
+        service.compare(db, first, "a", second, "b")
+    with pytest.raises(NoGraphError):
+        service.compare(db, first, "a", second, "c")
+    db.close()
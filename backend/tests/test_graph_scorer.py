@@ -0,0 +1,91 @@
+import time
+
+from api.v1.services.fake_provider import synthetic_graph
+from api.v1.utils.graph_scorer import GraphScorer, optimal_assignment
+
+GROUND_TRUTH = {
+    "nodes": [
+        {"id": "datamesh", "type": "Company", "properties": {"name": "DataMesh", "location": "San Francisco"}},
+        {"id": "rodriguez", "type": "Person", "properties": {"name": "Dr. Lisa Rodriguez", "title": "Founder"}},
+        {"id": "kim", "type": "Person", "properties": {"name": "Alex Kim", "title": "Co-founder"}},
+    ],
+    "relationships": [
+        {"source": "rodriguez", "target": "datamesh", "type": "FOUNDED", "properties": {}},
+        {"source": "kim", "target": "datamesh", "type": "FOUNDED", "properties": {"year": 2024}},
+    ],
+}
+
+
+def test_identical_graph_scores_perfectly():
+    scores = GraphScorer.score(GROUND_TRUTH, GROUND_TRUTH)
+    for prefix in ("node", "edge", "property"):
+        assert scores[f"{prefix}_f1"] == 1.0
+
+
+def test_matches_normalized_names_and_remaps_edges():
+    predicted = {
+        "nodes": [
+            {"id": "n1", "type": "company", "properties": [{"key": "name", "value": "datamesh"}]},
+            {"id": "n2", "type": "PERSON", "properties": {"name": "Lisa Rodriguez", "title": "founder"}},
+            {"id": "n3", "type": "Person", "properties": {"name": "Someone Else"}},
+        ],
+        "relationships": [
+            {"source": "n2", "target": "n1", "type": "founded", "properties": {}},
+            {"source": "n3", "target": "n1", "type": "FOUNDED", "properties": {}},
+        ],
+    }
+    scores = GraphScorer.score(predicted, GROUND_TRUTH)
+
+    assert scores["node_matches"] == 2
+    assert scores["node_precision"] == 2 / 3
+    assert scores["node_recall"] == 2 / 3
+    assert scores["edge_matches"] == 1
+    # name + title on the person, name on the company
+    assert scores["property_matches"] == 2
+
+
+def test_schema_shaped_relationships_are_matched():
+    predicted = {
+        "nodes": GROUND_TRUTH["nodes"],
+        "relationships": [
+            {"source_id": "rodriguez", "target_id": "datamesh", "type": "FOUNDED", "properties": []},
+            {"source_id": "kim", "target_id": "datamesh", "type": "FOUNDED",
+             "properties": [{"key": "year", "value": 2024}]},
+        ],
+    }
+    scores = GraphScorer.score(predicted, GROUND_TRUTH)
+
+    assert scores["edge_matches"] == 2
+    assert scores["edge_f1"] == 1.0
+    assert scores["property_f1"] == 1.0
+
+    graph = synthetic_graph(20)
+    assert GraphScorer.score(graph, graph)["edge_f1"] == 1.0
+
+
+def test_empty_prediction():
+    scores = GraphScorer.score({"nodes": [], "relationships": []}, GROUND_TRUTH)
+    assert scores["node_recall"] == 0.0
+    assert scores["node_f1"] == 0.0
+
+
+def test_optimal_assignment_beats_greedy():
+    # Greedy would take (0, 0) = 0.9 and leave row 1 with 0.1
+    assert sorted(optimal_assignment([[0.9, 0.8], [0.85, 0.1]])) == [(0, 1), (1, 0)]
+    assert optimal_assignment([[0.1], [0.9], [0.3]]) == [(1, 0)]
+
+
+def test_large_unnamed_groups_are_matched_greedily_on_candidates():
+    expected = [{"type": "Event", "properties": {"amount": i, "stage": "seed"}} for i in range(1500)]
+    predicted = [
+        {"type": "Event", "properties": {"amount": i + (0.5 if i % 3 == 0 else 0), "stage": "seed"}}
+        for i in reversed(range(1500))
+    ]
+
+    start = time.perf_counter()
+    scores = GraphScorer.score({"nodes": predicted}, {"nodes": expected})
+
+    assert time.perf_counter() - start < 1.0
+    assert scores["node_matches"] == 1500
+    # Every node whose amount is unchanged is paired with its own counterpart
+    assert scores["property_matches"] == 1000 * 2 + 500
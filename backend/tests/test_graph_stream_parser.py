@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from api.v1.utils.graph_analyzer import GraphAnalyzer
+from api.v1.utils.graph_stream_parser import GraphStreamParser
+
+GRAPH = {
+    "nodes": [
+        {"id": "datamesh", "type": "Company", "properties": {"name": "DataMesh {Inc}", "note": "say \"hi\" ]"}},
+        {"id": "kim", "type": "Person", "properties": {"name": "Alex Kim", "roles": ["founder", "cto"]}},
+    ],
+    "relationships": [
+        {"source": "kim", "target": "datamesh", "type": "FOUNDED", "properties": {"year": 2024}},
+    ],
+    "notes": {"nodes": [{"id": "ignored"}]},
+}
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_matches_full_parse_for_any_chunking():
+    text = json.dumps(GRAPH)
+    expected = GraphAnalyzer.analyze_graph(GRAPH)
+    for size in (1, 2, 7, len(text)):
+        parser = GraphStreamParser.parse_chunks(chunked(text, size), keep_elements=True)
+        assert parser.complete and not parser.truncated
+        assert parser.metrics.as_dict() == expected
+        assert parser.graph() == {"nodes": GRAPH["nodes"], "relationships": GRAPH["relationships"]}
+
+
+def test_skips_prose_and_code_fences():
+    text = (
+        "Here is the graph {as requested}:\n```json\n"
+        + json.dumps(GRAPH, indent=2)
+        + "\n```\nLet me know if you need {anything} else."
+    )
+    parser = GraphStreamParser.parse(text)
+
+    assert parser.complete
+    assert parser.metrics.node_count == 2
+    assert parser.metrics.relationship_count == 1
+
+
+def test_feed_yields_elements_as_they_complete():
+    parser = GraphStreamParser()
+    assert parser.feed('{"nodes": [{"id": "a", "prop') == []
+    assert parser.feed('erties": {"x": 1}}, ') == [
+        ("node", {"id": "a", "properties": {"x": 1}})
+    ]
+    assert parser.feed('{"id": "b"}], "relationships": [{"source": "a"}]}') == [
+        ("node", {"id": "b"}),
+        ("relationship", {"source": "a"}),
+    ]
+    assert parser.complete
+
+
+def test_truncated_output_reports_complete_elements():
+    text = json.dumps(GRAPH)
+    cut = text.index('{"id": "kim"') + 20
+    parser = GraphStreamParser.parse(text[:cut])
+
+    assert parser.truncated
+    assert parser.metrics.as_dict() == {
+        "node_count": 1,
+        "relationship_count": 0,
+        "node_property_count": 2,
+        "relationship_property_count": 0,
+    }
+
+
+def test_no_graph_found():
+    parser = GraphStreamParser.parse("I could not extract a graph from this text.")
+
+    assert not parser.found
+    assert parser.metrics.node_count == 0
+
+
+def test_parse_decodes_complete_output_whole(monkeypatch):
+    text = "```json\n" + json.dumps(GRAPH) + "\n```"
+    streamed = GraphStreamParser.parse_chunks(chunked(text, 5), keep_elements=True)
+    monkeypatch.setattr(GraphStreamParser, "feed", lambda self, chunk: pytest.fail("parsed incrementally"))
+    whole = GraphStreamParser.parse(text, keep_elements=True)
+
+    assert whole.complete
+    assert whole.metrics.as_dict() == streamed.metrics.as_dict()
+    assert whole.graph() == streamed.graph()
+
+
+def test_parse_falls_back_to_incremental_for_malformed_output():
+    text = '{"nodes": [{"id": "a"}, {"id": }, {"id": "b"}], "relationships": []}'
+    parser = GraphStreamParser.parse(text, keep_elements=True)
+
+    assert parser.complete
+    assert parser.invalid_elements == 1
+    assert [node["id"] for node in parser.nodes] == ["a", "b"]
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.services.job_queue import ExperimentJobQueue, QueueFullError
+from persistence import crud, schemas
+from persistence.models import ExperimentRun, Parameter
+
+
+@pytest.fixture
+def sample_experiment():
+    return schemas.ExperimentCreate(
+        name="Queued Experiment",
+        system_prompt="You are a helpful assistant",
+        user_prompt="Tell me a joke",
+        models=["openai:gpt-4o-mini", "anthropic:claude-3-5-sonnet-20241022"]
+    )
+
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+async def test_submit_returns_immediately_and_runs_in_background(mock_client, session_factory, sample_experiment, fake_encoding):
+    mock_client_instance = Mock()
+    mock_client_instance.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content="Test response"))]
+    )
+    mock_client.return_value = mock_client_instance
+
+    queue = ExperimentJobQueue(ExperimentService(), session_factory=session_factory, workers=1)
+    await queue.start()
+    db = session_factory()
+    try:
+        experiment_id = await queue.submit(sample_experiment, db)
+        assert db.get(ExperimentRun, experiment_id).status == "RUNNING"
+        assert set(queue.progress(experiment_id)) == set(sample_experiment.models)
+
+        await asyncio.wait_for(queue._queue.join(), timeout=5)
+
+        status, models, finished = crud.get_experiment_progress(db, experiment_id)
+        assert status == "COMPLETED"
+        assert finished == {f"{m}_response" for m in sample_experiment.models}
+        assert queue.progress(experiment_id) is None
+    finally:
+        db.close()
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_queue_is_full(session_factory, sample_experiment):
+    queue = ExperimentJobQueue(ExperimentService(), session_factory=session_factory, workers=0, max_queue_size=1)
+    await queue.start()
+    db = session_factory()
+    try:
+        await queue.submit(sample_experiment, db)
+        with pytest.raises(QueueFullError):
+            await queue.submit(sample_experiment, db)
+        # The rejected submission must not leave a row behind
+        assert db.query(ExperimentRun).count() == 1
+    finally:
+        db.close()
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_start_recovers_orphaned_runs(session_factory, sample_experiment):
+    db = session_factory()
+    service = ExperimentService()
+    resumable = service.create_run(sample_experiment, db)
+    broken = crud.create_experiment(db, sample_experiment)
+
+    queue = ExperimentJobQueue(service, session_factory=session_factory, workers=0)
+    await queue.start()
+    try:
+        db.expire_all()
+        assert queue.progress(resumable.id) is not None
+        assert db.get(ExperimentRun, resumable.id).status == "RUNNING"
+        assert db.get(ExperimentRun, broken.id).status == "ERROR"
+    finally:
+        db.close()
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+@patch('api.v1.services.experiment_service.ai.Client')
+async def test_background_run_with_async_sessions(mock_client, async_session_factory, sample_experiment, fake_encoding):
+    mock_client_instance = Mock()
+    mock_client_instance.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content='{"nodes": [{"id": "a"}]}'))]
+    )
+    mock_client.return_value = mock_client_instance
+
+    queue = ExperimentJobQueue(ExperimentService(), session_factory=async_session_factory, workers=2)
+    await queue.start()
+    try:
+        async with async_session_factory() as db:
+            ids = [await queue.submit(sample_experiment, db) for _ in range(3)]
+        await asyncio.wait_for(queue._queue.join(), timeout=5)
+
+        async with async_session_factory() as db:
+            for experiment_id in ids:
+                status, _, finished = await db.run_sync(crud.get_experiment_progress, experiment_id)
+                assert status == "COMPLETED"
+                assert len(finished) == len(sample_experiment.models)
+                results = await db.run_sync(crud.get_model_results, experiment_id)
+                assert [r.node_count for r in results] == [1, 1]
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_is_safe_before_start_and_twice(session_factory):
+    queue = ExperimentJobQueue(ExperimentService(), session_factory=session_factory, workers=0)
+    await queue.stop()
+    await queue.start()
+    await queue.stop()
+    await queue.stop()
@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import Mock
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.services.matrix_service import MatrixRunner, MatrixTooLargeError, TemplateSyntaxError, expand_matrix
+from persistence import crud, schemas
+
+
+def matrix_request(**overrides):
+    values = dict(
+        name="Grid",
+        system_prompts=["Extract a graph", "Extract a graph"],
+        user_prompt_templates=["About $topic"],
+        template_variables=[{"topic": "cats"}, {"topic": "dogs"}],
+        models=["openai:gpt-4o-mini", "anthropic:claude-3-5-sonnet-20241022", "openai:gpt-4o-mini"],
+        sampling={"temperature": [0.0, 0.7]},
+    )
+    values.update(overrides)
+    return schemas.MatrixExperimentCreate(**values)
+
+
+def test_expand_matrix_crosses_prompts_and_sampling_without_duplicates():
+    cells = expand_matrix(matrix_request())
+
+    assert len(cells) == 4
+    assert [(c.user_prompt, c.sampling["temperature"]) for c in cells] == [
+        ("About cats", 0.0), ("About cats", 0.7), ("About dogs", 0.0), ("About dogs", 0.7),
+    ]
+    assert cells[0].models == ["openai:gpt-4o-mini", "anthropic:claude-3-5-sonnet-20241022"]
+    assert cells[1].name == "Grid [s1 u1 temperature=0.7]"
+
+
+def test_expand_matrix_enforces_the_cell_limit():
+    with pytest.raises(MatrixTooLargeError):
+        expand_matrix(matrix_request(sampling={"temperature": [0.0, 0.5, 1.0]}), max_cells=5)
+
+
+def test_expand_matrix_reports_malformed_templates():
+    with pytest.raises(TemplateSyntaxError, match=r"costs \$5 for \$topic"):
+        expand_matrix(matrix_request(user_prompt_templates=["costs $5 for $topic"]))
+    cells = expand_matrix(matrix_request(user_prompt_templates=["costs $$5 for $topic"]))
+    assert cells[0].user_prompt == "costs $5 for cats"
+
+
+def test_matrix_request_rejects_unknown_sampling_parameters():
+    with pytest.raises(ValueError):
+        matrix_request(sampling={"temprature": [0.0]})
+
+
+@pytest.mark.asyncio
+async def test_run_stores_cells_under_one_parent(async_session_factory, fake_encoding):
+    client = Mock()
+    client.chat.completions.create.return_value = Mock(choices=[Mock(message=Mock(content="ok"))])
+    factory = Mock(return_value=client)
+    runner = MatrixRunner(ExperimentService(client_factory=factory), session_factory=async_session_factory)
+
+    async with async_session_factory() as db:
+        summary = await runner.run(matrix_request(), db)
+
+    assert summary["status"] == "COMPLETED"
+    assert len(summary["cells"]) == 4
+    # One client shared by every cell, called once per cell and model
+    factory.assert_called_once()
+    assert client.chat.completions.create.call_count == 8
+    temperatures = {call.kwargs["temperature"] for call in client.chat.completions.create.call_args_list}
+    assert temperatures == {0.0, 0.7}
+
+    async with async_session_factory() as db:
+        listed = await db.run_sync(lambda session: crud.get_experiments(session))
+        cells = await db.run_sync(lambda session: MatrixRunner.list_cells(session, summary["id"]))
+    assert [run.id for run in listed] == [summary["id"]]
+    assert listed[0].status == "COMPLETED"
+    assert [cell["id"] for cell in cells] == [cell["id"] for cell in summary["cells"]]
+    assert cells[1]["parameters"]["sampling"] == '{"temperature": 0.7}'
+
+
+@pytest.mark.asyncio
+async def test_failing_cell_marks_the_parent_failed(async_session_factory, fake_encoding):
+    client = Mock()
+    client.chat.completions.create.return_value = Mock(choices=[Mock(message=Mock(content="ok"))])
+    service = ExperimentService(client_factory=Mock(return_value=client))
+    execute_run = service.execute_run
+
+    async def flaky_execute_run(run, cell, db, client=None):
+        if cell.user_prompt == "About dogs":
+            raise RuntimeError("database is locked")
+        return await execute_run(run, cell, db, client=client)
+
+    service.execute_run = flaky_execute_run
+    runner = MatrixRunner(service, session_factory=async_session_factory)
+
+    async with async_session_factory() as db:
+        summary = await runner.run(matrix_request(), db)
+
+    assert summary["status"] == "ERROR"
+    assert [cell["status"] for cell in summary["cells"]] == ["COMPLETED", "COMPLETED", "ERROR", "ERROR"]
+    assert summary["cells"][2]["error_details"] == "database is locked"
+    async with async_session_factory() as db:
+        [parent] = await db.run_sync(lambda session: crud.get_experiments(session))
+        cells = await db.run_sync(lambda session: MatrixRunner.list_cells(session, summary["id"]))
+    assert parent.status == "ERROR"
+    assert [cell["status"] for cell in cells] == ["COMPLETED", "COMPLETED", "ERROR", "ERROR"]
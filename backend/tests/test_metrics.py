@@ -0,0 +1,89 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.utils import metrics
+from api.v1.utils.metrics import MetricsMiddleware, MetricsRegistry
+
+MODEL = "openai:gpt-4o-mini"
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        latency.observe(value, stage='parse "json"')
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{stage="parse \\"json\\"",le="0.1"} 1',
+        'latency_seconds_bucket{stage="parse \\"json\\"",le="1"} 3',
+        'latency_seconds_bucket{stage="parse \\"json\\"",le="+Inf"} 4',
+        'latency_seconds_sum{stage="parse \\"json\\""} 6.25',
+        'latency_seconds_count{stage="parse \\"json\\""} 4',
+    ]
+
+
+def test_counters_and_gauges():
+    registry = MetricsRegistry()
+    errors = registry.counter("errors", "Errors.", ("model",))
+    in_flight = registry.gauge("in_flight", "In flight.")
+    errors.inc(model=MODEL)
+    errors.inc(2, model=MODEL)
+    with in_flight.track_inprogress():
+        assert in_flight.value() == 1
+    assert in_flight.value() == 0
+    assert f'errors_total{{model="{MODEL}"}} 3' in registry.render()
+    with pytest.raises(ValueError):
+        registry.counter("errors", "Again.")
+
+
+def test_model_label_is_bounded(monkeypatch):
+    monkeypatch.setattr(metrics, "_labelled_models", {MODEL})
+    monkeypatch.setattr(metrics, "METRICS_MAX_MODELS", 2)
+
+    assert metrics.model_label("openai:gpt-4o") == "openai:gpt-4o"
+    assert metrics.model_label("openai:made-up-1") == "other"
+    assert metrics.model_label(MODEL) == MODEL
+    assert metrics.model_label("openai:gpt-4o") == "openai:gpt-4o"
+
+
+@pytest.mark.asyncio
+@patch("api.v1.services.experiment_service.crud")
+async def test_model_run_records_stages_tokens_and_outcome(mock_crud, fake_encoding):
+    client = Mock()
+    client.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content='{"nodes": [{"id": 1}], "relationships": []}'))]
+    )
+    parse_count = metrics.STAGE_SECONDS.count(stage="parse_graph", provider="openai", model=MODEL)
+    output_tokens = metrics.TOKENS.value(provider="openai", model=MODEL, direction="output")
+    completed = metrics.MODEL_REQUESTS.value(provider="openai", model=MODEL, outcome="completed")
+
+    await ExperimentService().run_model(client, MODEL, [{"role": "user", "content": "two words"}])
+
+    assert metrics.STAGE_SECONDS.count(stage="parse_graph", provider="openai", model=MODEL) == parse_count + 1
+    assert metrics.STAGE_SECONDS.count(stage="provider_call", provider="openai", model=MODEL) >= 1
+    assert metrics.TOKENS.value(provider="openai", model=MODEL, direction="output") == output_tokens + 5
+    assert metrics.MODEL_REQUESTS.value(provider="openai", model=MODEL, outcome="completed") == completed + 1
+    assert metrics.MODELS_IN_FLIGHT.value(provider="openai") == 0
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    before = metrics.HTTP_SECONDS.count(method="GET", route="/items/{item_id}", status="200")
+    with TestClient(app) as client:
+        client.get("/items/1")
+        client.get("/items/2")
+    assert metrics.HTTP_SECONDS.count(method="GET", route="/items/{item_id}", status="200") == before + 2
+    assert metrics.HTTP_IN_FLIGHT.value() == 0
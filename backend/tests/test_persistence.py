@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from persistence import crud
+from persistence.base import Base
+from persistence.migrations import SCHEMA_VERSION, get_schema_version, migrate
+from persistence.models import ExperimentOutput, ExperimentRun, ModelResult, Parameter
+
+MODEL = "openai:gpt-4o-mini"
+OTHER = "anthropic:claude-3-5-sonnet-20241022"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def legacy_run(outputs):
+    run = ExperimentRun(name="legacy", timestamp=datetime(2024, 5, 1), status="COMPLETED")
+    run.parameters.append(Parameter(name="models", value=f"{MODEL},{OTHER}", datatype="list"))
+    for name, value in outputs.items():
+        run.outputs.append(ExperimentOutput(output_name=name, output_value=value, output_datatype="str"))
+    return run
+
+
+def test_migration_moves_eav_metrics_into_model_results(engine):
+    db = sessionmaker(bind=engine)()
+    db.add(legacy_run({
+        f"{MODEL}_response": '{"nodes": []}',
+        f"{MODEL}_elapsed_time": "1.5",
+        f"{MODEL}_input_tokens": "10",
+        f"{MODEL}_output_tokens": "4",
+        f"{MODEL}_total_tokens": "14",
+        f"{MODEL}_node_count": "0",
+        f"{MODEL}_cache_hit": "true",
+        f"{OTHER}_error": "Error with model: boom",
+        f"{OTHER}_input_tokens": "10",
+    }))
+    db.commit()
+
+    migrate(engine)
+
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+    index_names = {index["name"] for index in inspect(engine).get_indexes("experiment_outputs")}
+    assert "ix_experiment_outputs_run_id_output_name" in index_names
+
+    db.expire_all()
+    run = db.query(ExperimentRun).one()
+    assert sorted(o.output_name for o in run.outputs) == [f"{OTHER}_error", f"{MODEL}_response"]
+    results = {r.model: r for r in run.results}
+    assert results[MODEL].status == "COMPLETED"
+    assert results[MODEL].elapsed_time == 1.5
+    assert results[MODEL].total_tokens == 14
+    assert results[MODEL].node_count == 0
+    assert results[MODEL].cache_hit is True
+    assert results[MODEL].time_to_first_token is None
+    assert results[OTHER].status == "ERROR"
+    assert results[OTHER].input_tokens == 10
+
+    # Already at the current version: running again is a no-op
+    migrate(engine)
+    assert db.query(ModelResult).count() == 2
+
+
+def test_get_experiments_pages_by_keyset_with_filters(session_factory):
+    db = session_factory()
+    same_time = datetime(2024, 5, 2)
+    for i, (timestamp, status, run_models) in enumerate([
+        (datetime(2024, 5, 1), "COMPLETED", MODEL),
+        (same_time, "ERROR", OTHER),
+        (same_time, "COMPLETED", f"{MODEL},{OTHER}"),
+        (datetime(2024, 5, 3), "COMPLETED", "openai:gpt-4o"),
+    ]):
+        run = ExperimentRun(name=f"run {i}", timestamp=timestamp, status=status)
+        run.parameters.append(Parameter(name="models", value=run_models, datatype="list"))
+        db.add(run)
+    db.commit()
+
+    pages, cursor = [], None
+    while True:
+        page = crud.get_experiments(db, limit=2, cursor=cursor)
+        pages.append([row.name for row in page])
+        if len(page) < 2:
+            break
+        cursor = crud.encode_cursor(page[-1].timestamp, page[-1].id)
+    assert pages == [["run 3", "run 2"], ["run 1", "run 0"], []]
+
+    assert [r.name for r in crud.get_experiments(db, model=MODEL)] == ["run 2", "run 0"]
+    assert [r.name for r in crud.get_experiments(db, status="ERROR")] == ["run 1"]
+    assert [r.name for r in crud.get_experiments(db, since=same_time, until=datetime(2024, 5, 3))] == [
+        "run 2", "run 1"
+    ]
+    with pytest.raises(ValueError):
+        crud.get_experiments(db, cursor="not a cursor")
+
+
+def test_configure_sqlite_enables_wal(tmp_path):
+    from sqlalchemy import event
+    from persistence.base import configure_sqlite
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    event.listen(engine, "connect", configure_sqlite)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+    engine.dispose()
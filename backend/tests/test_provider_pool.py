@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.services.provider_pool import ProviderClientPool
+
+MESSAGES = [{"role": "user", "content": "Extract the graph"}]
+
+
+class LazyClient:
+    """Stands in for ai.Client: providers are built on demand from provider_configs."""
+
+    def __init__(self, provider_configs):
+        self.provider_configs = provider_configs
+        self.providers = {}
+        self.chat = Mock()
+        self.chat.completions.create.side_effect = lambda model, messages, **kwargs: (
+            self.providers[model.split(":", 1)[0]]
+        )
+
+
+def test_client_is_shared_and_providers_are_built_once():
+    created = []
+    factory = Mock(side_effect=LazyClient)
+    pool = ProviderClientPool(client_factory=factory, warm_providers=[])
+    barrier = threading.Barrier(8)
+
+    def build(provider, config):
+        created.append((provider, config))
+        return Mock(name=provider)
+
+    def call(_):
+        barrier.wait()
+        return pool.get().chat.completions.create(model="openai:gpt-4o-mini", messages=MESSAGES)
+
+    with patch("api.v1.services.provider_pool.ProviderFactory.create_provider", side_effect=build):
+        with ThreadPoolExecutor(8) as executor:
+            providers = list(executor.map(call, range(8)))
+
+    factory.assert_called_once()
+    assert len(created) == 1 and len({id(provider) for provider in providers}) == 1
+    # The SDK gets the pool's kept-alive connections
+    assert created[0][1]["http_client"] is pool._http_clients["openai"]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failures_are_logged_and_close_releases_connections(caplog):
+    pool = ProviderClientPool(client_factory=LazyClient, warm_providers=["openai", "anthropic"])
+
+    def build(provider, config):
+        if provider == "anthropic":
+            raise ValueError("Anthropic API key is missing")
+        return Mock(client=Mock(base_url=None))
+
+    with patch("api.v1.services.provider_pool.ProviderFactory.create_provider", side_effect=build):
+        await pool.start()
+
+    assert "Warm-up of anthropic failed: Anthropic API key is missing" in caplog.text
+    assert set(pool._http_clients) == {"openai"}
+    http_client = pool._http_clients["openai"]
+    await pool.close()
+    assert http_client.is_closed and pool._http_clients == {}
+
+
+def test_service_uses_the_injected_pool():
+    pool = Mock()
+    assert ExperimentService(pool=pool).new_client() is pool.get.return_value
+    factory = Mock()
+    assert ExperimentService(client_factory=factory, pool=pool).new_client() is factory.return_value
@@ -0,0 +1,131 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.services.fake_provider import FakeProviderError
+from api.v1.services.provider_scheduler import (
+    ProviderScheduler, TokenBucket, is_retryable, parse_rate_limits, retry_after_of,
+)
+
+MODEL = "openai:gpt-4o-mini"
+MESSAGES = [{"role": "user", "content": "Extract the graph"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def completion(text):
+    return Mock(choices=[Mock(message=Mock(content=text))])
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("openai=600/120000, anthropic=/40000,openai:gpt-4o=60/") == {
+        "openai": (600.0, 120000.0),
+        "anthropic": (None, 40000.0),
+        "openai:gpt-4o": (60.0, None),
+    }
+
+
+def test_token_bucket_paces_and_backs_off():
+    clock = Clock()
+    bucket = TokenBucket(60, clock)  # one per second, bursts of ten
+    for _ in range(10):
+        assert bucket.wait_time(1) == 0
+        bucket.take(1)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.wait_time(1) == 0
+
+    bucket.throttle()
+    assert bucket.rate == pytest.approx(0.5)
+    for _ in range(20):
+        bucket.recover()
+    assert bucket.rate == pytest.approx(1.0)
+
+
+def test_retry_after_and_retryable_errors():
+    assert retry_after_of(FakeProviderError("slow down", 429, {"retry-after": "7"})) == 7
+    assert retry_after_of(FakeProviderError("slow down", 429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_of(FakeProviderError("slow down", 429)) is None
+    assert is_retryable(FakeProviderError("overloaded", 529))
+    assert not is_retryable(FakeProviderError("bad request", 400))
+    assert not is_retryable(ValueError("no status"))
+
+    wrapped = RuntimeError("provider call failed")
+    wrapped.__cause__ = FakeProviderError("busy", 503)
+    assert is_retryable(wrapped)
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_pauses_the_provider_and_throttles_its_budget():
+    clock = Clock()
+    scheduler = ProviderScheduler({"openai": (600, None)}, {}, clock=clock, base_delay=1.0)
+    delay = scheduler.retry_delay(MODEL, FakeProviderError("slow down", 429, {"retry-after": "3"}), attempt=1)
+    assert 3 <= delay <= 3.25
+    requests, _ = scheduler._buckets["openai"]
+    assert requests.rate == pytest.approx(5.0)
+
+    with patch("api.v1.services.provider_scheduler.asyncio.sleep") as sleep:
+        async def advance(seconds):
+            clock.now += seconds
+        sleep.side_effect = advance
+        waited = await scheduler.acquire(MODEL)
+    assert waited >= 3
+
+
+@pytest.mark.asyncio
+@patch("api.v1.services.experiment_service.crud")
+async def test_service_retries_rate_limits_then_succeeds(mock_crud, fake_encoding):
+    client = Mock()
+    client.chat.completions.create.side_effect = [
+        FakeProviderError("slow down", 429, {"retry-after": "0"}),
+        FakeProviderError("unavailable", 503),
+        completion('{"nodes": [], "relationships": []}'),
+    ]
+    service = ExperimentService(scheduler=ProviderScheduler({}, {}, base_delay=0.0))
+
+    outputs, result, failed = await service.run_model(client, MODEL, MESSAGES)
+
+    assert not failed
+    assert result["attempts"] == 3
+    assert [o.output_name for o in outputs] == [f"{MODEL}_response"]
+
+
+@pytest.mark.asyncio
+@patch("api.v1.services.experiment_service.crud")
+async def test_service_gives_up_on_permanent_errors_and_exhausted_retries(mock_crud, fake_encoding):
+    client = Mock()
+    client.chat.completions.create.side_effect = FakeProviderError("bad request", 400)
+    service = ExperimentService(scheduler=ProviderScheduler({}, {}, max_attempts=3, base_delay=0.0))
+    outputs, _, failed = await service.run_model(client, MODEL, MESSAGES)
+    assert failed and client.chat.completions.create.call_count == 1
+    assert "Response status: 400" in outputs[0].output_value
+
+    client.chat.completions.create.reset_mock()
+    client.chat.completions.create.side_effect = FakeProviderError("slow down", 429, {"retry-after": "0"})
+    _, _, failed = await service.run_model(client, MODEL, MESSAGES)
+    assert failed and client.chat.completions.create.call_count == 3
+
+
+@pytest.mark.asyncio
+@patch("api.v1.services.experiment_service.crud")
+async def test_stream_is_not_retried_after_tokens_were_sent(mock_crud, fake_encoding):
+    def broken_stream():
+        yield Mock(choices=[Mock(delta=Mock(content="partial"))])
+        raise FakeProviderError("unavailable", 503)
+
+    client = Mock()
+    client.chat.completions.create.side_effect = lambda **kwargs: broken_stream()
+    service = ExperimentService(scheduler=ProviderScheduler({}, {}, base_delay=0.0))
+    tokens = []
+
+    _, _, failed = await service.run_model(client, MODEL, MESSAGES, on_token=tokens.append)
+
+    assert failed and tokens == ["partial"]
+    assert client.chat.completions.create.call_count == 1
@@ -0,0 +1,93 @@
+from datetime import datetime
+from unittest.mock import Mock
+
+import pytest
+
+from api.v1.services.experiment_service import ExperimentService
+from api.v1.services.search_service import make_snippet, search_experiments
+from persistence import blobs, schemas, search
+from persistence.models import ExperimentOutput, ExperimentRun, Parameter
+
+# Large enough to end up in the blob store
+LARGE_GRAPH = '{"nodes": [' + ", ".join(f'{{"id": "n{i}", "name": "Node {i}"}}' for i in range(150)) + \
+    ', {"id": "acme", "name": "Acme Robotics"}]}'
+
+
+def client_answering(responses):
+    client = Mock()
+    client.chat.completions.create.side_effect = lambda model, messages, **kwargs: Mock(
+        choices=[Mock(message=Mock(content=responses[model]))]
+    )
+    return client
+
+
+async def run(db, name, user_prompt, responses):
+    service = ExperimentService(client_factory=lambda: client_answering(responses))
+    experiment = schemas.ExperimentCreate(
+        name=name, system_prompt="Extract a knowledge graph", user_prompt=user_prompt,
+        models=list(responses), use_cache=False,
+    )
+    return await service.run_experiment(experiment, db)
+
+
+@pytest.mark.asyncio
+async def test_runs_are_searchable_as_they_are_written(session_factory, fake_encoding):
+    db = session_factory()
+    first = await run(db, "funding", "Startups raising seed funding", {
+        "openai:gpt-4o-mini": LARGE_GRAPH,
+        "anthropic:claude-3-5-sonnet-20241022": '{"nodes": [{"id": "globex"}]}',
+    })
+    second = await run(db, "hiring", "Startups hiring engineers", {"openai:gpt-4o-mini": '{"nodes": []}'})
+
+    [hit] = search_experiments(db, "acme robotics")
+    assert (hit["id"], hit["field"], hit["model"]) == (first["id"], "response", "openai:gpt-4o-mini")
+    assert "<b>Acme</b> <b>Robotics</b>" in hit["snippet"] and hit["snippet"].startswith("…")
+
+    assert {hit["id"] for hit in search_experiments(db, "startups")} == {first["id"], second["id"]}
+    [hit] = search_experiments(db, "engineer*")
+    assert (hit["id"], hit["field"]) == (second["id"], "user_prompt")
+    assert hit["snippet"] == "Startups hiring <b>engineers</b>"
+
+    # Filters
+    assert [h["id"] for h in search_experiments(db, "startups", model="anthropic:claude-3-5-sonnet-20241022")] == [first["id"]]
+    assert search_experiments(db, "startups", status="ERROR") == []
+    assert search_experiments(db, "startups", field="response") == []
+    with pytest.raises(ValueError):
+        search_experiments(db, "  -- ")
+    db.close()
+
+
+def test_rebuild_indexes_existing_runs(session_factory):
+    db = session_factory()
+    # Written without the service, like runs stored before the index existed
+    old = ExperimentRun(name="old", timestamp=datetime(2024, 5, 1), status="COMPLETED")
+    old.parameters.append(Parameter(name="user_prompt", value="Robotics companies", datatype="str"))
+    old.outputs.append(ExperimentOutput(output_name="m_response", output_value=LARGE_GRAPH, output_datatype="str"))
+    blobs.offload_outputs(db, old.outputs)
+    db.add(old)
+    db.commit()
+    assert search_experiments(db, "acme") == []
+
+    assert search.rebuild_index(db, batch_size=1) == 2
+    db.commit()
+    [hit] = search_experiments(db, "acme")
+    assert (hit["id"], hit["field"], hit["model"]) == (old.id, "response", "m")
+    assert [hit["field"] for hit in search_experiments(db, "robotics", field="user_prompt")] == ["user_prompt"]
+    # Rebuilding again replaces the index rather than adding to it
+    assert search.rebuild_index(db) == 2
+    assert len(search_experiments(db, "robotics")) == 1
+    db.close()
+
+
+def test_match_expression_quotes_words():
+    assert search.match_expression('gpt-4o "OR" acme*') == '"gpt" "4o" "OR" "acme"*'
+
+
+def test_make_snippet_cuts_a_window_around_the_first_match():
+    text = "word " * 100 + "Acme\n  Robotics " + "tail " * 100
+    snippet = make_snippet(text, ["acme"], size=40)
+    assert snippet == "…word word <b>Acme</b> Robotics tail tail tail…"
+    assert make_snippet("acmes and acme", ["acme"]) == "acmes and <b>acme</b>"
+    assert make_snippet('<script>acme & "co"</script>', ["acme"]) == (
+        "&lt;script&gt;<b>acme</b> &amp; &quot;co&quot;&lt;/script&gt;"
+    )
@@ -0,0 +1,95 @@
+import pytest
+
+from api.v1.utils import token_counter
+from api.v1.utils.token_counter import (
+    count_tokens,
+    count_tokens_batch,
+    get_encoding,
+    normalize_model_name,
+    register_encoding,
+)
+
+
+class CountingEncoding:
+    name = "counting"
+
+    def __init__(self):
+        self.encoded = []
+        self.batches = []
+
+    def encode(self, text, **kwargs):
+        self.encoded.append(text)
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8, **kwargs):
+        self.batches.append((list(texts), num_threads))
+        self.encoded.extend(texts)
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    encoding = CountingEncoding()
+    token_counter.clear_token_caches()
+    monkeypatch.setattr(token_counter.tiktoken, "encoding_for_model", lambda name: encoding)
+    monkeypatch.setattr(token_counter.tiktoken, "get_encoding", lambda name: encoding)
+    yield encoding
+    token_counter.clear_token_caches()
+
+
+def test_normalize_model_name():
+    assert normalize_model_name("openai:gpt-4o-mini") == "gpt-4o-mini"
+    assert normalize_model_name("gpt-4o") == "gpt-4o"
+
+
+def test_encoding_resolved_once_per_model(monkeypatch):
+    resolved = []
+
+    def encoding_for_model(name):
+        resolved.append(name)
+        raise KeyError(name)
+
+    token_counter.clear_token_caches()
+    monkeypatch.setattr(token_counter.tiktoken, "encoding_for_model", encoding_for_model)
+    monkeypatch.setattr(token_counter.tiktoken, "get_encoding", lambda name: CountingEncoding())
+
+    first = get_encoding("anthropic:claude-3-5-sonnet")
+    assert get_encoding("anthropic:claude-3-5-sonnet") is first
+    assert resolved == ["claude-3-5-sonnet"]
+    token_counter.clear_token_caches()
+
+
+def test_count_tokens_memoizes_identical_text(encoding):
+    assert count_tokens("a shared system prompt", "openai:gpt-4o") == 4
+    assert count_tokens("a shared system prompt", "openai:gpt-4o-mini") == 4
+    assert encoding.encoded == ["a shared system prompt"]
+
+
+def test_count_tokens_batch_encodes_each_distinct_text_once(encoding):
+    count_tokens("already seen", "openai:gpt-4o")
+
+    counts = count_tokens_batch(
+        ["one two", "already seen", "one two", "three"], "openai:gpt-4o", num_threads=2
+    )
+
+    assert counts == [2, 2, 2, 1]
+    assert encoding.encoded == ["already seen", "one two", "three"]
+
+
+def test_count_tokens_batch_uses_one_encode_batch_call(encoding):
+    assert count_tokens_batch(["one two", "three"], "openai:gpt-4o") == [2, 1]
+    assert count_tokens_batch(["four", "one two"], "openai:gpt-4o", num_threads=0) == [1, 2]
+
+    assert encoding.batches == [(["one two", "three"], 1), (["four"], 1)]
+    assert all(isinstance(key[1], bytes) for key in token_counter._count_cache)
+
+
+def test_registered_encoding_counts_its_provider_only(encoding, monkeypatch):
+    monkeypatch.setattr(token_counter, "_provider_encodings", {})
+    local = CountingEncoding()
+    get_encoding("local:small")
+    register_encoding("local", local)
+
+    assert count_tokens("one two three", "local:small") == 3
+    assert local.encoded == ["one two three"]
+    assert get_encoding("openai:gpt-4o") is encoding
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+from api.v1.endpoints.health import get_readiness
+from api.v1.services.fake_provider import PROVIDER_KEY, CharacterEncoding
+from api.v1.services.warmup import Warmup
+from api.v1.utils import token_counter
+
+
+def test_preload_encodings_loads_every_model_and_reports_failures(fake_encoding, monkeypatch):
+    monkeypatch.setitem(token_counter._provider_encodings, PROVIDER_KEY, CharacterEncoding())
+    assert token_counter.preload_encodings(["openai:gpt-4o-mini", "fake:instant"]) == {
+        "openai:gpt-4o-mini": "whitespace",
+        "fake:instant": "fake-4-chars",
+    }
+
+    def offline(name):
+        raise ConnectionError("no network")
+
+    token_counter.clear_token_caches()
+    monkeypatch.setattr(token_counter.tiktoken, "encoding_for_model", offline)
+    with pytest.raises(RuntimeError, match="openai:gpt-4o.*ConnectionError"):
+        token_counter.preload_encodings(["openai:gpt-4o", "fake:instant"])
+    # The models that did load stay memoized
+    assert token_counter.get_encoding.cache_info().currsize == 1
+
+
+@pytest.mark.asyncio
+async def test_readiness_does_not_wait_for_warm_up(monkeypatch):
+    warmup = Warmup()
+    monkeypatch.setattr("api.v1.endpoints.health.warmup", warmup)
+    assert get_readiness().status_code == 503
+
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return {"openai": "connected"}
+
+    async def broken():
+        raise ValueError("missing key")
+
+    warmup.start("providers", slow())
+    warmup.start("encodings", broken())
+    warmup.ready = True
+    await asyncio.sleep(0)
+    response = get_readiness()
+    body = json.loads(response.body)
+    assert response.status_code == 200 and not body["warm"]
+    assert body["warmup"]["providers"] == {"state": "RUNNING"}
+    assert body["warmup"]["encodings"]["state"] == "ERROR"
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert warmup.status()["warmup"]["providers"]["result"] == {"openai": "connected"}
+    assert warmup.status()["warm"]
+
+    await warmup.stop()
+    assert get_readiness().status_code == 503
@@ -1,19 +1,32 @@
 import { useQuery } from '@tanstack/react-query';
 import { type Experiment } from "@/types/api";
 
+// The API returns one page per request; the next page's cursor comes in X-Next-Cursor
+const PAGE_SIZE = 500;
+
 async function fetchExperiments(): Promise<Experiment[]> {
   try {
     const baseUrl = import.meta.env.VITE_API_BASE_URL || '';
     console.log('baseUrl', baseUrl);
-    const response = await fetch(`${baseUrl}/api/v1/experiments`);
-    if (!response.ok) {
-      const errorData = await response.json().catch(() => null);
-      throw new Error(
-        errorData?.detail || 
-        `Failed to fetch experiments: ${response.status} ${response.statusText}`
-      );
-    }
-    return response.json();
+    const experiments: Experiment[] = [];
+    let cursor: string | null = null;
+    do {
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await fetch(`${baseUrl}/api/v1/experiments?${params}`);
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => null);
+        throw new Error(
+          errorData?.detail || 
+          `Failed to fetch experiments: ${response.status} ${response.statusText}`
+        );
+      }
+      experiments.push(...(await response.json()));
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return experiments;
   } catch (error) {
     console.error('Fetch error:', error);
     throw error;